@@ -0,0 +1,431 @@
+"""Micro-benchmarks for structure handling.
+
+Each benchmark takes a list of SMILES strings from the compound test corpus
+and yields `(label, seconds)` pairs, one per implementation being compared.
+They are run with the `benchmark` management command.
+"""
+import bz2
+import os
+import pickle
+import random
+import time
+import xml.dom.minidom
+import xml.etree.ElementTree as ET
+from typing import Callable, Iterable, List, Tuple
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Length
+from rest_framework.exceptions import ValidationError
+
+import numpy as np
+import partialsmiles as ps
+from indigo import Indigo, IndigoException
+from indigo.inchi import IndigoInchi
+
+from chemreg.compound.models import DefinedCompound
+from chemreg.compound.search import popcount, to_words
+from chemreg.compound.serializers import DefinedCompoundSerializer
+from chemreg.compound.settings import compound_settings
+from chemreg.compound.validators import validate_smiles
+from chemreg.indigo.cache import conversion_cache
+from chemreg.indigo.depiction import compute_depiction, get_depiction
+from chemreg.indigo.inchi import get_inchikey
+from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.mrvfile import format_mrvfile
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.similarity import similarity_fingerprint
+from chemreg.indigo.structure import load_serialized, load_structure
+from chemreg.indigo.substructure import (
+    compute_query_fingerprint,
+    match_substructure,
+    substructure_fingerprint,
+)
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "tests", "compounds.bz2")
+
+
+def load_corpus() -> List[str]:
+    """Loads the SMILES strings of the compound test corpus."""
+    with bz2.open(CORPUS_PATH, "rb") as f:
+        return list(pickle.load(f))
+
+
+def time_calls(func: Callable, corpus: Iterable) -> float:
+    """Times calling `func` on every item in the corpus.
+
+    Structures Indigo cannot load are included in the timing and skipped.
+
+    Returns:
+        The elapsed wall-clock time in seconds.
+
+    """
+    start = time.perf_counter()
+    for item in corpus:
+        try:
+            func(item)
+        except IndigoException:
+            pass
+    return time.perf_counter() - start
+
+
+def indigo_sessions(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """InChIKeys computed with a fresh Indigo session per call vs. a pooled one."""
+
+    def fresh_session(smiles):
+        indigo = Indigo()
+        indigo_inchi = IndigoInchi(indigo)
+        inchi = indigo_inchi.getInchi(indigo.loadMolecule(smiles))
+        return indigo_inchi.getInchiKey(inchi)
+
+    yield "fresh session", time_calls(fresh_session, corpus)
+    yield "pooled session", time_calls(get_inchikey, corpus)
+
+
+def depiction_rendering(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """SVG images rendered on every request vs. served from the cache."""
+    conversion_cache.clear()
+
+    def render(smiles):
+        return compute_depiction(smiles, "svg", 300)
+
+    def cached(smiles):
+        return get_depiction(smiles, "svg", 300)
+
+    yield "rendered", time_calls(render, corpus)
+    time_calls(cached, corpus)
+    yield "cached", time_calls(cached, corpus)
+
+
+SUBSTRUCTURE_QUERIES = ["c1ccccc1O", "C(=O)N", "S(=O)(=O)N", "c1ccncc1", "[Cl,Br]"]
+
+
+def substructure_screening(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """Substructure queries matched against every structure vs. screened first.
+
+    The per-structure times cover all `SUBSTRUCTURE_QUERIES`.
+    """
+    targets = []
+    fingerprints = []
+    with indigo_pool.session() as session:
+        for i, smiles in enumerate(corpus):
+            try:
+                molecule = session.indigo.loadMolecule(smiles)
+                fingerprints.append(
+                    to_words(substructure_fingerprint(session, molecule))
+                )
+            except IndigoException:
+                continue
+            targets.append((i, smiles))
+    matrix = np.stack(fingerprints)
+
+    def match_all(query):
+        match_substructure(query, targets)
+
+    def screen_and_match(query):
+        words = to_words(compute_query_fingerprint(query))
+        candidates = np.flatnonzero(((matrix & words) == words).all(axis=1))
+        match_substructure(query, [targets[row] for row in candidates])
+
+    yield "exact match", time_calls(match_all, SUBSTRUCTURE_QUERIES)
+    yield "screened", time_calls(screen_and_match, SUBSTRUCTURE_QUERIES)
+
+
+def similarity_scoring(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """Tanimoto similarity of every structure to each other, row by row vs. vectorized.
+
+    Each structure is used as a query against the whole corpus, so the times
+    per structure are those of one query against the corpus.
+    """
+    fingerprints = []
+    with indigo_pool.session() as session:
+        for smiles in corpus:
+            try:
+                molecule = session.indigo.loadMolecule(smiles)
+                fingerprints.append(similarity_fingerprint(session, molecule))
+            except IndigoException:
+                continue
+    rows = [int.from_bytes(fingerprint, "big") for fingerprint in fingerprints]
+    matrix = np.stack([to_words(fingerprint) for fingerprint in fingerprints])
+    counts = popcount(matrix)
+
+    def row_by_row(query):
+        query = int.from_bytes(query, "big")
+        query_count = bin(query).count("1")
+        for row in rows:
+            common = bin(row & query).count("1")
+            union = bin(row).count("1") + query_count - common
+            common / union if union else 0
+
+    def vectorized(query):
+        query = to_words(query)
+        common = popcount(matrix & query).astype(np.float32)
+        union = counts + int(popcount(query)) - common
+        np.divide(common, union, out=np.zeros_like(common), where=union > 0)
+
+    yield "row by row", time_calls(row_by_row, fingerprints)
+    yield "vectorized", time_calls(vectorized, fingerprints)
+
+
+def mrvfile_conversion(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """CML to MRV with minidom and ElementTree round trips vs. a single pass."""
+
+    def remove_blanks(node):
+        for x in node.childNodes:
+            if x.nodeType == xml.dom.minidom.Node.TEXT_NODE:
+                if x.nodeValue:
+                    x.nodeValue = x.nodeValue.strip()
+            elif x.nodeType == xml.dom.minidom.Node.ELEMENT_NODE:
+                remove_blanks(x)
+
+    def round_trips(cml):
+        cml = cml[cml.index("<cml>") :]
+        document = xml.dom.minidom.parseString(cml)
+        remove_blanks(document)
+        molecule = document.getElementsByTagName("molecule")[0]
+        structure = ET.Element("MChemicalStruct")
+        structure.append(ET.fromstring(molecule.toxml()))
+        mdocument = ET.Element("MDocument")
+        mdocument.append(structure)
+        root = ET.Element("cml")
+        root.append(mdocument)
+        return ET.tostring(root, encoding="unicode")
+
+    indigo = Indigo()
+    cmls = []
+    for smiles in corpus:
+        try:
+            cmls.append(indigo.loadMolecule(smiles).cml())
+        except IndigoException:
+            pass
+    assert all(round_trips(cml) == format_mrvfile(cml) for cml in cmls)
+
+    yield "round trips", time_calls(round_trips, cmls)
+    yield "single pass", time_calls(format_mrvfile, cmls)
+
+
+def mutate_smiles(smiles: str, random_state: random.Random) -> str:
+    """Deletes, inserts or replaces a character, or truncates the SMILES."""
+    chars = list(smiles)
+    i = random_state.randrange(len(chars))
+    operation = random_state.randrange(4)
+    if operation == 0:
+        del chars[i]
+    elif operation == 1:
+        chars.insert(i, random_state.choice("CcNn[]()=#/%1+-.@H:"))
+    elif operation == 2:
+        chars[i] = random_state.choice("CcNn[]()=#/%1+-.@H:")
+    else:
+        del chars[i:]
+    return "".join(chars)
+
+
+def smiles_validation(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """SMILES validated by `partialsmiles` alone vs. scanned first.
+
+    Before timing, the decisions and error messages of both are compared on
+    the corpus and on mutations of it, most of which are invalid.
+    """
+
+    def parse_only(smiles):
+        try:
+            ps.ParseSmiles(smiles, partial=False)
+        except ps.ValenceError:
+            pass
+        except ps.SMILESSyntaxError as e:
+            raise ValidationError(f"Structure is not in SMILES format: {e}")
+
+    def decision(validator, smiles):
+        try:
+            validator(smiles)
+        except ValidationError as e:
+            return str(e.detail[0])
+        except ps.Error as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    random_state = random.Random(0)
+    mutations = [mutate_smiles(smiles, random_state) for smiles in corpus if smiles]
+    for smiles in corpus + mutations:
+        assert decision(parse_only, smiles) == decision(validate_smiles, smiles)
+
+    def validated(validator):
+        def wrapper(smiles):
+            try:
+                validator(smiles)
+            except ValidationError:
+                pass
+
+        return wrapper
+
+    yield "partialsmiles", time_calls(validated(parse_only), corpus)
+    yield "scanned", time_calls(validated(validate_smiles), corpus)
+
+
+REGISTRY_SCALE = 1000
+"""Synthetic compounds in the `registration` registry per corpus structure.
+
+This makes for a registry of a million compounds with the default corpus.
+"""
+
+
+def fill_registry(size: int, inchikeys: List[str]) -> None:
+    """Registers synthetic compounds with random InChIKeys and then `inchikeys`."""
+    random_state = np.random.RandomState(0)
+    batch_size = 10000
+    for start in range(0, size, batch_size):
+        letters = random_state.randint(
+            ord("A"), ord("Z") + 1, (min(batch_size, size - start), 27), np.uint8
+        )
+        letters[:, [14, 25]] = ord("-")
+        keys = [row.tobytes().decode() for row in letters]
+        if start + batch_size >= size:
+            keys += inchikeys
+        compounds = []
+        for i, inchikey in enumerate(keys, start):
+            compound = DefinedCompound(
+                id=f"BENCH{i}",
+                molfile_v3000="",
+                inchikey=inchikey,
+                calculated_inchikey=inchikey,
+            )
+            compound.update_inchikey_blocks()
+            compounds.append(compound)
+        DefinedCompound.objects.bulk_create(compounds)
+
+
+def serialized_loading(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """Stored structures loaded from their molfiles vs. serialized molecules.
+
+    Loading alone is compared, and with a substructure fingerprint computed
+    as a fingerprint rebuild would.
+    """
+    with indigo_pool.session() as session:
+        session.indigo.setOption("molfile-saving-mode", "3000")
+        molfiles = []
+        serialized = []
+        for smiles in corpus:
+            try:
+                molecule, molfile = load_structure(session, smiles)
+            except IndigoException:
+                continue
+            molfiles.append(molfile)
+            serialized.append(bytes(molecule.serialize()))
+
+        def parse(molfile):
+            return session.indigo.loadMolecule(molfile)
+
+        def unserialize(data):
+            return load_serialized(session, data)
+
+        def parse_fingerprint(molfile):
+            substructure_fingerprint(session, parse(molfile))
+
+        def unserialize_fingerprint(data):
+            substructure_fingerprint(session, unserialize(data))
+
+        yield "molfile", time_calls(parse, molfiles)
+        yield "serialized", time_calls(unserialize, serialized)
+        yield "molfile + fingerprint", time_calls(parse_fingerprint, molfiles)
+        yield "serialized + fingerprint", time_calls(
+            unserialize_fingerprint, serialized
+        )
+
+
+def registration(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """InChIKey conflict checks and creates against a large registry.
+
+    The conflict check as it was, `exists()` and then the compounds of an
+    unindexed column, is compared with the single indexed query of
+    `DefinedCompoundSerializer.validate`, and with whole creates. Every
+    other corpus structure is already registered. The registry is filled
+    in a transaction that is rolled back afterwards.
+    """
+    inchikeys = []
+    for smiles in corpus:
+        try:
+            inchikeys.append(get_inchikey(smiles))
+        except IndigoException:
+            pass
+
+    def unindexed_check(inchikey):
+        qs = DefinedCompound.objects.filter(calculated_inchikey=inchikey)
+        if qs.exists():
+            [obj.pk for obj in qs]
+            [obj.id for obj in qs]
+
+    def indexed_check(inchikey):
+        try:
+            DefinedCompoundSerializer().validate({"inchikey": inchikey})
+        except ValidationError:
+            pass
+
+    def create(smiles):
+        serializer = DefinedCompoundSerializer(data={"smiles": smiles})
+        if serializer.is_valid():
+            serializer.save()
+
+    with transaction.atomic():
+        fill_registry(len(corpus) * REGISTRY_SCALE, inchikeys[::2])
+        yield "unindexed check", time_calls(unindexed_check, inchikeys)
+        yield "indexed check", time_calls(indexed_check, inchikeys)
+        yield "create", time_calls(create, corpus)
+        transaction.set_rollback(True)
+
+
+def structure_storage(corpus: List[str]) -> Iterable[Tuple[str, float]]:
+    """Corpus molfiles stored and listed as plain text vs. compressed.
+
+    The stored size per structure is part of each label. Listing fetches the
+    structures a page of 100 at a time. Each run is rolled back afterwards.
+    """
+    molfiles = []
+    for smiles in corpus:
+        try:
+            molfiles.append(get_molfile_v3000(smiles))
+        except IndigoException:
+            pass
+    page_size = 100
+    compress = compound_settings.COMPRESS_STRUCTURES
+    try:
+        for label, compress_structures in (("plain", False), ("compressed", True)):
+            compound_settings.COMPRESS_STRUCTURES = compress_structures
+            with transaction.atomic():
+                start = time.perf_counter()
+                DefinedCompound.objects.bulk_create(
+                    DefinedCompound(id=f"BENCH{i}", molfile_v3000=molfile)
+                    for i, molfile in enumerate(molfiles)
+                )
+                stored = time.perf_counter() - start
+                qs = DefinedCompound.objects.filter(id__startswith="BENCH")
+                size = qs.aggregate(size=Sum(Length("structure")))["size"]
+                size //= max(len(molfiles), 1)
+                start = time.perf_counter()
+                for offset in range(0, len(molfiles), page_size):
+                    list(
+                        qs.order_by("pk").values_list("structure", flat=True)[
+                            offset : offset + page_size
+                        ]
+                    )
+                listed = time.perf_counter() - start
+                transaction.set_rollback(True)
+            yield f"{label} store ({size} bytes/structure)", stored
+            yield f"{label} list", listed
+    finally:
+        compound_settings.COMPRESS_STRUCTURES = compress
+
+
+BENCHMARKS = {
+    "depiction_rendering": depiction_rendering,
+    "indigo_sessions": indigo_sessions,
+    "mrvfile_conversion": mrvfile_conversion,
+    "registration": registration,
+    "serialized_loading": serialized_loading,
+    "similarity_scoring": similarity_scoring,
+    "smiles_validation": smiles_validation,
+    "structure_storage": structure_storage,
+    "substructure_screening": substructure_screening,
+}
+
+OPT_IN_BENCHMARKS = {"registration"}
+"""The benchmarks that run only when named, as they fill the database."""
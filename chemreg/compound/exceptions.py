@@ -0,0 +1,44 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from chemreg.indigo.budget import BudgetExceeded, InputSizeExceeded
+
+
+class StructureTooLarge(APIException):
+    """The structure string exceeds the input size budget."""
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Structure is too large."
+    default_code = "structure_too_large"
+
+
+class StructureTooComplex(APIException):
+    """The structure exceeds the atom count or time budget."""
+
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "Structure is too complex."
+    default_code = "structure_too_complex"
+
+
+class SimilarityIndexUnavailable(APIException):
+    """Similarity searches were requested before the index was built."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Similarity search is not available yet."
+    default_code = "similarity_index_unavailable"
+
+
+def budget_exception(error: BudgetExceeded) -> APIException:
+    """Builds the API error for a structure that exceeded a budget.
+
+    Args:
+        error: The budget violation raised by `chemreg.indigo`.
+
+    Returns:
+        A `StructureTooLarge` for the input size budget, otherwise a
+        `StructureTooComplex`.
+
+    """
+    if isinstance(error, InputSizeExceeded):
+        return StructureTooLarge(str(error))
+    return StructureTooComplex(str(error))
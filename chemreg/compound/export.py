@@ -0,0 +1,39 @@
+from typing import Iterator
+
+from django.db.models import QuerySet
+
+from chemreg.indigo.reader import format_sdf_record
+
+CHUNK_SIZE = 1000
+"""The number of compounds fetched from the database at a time."""
+
+SDF_FIELDS = {
+    "CID": "pk",
+    "INCHIKEY": "inchikey",
+    "SID": "substance__id",
+    "CASRN": "substance__casrn",
+    "PREFERRED_NAME": "substance__preferred_name",
+}
+"""The data items written for each compound, and the values they are read from."""
+
+
+def export_sdf(queryset: QuerySet, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Writes defined compounds as the records of an SD file.
+
+    Only the structure and `SDF_FIELDS` are fetched, in chunks through a
+    database cursor, so memory use does not grow with the number of
+    compounds.
+
+    Args:
+        queryset: The defined compounds, in the order they are written.
+        chunk_size: The number of compounds fetched at a time.
+
+    Yields:
+        Each compound's record in turn.
+
+    """
+    if not queryset.ordered:
+        queryset = queryset.order_by("pk")
+    rows = queryset.values_list("molfile_v3000", *SDF_FIELDS.values())
+    for molfile, *values in rows.iterator(chunk_size=chunk_size):
+        yield format_sdf_record(molfile, dict(zip(SDF_FIELDS, values)))
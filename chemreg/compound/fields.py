@@ -1,7 +1,86 @@
+import zlib
+
 from django.apps import apps
 from django.db import models
 from django.db.models.query_utils import DeferredAttribute
 
+from chemreg.compound.settings import compound_settings
+
+STRUCTURE_DICTIONARY = (
+    "<cml><MDocument><MChemicalStruct><molecule><atomArray>"
+    '<atom id="a1" elementType="O" x2="" y2="" />'
+    '<atom id="a2" elementType="N" x2="-" y2="-" />'
+    '<atom id="a3" elementType="H" x2="" y2="" />'
+    '<atom id="a4" elementType="C" x2="-" y2="" />'
+    '</atomArray><bondArray><bond atomRefs2="a1 a2" order="2" />'
+    '<bond atomRefs2="a2 a3" order="1" />'
+    "</bondArray></molecule></MChemicalStruct></MDocument></cml>"
+    "\n  -INDIGO-01010000002D\n\n  0  0  0  0  0  0  0  0  0  0  0 V3000\n"
+    "M  V30 BEGIN CTAB\nM  V30 COUNTS 0 0 0 0 0\nM  V30 BEGIN ATOM\n"
+    "M  V30 1 O 0.0 0.0 0.0 0\nM  V30 2 N -0.8 1.38564 0.0 0\n"
+    "M  V30 3 H 0.0 0.0 0.0 0\nM  V30 4 C 0.0 0.0 0.0 0\nM  V30 END ATOM\n"
+    "M  V30 BEGIN BOND\nM  V30 1 1 1 2\nM  V30 2 2 2 3\nM  V30 3 1 3 4\n"
+    "M  V30 END BOND\nM  V30 END CTAB\nM  END\n"
+).encode()
+"""A preset zlib dictionary of the text that recurs in molfiles and MRV files.
+
+Structures are mostly this boilerplate, so deflating them against it saves
+about a fifth over plain zlib. Stored structures depend on it: changing it
+requires a new storage format.
+"""
+
+RAW = b"\x00"
+"""The storage format of uncompressed UTF-8."""
+
+DEFLATE = b"\x01"
+"""The storage format of UTF-8 deflated against `STRUCTURE_DICTIONARY`."""
+
+
+def compress_structure(value: str) -> bytes:
+    """Encodes a structure string for storage.
+
+    Args:
+        value: The structure string.
+
+    Returns:
+        The storage format followed by the data. Structures are deflated
+        unless the `COMPRESS_STRUCTURES` compound setting is off or they do
+        not shrink.
+
+    """
+    data = value.encode()
+    if compound_settings.COMPRESS_STRUCTURES:
+        compressor = zlib.compressobj(
+            zlib.Z_BEST_COMPRESSION, zdict=STRUCTURE_DICTIONARY
+        )
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) < len(data):
+            return DEFLATE + compressed
+    return RAW + data
+
+
+def decompress_structure(value: bytes) -> str:
+    """Decodes a stored structure string.
+
+    Args:
+        value: The stored structure, in any storage format.
+
+    Returns:
+        The structure string.
+
+    Raises:
+        ValueError: If the storage format is unknown.
+
+    """
+    value = bytes(value)
+    storage_format, data = value[:1], value[1:]
+    if storage_format == DEFLATE:
+        decompressor = zlib.decompressobj(zdict=STRUCTURE_DICTIONARY)
+        data = decompressor.decompress(data) + decompressor.flush()
+    elif storage_format != RAW:
+        raise ValueError(f"Unknown structure storage format {storage_format!r}.")
+    return data.decode()
+
 
 class StructureDescriptor(DeferredAttribute):
     """Sets both Compound.structure and SubCompound.StructureAliasField."""
@@ -32,3 +111,51 @@ class StructureAliasField(models.Field):
         super().contribute_to_class(cls, name, private_only=True)
         self.column = "structure"
         self.model = apps.get_model("compound", "BaseCompound", require_ready=False)
+
+    @property
+    def target(self):
+        """The `structure` field this field aliases."""
+        return self.model._meta.get_field("structure")
+
+    def get_prep_value(self, value):
+        return self.target.get_prep_value(value)
+
+    def from_db_value(self, value, expression, connection):
+        return self.target.from_db_value(value, expression, connection)
+
+
+class CompressedTextField(models.BinaryField):
+    """A text field that is stored compressed, see `compress_structure`.
+
+    Values are strings in Python and binary in the database, where only
+    `isnull` lookups are meaningful. Unlike other binary fields it is
+    editable and serializes as plain text.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("editable", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs.pop("editable", None)
+        return name, path, args, kwargs
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if isinstance(value, str):
+            return compress_structure(value)
+        return value
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decompress_structure(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return decompress_structure(value)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
@@ -1,42 +1,274 @@
+import re
+
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, When
+from rest_framework.exceptions import ValidationError
+
 from django_filters import rest_framework as filters
+from indigo import IndigoException
+from partialsmiles.elements import elements
 
-from chemreg.compound.models import DefinedCompound
+from chemreg.compound.exceptions import SimilarityIndexUnavailable, budget_exception
+from chemreg.compound.models import (
+    CompoundComponent,
+    DefinedCompound,
+    ElementCount,
+    IllDefinedCompound,
+)
+from chemreg.compound.search import (
+    SimilarityIndexMissing,
+    search_similar,
+    search_substructure,
+)
+from chemreg.compound.utils import (
+    format_formula,
+    hash_mrvfile,
+    hash_smiles,
+    parent_inchikey,
+    parse_formula,
+    split_inchikey,
+)
 from chemreg.compound.validators import (
     validate_inchikey_computable,
     validate_molfile_v2000,
     validate_molfile_v3000,
     validate_smiles,
+    validate_structure_size,
 )
-from chemreg.indigo.inchi import get_inchikey
-from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.budget import BudgetExceeded
+from chemreg.indigo.smiles import get_canonical_smiles
+from chemreg.indigo.structure import Structure
+
+ELEMENT_TERM_PATTERN = re.compile(r"^\s*([A-Z][a-z]?)\s*(?:(<=|>=|<|>|=)\s*(\d+))?\s*$")
+"""Matches a term of the elements filter, e.g. "Cl" or "N<=2"."""
 
 
 class DefinedCompoundFilter(filters.FilterSet):
     molfile_v3000 = filters.CharFilter(method="filter_molfile_v3000", strip=False)
     molfile_v2000 = filters.CharFilter(method="filter_molfile_v2000", strip=False)
     smiles = filters.CharFilter(method="filter_smiles", strip=False)
+    inchikey_connectivity = filters.CharFilter(method="filter_inchikey_connectivity")
+    structure_connectivity = filters.CharFilter(
+        method="filter_structure_connectivity", strip=False
+    )
+    substructure = filters.CharFilter(method="filter_substructure", strip=False)
+    similar_to = filters.CharFilter(method="filter_similar_to", strip=False)
+    molecular_weight__gte = filters.NumberFilter(
+        field_name="molecular_weight", lookup_expr="gte"
+    )
+    molecular_weight__lte = filters.NumberFilter(
+        field_name="molecular_weight", lookup_expr="lte"
+    )
+    molecular_formula = filters.CharFilter(method="filter_molecular_formula")
+    elements = filters.CharFilter(method="filter_elements")
+    contains_component = filters.CharFilter(
+        method="filter_contains_component", strip=False
+    )
+    threshold = filters.NumberFilter(method="filter_threshold")
+
+    def filter_structure(self, queryset, value):
+        structure = Structure(value)
+        validate_inchikey_computable(structure)
+        return queryset.filter(inchikey=structure.inchikey)
 
     def filter_molfile_v3000(self, queryset, name, value):
+        validate_structure_size(value)
         validate_molfile_v3000(value)
-        validate_inchikey_computable(value)
-        inchikey = get_inchikey(value)
-        return queryset.filter(inchikey=inchikey)
+        return self.filter_structure(queryset, value)
 
     def filter_molfile_v2000(self, queryset, name, value):
+        validate_structure_size(value)
         validate_molfile_v2000(value)
-        validate_inchikey_computable(value)
-        inchikey = get_inchikey(value)
-        return queryset.filter(inchikey=inchikey)
+        return self.filter_structure(queryset, value)
 
     def filter_smiles(self, queryset, name, value):
+        validate_structure_size(value)
         validate_smiles(value)
-        validate_inchikey_computable(value)
-        # There is an inconsistency w/ inchikey conversion, discussion below
-        # https://github.com/Chemical-Curation/chemcurator_django/pull/224#issuecomment-675129692
-        value = get_molfile_v3000(value)
-        inchikey = get_inchikey(value)
-        return queryset.filter(inchikey=inchikey)
+        # SMILES are matched on the stored canonical SMILES rather than the
+        # InChIKey, which would need a full conversion of every query.
+        try:
+            canonical_smiles = get_canonical_smiles(value)
+        except IndigoException:
+            raise ValidationError(
+                "Canonical SMILES not computable for provided SMILES."
+            )
+        except BudgetExceeded as e:
+            raise budget_exception(e)
+        matches = Q(
+            canonical_smiles_hash=hash_smiles(canonical_smiles),
+            canonical_smiles=canonical_smiles,
+        )
+        # Compounds whose canonical SMILES was not backfilled yet are matched
+        # on the InChIKey, as all of them were before.
+        if queryset.filter(canonical_smiles_hash=None).exists():
+            try:
+                inchikey = Structure(value).inchikey
+            except IndigoException:
+                pass
+            except BudgetExceeded as e:
+                raise budget_exception(e)
+            else:
+                matches |= Q(canonical_smiles_hash=None, inchikey=inchikey)
+        return queryset.filter(matches)
+
+    def filter_connectivity(self, queryset, inchikey):
+        connectivity, protonation = split_inchikey(inchikey)
+        return queryset.filter(
+            inchikey_connectivity=connectivity, inchikey_protonation=protonation
+        )
+
+    def filter_inchikey_connectivity(self, queryset, name, value):
+        value = value.upper()
+        if len(value) == 14 and value.isalpha():
+            # A bare connectivity block matches every protonation state.
+            return queryset.filter(inchikey_connectivity=value)
+        if split_inchikey(value) == (None, None):
+            raise ValidationError(
+                "Expected an InChIKey or its 14 character connectivity block."
+            )
+        return self.filter_connectivity(queryset, value)
+
+    def filter_structure_connectivity(self, queryset, name, value):
+        validate_structure_size(value)
+        structure = Structure(value)
+        validate_inchikey_computable(structure)
+        return self.filter_connectivity(queryset, structure.inchikey)
+
+    def filter_substructure(self, queryset, name, value):
+        validate_structure_size(value)
+        try:
+            matches = search_substructure(value, queryset)
+        except IndigoException:
+            raise ValidationError("Substructure query could not be loaded.")
+        except BudgetExceeded as e:
+            raise budget_exception(e)
+        return queryset.filter(pk__in=matches)
+
+    def filter_similar_to(self, queryset, name, value):
+        validate_structure_size(value)
+        threshold = self.form.cleaned_data.get("threshold")
+        if threshold is not None:
+            threshold = float(threshold)
+            if not 0 <= threshold <= 1:
+                raise ValidationError("Threshold must be between 0 and 1.")
+        try:
+            results = search_similar(value, threshold)
+        except IndigoException:
+            raise ValidationError("Similarity query could not be loaded.")
+        except BudgetExceeded as e:
+            raise budget_exception(e)
+        except SimilarityIndexMissing:
+            raise SimilarityIndexUnavailable()
+        queryset = queryset.filter(pk__in=[pk for pk, _ in results])
+        if results and not queryset.query.order_by:
+            # Rank by similarity unless a sort order was requested.
+            queryset = queryset.order_by(
+                Case(
+                    *[When(pk=pk, then=rank) for rank, (pk, _) in enumerate(results)],
+                    output_field=IntegerField(),
+                )
+            )
+        return queryset
+
+    def filter_molecular_formula(self, queryset, name, value):
+        try:
+            counts = parse_formula(value)
+        except ValueError:
+            raise ValidationError(
+                "Expected a molecular formula such as C2H6O or C2 H6 O."
+            )
+        return queryset.filter(molecular_formula=format_formula(counts))
+
+    def filter_elements(self, queryset, name, value):
+        # Terms such as "Cl,N<=2,C>=6": a bare element must be present.
+        queryset = queryset.exclude(molecular_formula=None)
+        for term in value.split(","):
+            match = ELEMENT_TERM_PATTERN.match(term)
+            if not match:
+                raise ValidationError(
+                    f"Invalid element term '{term}'. Expected an element "
+                    "optionally followed by =, <, <=, > or >= and a count, "
+                    "e.g. Cl,N<=2."
+                )
+            element, operator, count = match.groups()
+            if element not in elements:
+                raise ValidationError(f"Unknown element '{element}'.")
+            count = int(count or 1)
+            minimum, maximum = {
+                None: (count, None),
+                "=": (count, count),
+                "<": (0, count - 1),
+                "<=": (0, count),
+                ">": (count + 1, None),
+                ">=": (count, None),
+            }[operator]
+            counts = ElementCount.objects.filter(
+                compound=OuterRef("pk"), element=element
+            )
+            if minimum > 0:
+                queryset = queryset.filter(Exists(counts.filter(count__gte=minimum)))
+            if maximum is not None:
+                queryset = queryset.filter(~Exists(counts.filter(count__gt=maximum)))
+        return queryset
+
+    def filter_contains_component(self, queryset, name, value):
+        validate_structure_size(value)
+        structure = Structure(value)
+        validate_inchikey_computable(structure)
+        try:
+            inchikeys = structure.component_inchikeys
+        except IndigoException:
+            raise ValidationError("InChIKey not computable for provided structure.")
+        except BudgetExceeded as e:
+            raise budget_exception(e)
+        # Salts are found by the parents of their ions, so the parents of the
+        # query's components must all be there.
+        for inchikey in {parent_inchikey(inchikey) for inchikey in inchikeys}:
+            queryset = queryset.filter(
+                Exists(
+                    CompoundComponent.objects.filter(
+                        compound=OuterRef("pk"), parent_inchikey=inchikey
+                    )
+                )
+            )
+        return queryset
+
+    def filter_threshold(self, queryset, name, value):
+        # Applied by `filter_similar_to`.
+        return queryset
 
     class Meta:
         model = DefinedCompound
-        fields = ["id", "inchikey", "molfile_v3000", "molfile_v2000", "smiles"]
+        fields = [
+            "id",
+            "inchikey",
+            "molfile_v3000",
+            "molfile_v2000",
+            "smiles",
+            "inchikey_connectivity",
+            "structure_connectivity",
+            "substructure",
+            "similar_to",
+            "threshold",
+            "molecular_weight__gte",
+            "molecular_weight__lte",
+            "molecular_formula",
+            "elements",
+            "contains_component",
+        ]
+
+
+class IllDefinedCompoundFilter(filters.FilterSet):
+    mrvfile = filters.CharFilter(method="filter_mrvfile", strip=False)
+
+    def filter_mrvfile(self, queryset, name, value):
+        validate_structure_size(value)
+        # Exact duplicates are matched on the hash of the canonical document,
+        # so formatting differences are ignored without parsing stored rows.
+        mrvfile_hash = hash_mrvfile(value)
+        if mrvfile_hash is None:
+            raise ValidationError("MRV document is not well-formed XML.")
+        return queryset.filter(mrvfile_hash=mrvfile_hash)
+
+    class Meta:
+        model = IllDefinedCompound
+        fields = ["id", "mrvfile"]
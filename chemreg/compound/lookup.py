@@ -0,0 +1,160 @@
+from typing import Dict, Iterable, List, Optional
+
+from indigo import IndigoException
+
+from chemreg.compound.models import DefinedCompound
+from chemreg.compound.search import QUERY_BATCH_SIZE
+from chemreg.indigo.budget import (
+    BudgetExceeded,
+    check_size,
+    record,
+    time_budget_exceeded,
+)
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.reader import MOLFILE_V2000, MOLFILE_V3000, SMILES, sniff
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import load_structure
+
+
+def registered_cids(inchikeys: Iterable[str]) -> Dict[str, str]:
+    """Finds the registered compounds with any of a set of InChIKeys.
+
+    InChIKeys are queried in batches, so there is no limit on how many are
+    looked up at once.
+
+    Args:
+        inchikeys: The InChIKeys.
+
+    Returns:
+        The CID of the first compound registered with each InChIKey, by
+        InChIKey. InChIKeys that are not registered are left out.
+
+    """
+    inchikeys = list(set(inchikeys))
+    cids: Dict[str, str] = {}
+    for start in range(0, len(inchikeys), QUERY_BATCH_SIZE):
+        for cid, inchikey in (
+            DefinedCompound.objects.filter(
+                inchikey__in=inchikeys[start : start + QUERY_BATCH_SIZE]
+            )
+            .order_by("pk")
+            .values_list("pk", "inchikey")
+        ):
+            cids.setdefault(inchikey, cid)
+    return cids
+
+
+class LookedUpStructure:
+    """A submitted structure matched to a registered compound.
+
+    Args:
+        pk: The position of the structure in the request.
+        inchikey: The InChIKey, if it could be computed.
+        error: Why the InChIKey could not be computed.
+
+    Attributes:
+        cid (str): The CID of a registered compound with the same InChIKey.
+
+    """
+
+    def __init__(self, pk: int, inchikey: Optional[str], error: Optional[str]):
+        self.pk = pk
+        self.inchikey = inchikey
+        self.error = error
+        self.cid: Optional[str] = None
+
+
+def compute_lookup_inchikey(structure: str) -> dict:
+    """Computes the InChIKey a structure would be registered with.
+
+    Nothing else is computed, so this is cheaper than `compute_structure`.
+    This runs in the process pool, so it neither caches nor queries anything.
+
+    Args:
+        structure: A molfile (either v2000 or v3000) or SMILES string.
+
+    Returns:
+        The InChIKey under "inchikey". If Indigo fails or a budget is
+        exceeded, the exception is stored under "error" instead.
+
+    """
+    try:
+        check_size(structure)
+    except BudgetExceeded as e:
+        return {"error": e}
+    with indigo_pool.session() as session:
+        session.indigo.setOption("molfile-saving-mode", "3000")
+        session.indigo.setOption("timeout", int(indigo_settings.TIMEOUT * 1000))
+        try:
+            molecule, _ = load_structure(session, structure)
+            inchi = session.inchi.getInchi(molecule)
+            return {"inchikey": session.inchi.getInchiKey(inchi)}
+        except IndigoException as e:
+            # Indigo reports its "timeout" option through the message alone.
+            return {"error": time_budget_exceeded() if "timed out" in str(e) else e}
+        except BudgetExceeded as e:
+            return {"error": e}
+
+
+def lookup_error(computed: dict) -> Optional[str]:
+    """The message for a structure whose InChIKey could not be computed."""
+    error = computed.get("error")
+    if error is None:
+        return None
+    if isinstance(error, BudgetExceeded):
+        return str(error)
+    return "InChIKey not computable for provided structure."
+
+
+def lookup_structures(structures: List[str]) -> List[LookedUpStructure]:
+    """Matches structures to registered compounds.
+
+    InChIKeys are computed across the process pool and resolved to CIDs in a
+    single query. Structures that are not SMILES or single molfiles are not
+    computed at all.
+
+    Args:
+        structures: Molfiles (either v2000 or v3000) or SMILES strings.
+
+    Returns:
+        The looked up structures in the order given.
+
+    Raises:
+        TimeBudgetExceeded: If the pool did not compute the InChIKeys within
+            the time budget of each structure.
+
+    """
+    supported = [
+        pk
+        for pk, structure in enumerate(structures)
+        if sniff(structure) in (SMILES, MOLFILE_V2000, MOLFILE_V3000)
+    ]
+    try:
+        computed = process_pool.map(
+            compute_lookup_inchikey,
+            [structures[pk] for pk in supported],
+            timeout=indigo_settings.TIMEOUT,
+        )
+    except TimeoutError:
+        raise time_budget_exceeded()
+    results = dict(zip(supported, computed))
+    looked_up = []
+    for pk in range(len(structures)):
+        if pk not in results:
+            looked_up.append(
+                LookedUpStructure(
+                    pk, None, "Structure is not a SMILES string or a single molfile."
+                )
+            )
+            continue
+        computed = results[pk]
+        record(computed)
+        looked_up.append(
+            LookedUpStructure(pk, computed.get("inchikey"), lookup_error(computed))
+        )
+
+    cids = registered_cids(s.inchikey for s in looked_up if s.inchikey)
+    for s in looked_up:
+        s.cid = cids.get(s.inchikey)
+    return looked_up
@@ -0,0 +1,225 @@
+import csv
+import json
+import os
+from typing import Dict, List
+
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+
+from chemreg.compound.lookup import compute_lookup_inchikey, lookup_error
+from chemreg.compound.models import DefinedCompound
+from chemreg.indigo.budget import record
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.settings import indigo_settings
+
+REPORT_FIELDS = ["cid", "issue", "inchikey", "computed_inchikey", "detail"]
+"""The columns of the report.
+
+The issue is one of:
+
+* "mismatch": The stored InChIKey is not the one computed now.
+* "error": No InChIKey can be computed now, see `detail`.
+* "collision": The computed InChIKey is stored for the compounds in `detail`.
+* "duplicate": The stored InChIKey is shared with the compounds in `detail`.
+"""
+
+
+class Report:
+    """Appends issues to a CSV file or to a JSON file with one object per line.
+
+    Appending keeps the issues found before a resumed run.
+    """
+
+    def __init__(self, path: str, report_format: str):
+        self.format = report_format
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        if self.format == "csv":
+            self.writer = csv.DictWriter(self.file, REPORT_FIELDS)
+            if new:
+                self.writer.writeheader()
+
+    def write(self, issues: List[Dict[str, str]]) -> None:
+        for issue in issues:
+            if self.format == "csv":
+                self.writer.writerow(issue)
+            else:
+                self.file.write(json.dumps(issue) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def report_row(
+    cid: str, issue: str, inchikey: str, computed_inchikey=None, detail=""
+) -> Dict[str, str]:
+    """A row of the report, see `REPORT_FIELDS`."""
+    return {
+        "cid": cid,
+        "issue": issue,
+        "inchikey": inchikey,
+        "computed_inchikey": computed_inchikey,
+        "detail": detail,
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares stored defined compound InChIKeys with those computed now"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--report",
+            default="inchikey_audit.csv",
+            help="The file to append the issues found to.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["csv", "json"],
+            default="csv",
+            help="Write the report as CSV or as one JSON object per line.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of compounds computed per query.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help=(
+                "Record progress in this file after every chunk, and resume from "
+                "it if it exists. It is removed once the audit is done."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        self.stdout.write(self.style.MIGRATE_HEADING("Auditing InChIKeys"))
+        checkpoint = options["checkpoint"]
+        progress = {"last_cid": "", "audited": 0, "issues": 0}
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                progress = json.load(f)
+            self.stdout.write(f"Resuming after CID {progress['last_cid']}")
+
+        report = Report(options["report"], options["format"])
+        try:
+            qs = DefinedCompound.objects.order_by("pk").values_list(
+                "pk", "inchikey", "structure"
+            )
+            while True:
+                chunk = list(
+                    qs.filter(pk__gt=progress["last_cid"])[: options["chunk_size"]]
+                )
+                if not chunk:
+                    break
+                issues = self.audit_chunk(chunk)
+                report.write(issues)
+                progress["last_cid"] = chunk[-1][0]
+                progress["audited"] += len(chunk)
+                progress["issues"] += len(issues)
+                if checkpoint:
+                    # Replacing the file whole leaves a valid one if interrupted.
+                    with open(checkpoint + ".tmp", "w") as f:
+                        json.dump(progress, f)
+                    os.replace(checkpoint + ".tmp", checkpoint)
+                self.stdout.write(
+                    f"Audited {progress['audited']} compounds, found "
+                    f"{progress['issues']} issues (last CID {progress['last_cid']})"
+                )
+            duplicates = self.find_duplicates()
+            report.write(duplicates)
+        finally:
+            report.close()
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Done: {progress['issues'] + len(duplicates)} issues in "
+                f"{options['report']}"
+            )
+        )
+
+    def audit_chunk(self, chunk: List[tuple]) -> List[Dict[str, str]]:
+        """Recomputes the InChIKeys of a chunk of compounds across the process pool.
+
+        Args:
+            chunk: `(cid, inchikey, structure)` tuples.
+
+        Returns:
+            The mismatches, errors and collisions found.
+
+        """
+        try:
+            results = process_pool.map(
+                compute_lookup_inchikey,
+                [structure for _, _, structure in chunk],
+                timeout=indigo_settings.TIMEOUT,
+            )
+        except TimeoutError:
+            raise CommandError(
+                f"A structure of CIDs {chunk[0][0]} to {chunk[-1][0]} exceeded "
+                "the time budget."
+            )
+        issues = []
+        mismatches = {}
+        for (cid, inchikey, _), computed in zip(chunk, results):
+            record(computed)
+            computed_inchikey = computed.get("inchikey")
+            if computed_inchikey is None:
+                issues.append(
+                    report_row(cid, "error", inchikey, None, lookup_error(computed))
+                )
+            elif computed_inchikey != inchikey:
+                issues.append(report_row(cid, "mismatch", inchikey, computed_inchikey))
+                mismatches[cid] = (inchikey, computed_inchikey)
+
+        # A drifted compound may now compute to another compound's InChIKey.
+        holders: Dict[str, List[str]] = {}
+        for cid, inchikey in (
+            DefinedCompound.objects.filter(
+                inchikey__in={computed for _, computed in mismatches.values()}
+            )
+            .order_by("pk")
+            .values_list("pk", "inchikey")
+        ):
+            holders.setdefault(inchikey, []).append(cid)
+        for cid, (inchikey, computed_inchikey) in mismatches.items():
+            others = [
+                other for other in holders.get(computed_inchikey, []) if other != cid
+            ]
+            if others:
+                issues.append(
+                    report_row(
+                        cid, "collision", inchikey, computed_inchikey, " ".join(others)
+                    )
+                )
+        return issues
+
+    def find_duplicates(self) -> List[Dict[str, str]]:
+        """Finds the compounds that share their stored InChIKey with others."""
+        inchikeys = (
+            DefinedCompound.objects.exclude(inchikey=None)
+            .order_by()
+            .values("inchikey")
+            .annotate(count=Count("pk"))
+            .filter(count__gt=1)
+            .values("inchikey")
+        )
+        groups: Dict[str, List[str]] = {}
+        for cid, inchikey in (
+            DefinedCompound.objects.filter(inchikey__in=inchikeys)
+            .order_by("pk")
+            .values_list("pk", "inchikey")
+        ):
+            groups.setdefault(inchikey, []).append(cid)
+        return [
+            report_row(
+                cid, "duplicate", inchikey, None, " ".join(c for c in cids if c != cid)
+            )
+            for inchikey, cids in groups.items()
+            for cid in cids
+        ]
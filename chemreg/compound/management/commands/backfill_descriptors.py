@@ -0,0 +1,82 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from chemreg.compound.models import DefinedCompound, update_descriptor_rows
+from chemreg.compound.search import fingerprints_changed
+
+DESCRIPTOR_FIELDS = [
+    "molecular_weight",
+    "molecular_formula",
+    "smiles",
+    "canonical_smiles",
+    "canonical_smiles_hash",
+    "calculated_inchikey",
+    "component_inchikeys",
+    "substructure_fingerprint",
+    "similarity_fingerprint",
+    "serialized_structure",
+]
+
+
+class Command(BaseCommand):
+    help = "Computes the stored descriptors of defined compounds"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute every compound, not only those missing descriptors.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of compounds updated per transaction.",
+        )
+        parser.add_argument(
+            "--start-after",
+            default="",
+            help="Resume after this CID, as printed by an interrupted run.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.MIGRATE_HEADING("Backfilling defined compound descriptors")
+        )
+        qs = DefinedCompound.objects.with_deleted().order_by("pk")
+        if not options["all"]:
+            qs = qs.filter(
+                Q(calculated_inchikey__isnull=True)
+                | Q(substructure_fingerprint__isnull=True)
+                | Q(similarity_fingerprint__isnull=True)
+                | Q(canonical_smiles__isnull=True)
+                | Q(serialized_structure__isnull=True)
+                | Q(component_inchikeys__isnull=True)
+            )
+        qs = qs.only("pk", "structure", *DESCRIPTOR_FIELDS)
+
+        last_pk = options["start_after"]
+        updated = 0
+        while True:
+            chunk = list(qs.filter(pk__gt=last_pk)[: options["chunk_size"]])
+            if not chunk:
+                break
+            # Bulk updates skip `auto_now`, but the fingerprint indexes only
+            # reload the compounds updated since their previous refresh.
+            now = timezone.now()
+            for compound in chunk:
+                compound.update_descriptors()
+                compound.updated_at = now
+            with transaction.atomic():
+                DefinedCompound.objects.bulk_update(
+                    chunk, DESCRIPTOR_FIELDS + ["updated_at"]
+                )
+                update_descriptor_rows(chunk)
+            updated += len(chunk)
+            last_pk = chunk[-1].pk
+            fingerprints_changed()
+            self.stdout.write(f"Updated {updated} compounds (last CID {last_pk})")
+
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,40 @@
+from django.core.management import BaseCommand, CommandError
+
+from chemreg.compound.benchmarks import BENCHMARKS, OPT_IN_BENCHMARKS, load_corpus
+
+
+class Command(BaseCommand):
+    help = "Times structure handling against the compound test corpus"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "benchmarks",
+            nargs="*",
+            help=(
+                f"The benchmarks to run, from {sorted(BENCHMARKS)}. Runs all "
+                f"but {sorted(OPT_IN_BENCHMARKS)} by default."
+            ),
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=1000,
+            help="The number of corpus structures to use.",
+        )
+
+    def handle(self, *args, **options):
+        names = options["benchmarks"] or sorted(set(BENCHMARKS) - OPT_IN_BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {sorted(unknown)}")
+        corpus = load_corpus()[: options["limit"]]
+        for name in names:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            results = list(BENCHMARKS[name](corpus))
+            baseline = results[0][1]
+            for label, seconds in results:
+                per_call = seconds / len(corpus) * 1e6
+                self.stdout.write(
+                    f"  {label}: {per_call:.1f} us/structure "
+                    f"({baseline / seconds:.2f}x)"
+                )
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand
+
+from chemreg.compound.search import similarity_index
+
+
+class Command(BaseCommand):
+    help = "Builds the similarity index of defined compounds on this host"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild the index from scratch rather than update it.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"Building the similarity index in {similarity_index.directory}"
+            )
+        )
+        similarity_index.build(full=options["full"])
+        similarity_index.refresh()
+        self.stdout.write(
+            self.style.SUCCESS(f"Done, {len(similarity_index)} compounds indexed")
+        )
@@ -0,0 +1,56 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from chemreg.compound.export import CHUNK_SIZE, export_sdf
+from chemreg.compound.models import DefinedCompound
+
+
+class Command(BaseCommand):
+    help = "Exports defined compounds as an SD file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?", default="-", help="The SD file, or - for stdout."
+        )
+        parser.add_argument(
+            "--cid",
+            action="append",
+            default=[],
+            help="Export only this compound. May be repeated.",
+        )
+        parser.add_argument(
+            "--include-deleted",
+            action="store_true",
+            help="Also export the compounds that were replaced by others.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help="The number of compounds fetched from the database at a time.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        qs = DefinedCompound.objects.with_deleted()
+        if not options["include_deleted"]:
+            qs = qs.filter_deleted()
+        if options["cid"]:
+            qs = qs.filter(pk__in=options["cid"])
+
+        to_stdout = options["path"] == "-"
+        out = sys.stdout if to_stdout else open(options["path"], "w")
+        count = 0
+        try:
+            for sdf_record in export_sdf(qs, options["chunk_size"]):
+                out.write(sdf_record)
+                count += 1
+        finally:
+            if not to_stdout:
+                out.close()
+        # Progress goes to stderr so that stdout holds only the SD file.
+        self.stderr.write(
+            self.style.SUCCESS(f"Exported {count} compounds to {options['path']}")
+        )
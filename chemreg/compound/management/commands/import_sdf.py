@@ -0,0 +1,201 @@
+import bz2
+import csv
+import gzip
+import itertools
+import os
+import pickle
+from typing import IO, Iterator, List, Tuple
+
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from chemreg.compound.lookup import registered_cids
+from chemreg.compound.models import DefinedCompound, update_descriptor_rows
+from chemreg.compound.search import fingerprints_changed
+from chemreg.compound.standardize import standardize
+from chemreg.compound.utils import hash_smiles
+from chemreg.indigo.budget import record
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.reader import read_sdf
+from chemreg.indigo.settings import indigo_settings
+
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open}
+SDF_EXTENSIONS = {".sdf", ".sd", ".mol"}
+SMILES_EXTENSIONS = {".smi", ".smiles", ".txt"}
+
+
+def open_structures(path: str, mode: str = "rt") -> IO:
+    """Opens a plain, gzip or bz2 compressed file by its extension."""
+    opener = OPENERS.get(os.path.splitext(path)[1].lower(), open)
+    return opener(path, mode)
+
+
+def read_structures(path: str) -> Iterator[str]:
+    """Iterates over the structures in an SD file, SMILES list or pickled corpus.
+
+    The format is taken from the extension, ignoring any compression. SD
+    files and SMILES lists are streamed; a pickled corpus, i.e. an iterable
+    of SMILES strings, has to be loaded whole.
+    """
+    root, extension = os.path.splitext(path.lower())
+    if extension in OPENERS:
+        root, extension = os.path.splitext(root)
+    if extension in SDF_EXTENSIONS:
+        with open_structures(path) as f:
+            for sdf_record in read_sdf(f):
+                yield sdf_record.molfile
+    elif extension in SMILES_EXTENSIONS:
+        with open_structures(path) as f:
+            for line in f:
+                # SMILES lists may name each structure after the SMILES.
+                fields = line.split(None, 1)
+                yield fields[0] if fields else ""
+    else:
+        with open_structures(path, "rb") as f:
+            yield from pickle.load(f)
+
+
+def chunks(iterable, size) -> Iterator[List]:
+    """Splits an iterable into lists of `size` items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Imports defined compounds from an SD file or SMILES list"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help=(
+                "An SD file (.sdf, .sd, .mol), SMILES list (.smi, .smiles, .txt) "
+                "or pickled list of SMILES, optionally compressed (.gz, .bz2)."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of records processed and stored per transaction.",
+        )
+        parser.add_argument(
+            "--offset",
+            type=int,
+            default=0,
+            help="Skip this many records, as printed by an interrupted run.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Stop after this many records.",
+        )
+        parser.add_argument(
+            "--rejected",
+            default=None,
+            help="Write the rejected records to this tab separated file.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"Importing defined compounds from {options['path']}"
+            )
+        )
+        offset = options["offset"]
+        stop = None if options["limit"] is None else offset + options["limit"]
+        structures = itertools.islice(read_structures(options["path"]), offset, stop)
+
+        rejected_file = None
+        if options["rejected"]:
+            # Appending keeps the records rejected before a resumed run.
+            rejected_file = open(options["rejected"], "a", newline="")
+        imported = rejected = 0
+        try:
+            for chunk in chunks(structures, options["chunk_size"]):
+                compounds, rejects = self.import_chunk(chunk, offset)
+                imported += len(compounds)
+                rejected += len(rejects)
+                offset += len(chunk)
+                if rejected_file:
+                    csv.writer(rejected_file, delimiter="\t").writerows(rejects)
+                    rejected_file.flush()
+                self.stdout.write(
+                    f"Imported {imported}, rejected {rejected} (next offset {offset})"
+                )
+        finally:
+            if rejected_file:
+                rejected_file.close()
+        self.stdout.write(self.style.SUCCESS("Done"))
+
+    def import_chunk(
+        self, chunk: List[str], offset: int
+    ) -> Tuple[List[DefinedCompound], List[Tuple[int, str]]]:
+        """Standardizes and stores a chunk of structures.
+
+        Duplicates are found with one query per chunk. Earlier chunks are
+        already stored by then, so only duplicates within the chunk need to
+        be tracked separately.
+
+        Args:
+            chunk: The structures.
+            offset: The record number of the first structure.
+
+        Returns:
+            The compounds created and `(record number, reason)` pairs for the
+            records that were not.
+
+        """
+        try:
+            results = process_pool.map(
+                standardize, chunk, timeout=indigo_settings.TIMEOUT
+            )
+        except TimeoutError:
+            raise CommandError(
+                f"A structure in records {offset} to {offset + len(chunk) - 1} "
+                "exceeded the time budget."
+            )
+        inchikeys = {r["computed"].get("inchikey") for r in results} - {None}
+        registered = registered_cids(inchikeys)
+        seen = {}
+        compounds = []
+        rejects = []
+        for number, result in enumerate(results, offset):
+            computed = result["computed"]
+            record(computed)
+            inchikey = computed.get("inchikey")
+            if result["validation_errors"]:
+                rejects.append((number, " ".join(result["validation_errors"])))
+            elif inchikey in registered:
+                rejects.append((number, f"Duplicate of {registered[inchikey]}"))
+            elif inchikey in seen:
+                rejects.append((number, f"Duplicate of record {seen[inchikey]}"))
+            else:
+                seen[inchikey] = number
+                compound = DefinedCompound(
+                    molfile_v3000=computed["molfile_v3000"],
+                    inchikey=inchikey,
+                    molecular_weight=computed["molecular_weight"],
+                    molecular_formula=computed["molecular_formula"],
+                    smiles=computed["smiles"],
+                    canonical_smiles=computed["canonical_smiles"],
+                    canonical_smiles_hash=hash_smiles(computed["canonical_smiles"]),
+                    calculated_inchikey=inchikey,
+                    component_inchikeys=" ".join(computed["component_inchikeys"]),
+                    substructure_fingerprint=computed["substructure_fingerprint"],
+                    similarity_fingerprint=computed["similarity_fingerprint"],
+                    serialized_structure=computed["serialized"],
+                )
+                compound.update_inchikey_blocks()
+                compounds.append(compound)
+        with transaction.atomic():
+            DefinedCompound.objects.bulk_create(compounds)
+            update_descriptor_rows(compounds)
+        fingerprints_changed()
+        return compounds, rejects
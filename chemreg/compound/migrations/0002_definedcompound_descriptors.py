@@ -0,0 +1,32 @@
+# Generated by Django 3.0.3 on 2026-10-18 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0001_vega_sprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definedcompound",
+            name="calculated_inchikey",
+            field=models.CharField(max_length=29, null=True),
+        ),
+        migrations.AddField(
+            model_name="definedcompound",
+            name="molecular_formula",
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="definedcompound",
+            name="molecular_weight",
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name="definedcompound",
+            name="smiles",
+            field=models.TextField(null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.3 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0002_definedcompound_descriptors"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definedcompound",
+            name="substructure_fingerprint",
+            field=models.BinaryField(null=True),
+        ),
+    ]
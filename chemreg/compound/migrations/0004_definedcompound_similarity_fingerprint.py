@@ -0,0 +1,17 @@
+# Generated by Django 3.0.3 on 2026-10-18 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0003_definedcompound_substructure_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definedcompound",
+            name="similarity_fingerprint",
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.0.3 on 2026-10-18 14:12
+
+from django.db import migrations, models
+from django.db.models.functions import Substr
+
+
+def split_inchikeys(apps, schema_editor):
+    DefinedCompound = apps.get_model("compound", "DefinedCompound")
+    DefinedCompound.objects.filter(
+        inchikey__regex=r"^[A-Z]{14}-[A-Z]{10}-[A-Z]$"
+    ).update(
+        inchikey_connectivity=Substr("inchikey", 1, 14),
+        inchikey_protonation=Substr("inchikey", 27, 1),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0004_definedcompound_similarity_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definedcompound",
+            name="inchikey_connectivity",
+            field=models.CharField(max_length=14, null=True),
+        ),
+        migrations.AddField(
+            model_name="definedcompound",
+            name="inchikey_protonation",
+            field=models.CharField(max_length=1, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="definedcompound",
+            index=models.Index(
+                fields=["inchikey_connectivity", "inchikey_protonation"],
+                name="compound_de_inchike_b60dd6_idx",
+            ),
+        ),
+        migrations.RunPython(split_inchikeys, migrations.RunPython.noop),
+    ]
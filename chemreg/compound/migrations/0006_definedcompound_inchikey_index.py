@@ -0,0 +1,17 @@
+# Generated by Django 3.0.3 on 2026-10-18 14:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0005_definedcompound_inchikey_blocks"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="definedcompound",
+            name="inchikey",
+            field=models.CharField(db_index=True, max_length=29, null=True),
+        ),
+    ]
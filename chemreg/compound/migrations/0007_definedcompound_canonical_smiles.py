@@ -0,0 +1,22 @@
+# Generated by Django 3.0.3 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0006_definedcompound_inchikey_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definedcompound",
+            name="canonical_smiles",
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name="definedcompound",
+            name="canonical_smiles_hash",
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.0.3 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+import chemreg.compound.fields
+
+BATCH_SIZE = 1000
+
+
+def copy_structures(apps, source, target):
+    BaseCompound = apps.get_model("compound", "BaseCompound")
+    qs = BaseCompound.objects.order_by("pk").only("pk", source)
+    last_pk = ""
+    while True:
+        chunk = list(qs.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not chunk:
+            break
+        for compound in chunk:
+            setattr(compound, target, getattr(compound, source))
+        BaseCompound.objects.bulk_update(chunk, [target])
+        last_pk = chunk[-1].pk
+
+
+def compress_structures(apps, schema_editor):
+    copy_structures(apps, "structure", "compressed_structure")
+
+
+def decompress_structures(apps, schema_editor):
+    copy_structures(apps, "compressed_structure", "structure")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0007_definedcompound_canonical_smiles"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="basecompound",
+            name="compressed_structure",
+            field=chemreg.compound.fields.CompressedTextField(null=True),
+        ),
+        # Reversing re-adds the old column before it is filled.
+        migrations.AlterField(
+            model_name="basecompound",
+            name="structure",
+            field=models.TextField(null=True),
+        ),
+        migrations.RunPython(compress_structures, decompress_structures),
+        migrations.RemoveField(
+            model_name="basecompound",
+            name="structure",
+        ),
+        migrations.RenameField(
+            model_name="basecompound",
+            old_name="compressed_structure",
+            new_name="structure",
+        ),
+        migrations.AlterField(
+            model_name="basecompound",
+            name="structure",
+            field=chemreg.compound.fields.CompressedTextField(),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0008_basecompound_compressed_structure"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definedcompound",
+            name="serialized_structure",
+            field=models.BinaryField(null=True),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import chemreg.common.utils
+from chemreg.compound.utils import parse_formula
+
+BATCH_SIZE = 1000
+
+
+def fill_element_counts(apps, schema_editor):
+    DefinedCompound = apps.get_model("compound", "DefinedCompound")
+    ElementCount = apps.get_model("compound", "ElementCount")
+    qs = (
+        DefinedCompound.objects.exclude(molecular_formula=None)
+        .order_by("pk")
+        .values_list("pk", "molecular_formula")
+    )
+    last_pk = ""
+    while True:
+        chunk = list(qs.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not chunk:
+            break
+        ElementCount.objects.bulk_create(
+            ElementCount(compound_id=pk, element=element, count=count)
+            for pk, formula in chunk
+            for element, count in parse_formula(formula).items()
+        )
+        last_pk = chunk[-1][0]
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("compound", "0009_definedcompound_serialized_structure"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="definedcompound",
+            name="molecular_formula",
+            field=models.CharField(db_index=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name="definedcompound",
+            name="molecular_weight",
+            field=models.FloatField(db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="ElementCount",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("element", models.CharField(max_length=3)),
+                ("count", models.PositiveIntegerField()),
+                (
+                    "compound",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="element_counts",
+                        to="compound.DefinedCompound",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        default=chemreg.common.utils.get_current_user_pk,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="elementcount_created_by_set",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="elementcount_updated_by_set",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["pk"],
+                "abstract": False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name="elementcount",
+            index=models.Index(
+                fields=["element", "count"], name="compound_el_element_7c0b52_idx"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="elementcount",
+            unique_together={("compound", "element")},
+        ),
+        migrations.RunPython(fill_element_counts, migrations.RunPython.noop),
+    ]
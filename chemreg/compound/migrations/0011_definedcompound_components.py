@@ -0,0 +1,74 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import chemreg.common.utils
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("compound", "0010_definedcompound_element_counts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definedcompound",
+            name="component_inchikeys",
+            field=models.TextField(null=True),
+        ),
+        migrations.CreateModel(
+            name="CompoundComponent",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("inchikey", models.CharField(max_length=29)),
+                ("parent_inchikey", models.CharField(db_index=True, max_length=29)),
+                (
+                    "compound",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="components",
+                        to="compound.DefinedCompound",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        default=chemreg.common.utils.get_current_user_pk,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="compoundcomponent_created_by_set",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="compoundcomponent_updated_by_set",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["pk"],
+                "abstract": False,
+                "unique_together": {("compound", "inchikey")},
+            },
+        ),
+    ]
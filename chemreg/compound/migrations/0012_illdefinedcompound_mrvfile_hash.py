@@ -0,0 +1,36 @@
+# Generated by Django 3.0.3 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+from chemreg.compound.utils import hash_mrvfile
+
+BATCH_SIZE = 1000
+
+
+def fill_mrvfile_hashes(apps, schema_editor):
+    IllDefinedCompound = apps.get_model("compound", "IllDefinedCompound")
+    qs = IllDefinedCompound.objects.order_by("pk").only("pk", "structure")
+    last_pk = ""
+    while True:
+        chunk = list(qs.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not chunk:
+            break
+        for compound in chunk:
+            compound.mrvfile_hash = hash_mrvfile(compound.structure)
+        IllDefinedCompound.objects.bulk_update(chunk, ["mrvfile_hash"])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("compound", "0011_definedcompound_components"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="illdefinedcompound",
+            name="mrvfile_hash",
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_mrvfile_hashes, migrations.RunPython.noop),
+    ]
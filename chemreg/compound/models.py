@@ -1,5 +1,4 @@
-from django.db import models
-from django.utils.functional import cached_property
+from django.db import models, transaction
 
 from indigo import Indigo, IndigoException
 from polymorphic.models import PolymorphicManager, PolymorphicModel
@@ -7,13 +6,22 @@ from polymorphic.query import PolymorphicQuerySet
 
 from chemreg.common.models import CommonInfo, ControlledVocabulary
 from chemreg.common.validators import validate_deprecated
-from chemreg.compound.fields import StructureAliasField
-from chemreg.compound.utils import build_cid
+from chemreg.compound.fields import CompressedTextField, StructureAliasField
+from chemreg.compound.utils import (
+    build_cid,
+    hash_mrvfile,
+    hash_smiles,
+    parent_inchikey,
+    parse_formula,
+    split_inchikey,
+)
 from chemreg.compound.validators import (
     validate_inchikey_computable,
     validate_molfile_v3000,
 )
+from chemreg.indigo.budget import BudgetExceeded
 from chemreg.indigo.inchi import get_inchikey
+from chemreg.indigo.structure import Structure
 
 
 class SoftDeleteCompoundQuerySet(PolymorphicQuerySet):
@@ -30,6 +38,35 @@ class SoftDeleteCompoundQuerySet(PolymorphicQuerySet):
             )
         return super().delete()
 
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False):
+        """Bulk creates compounds, including those of concrete compound models.
+
+        Django cannot bulk create multi-table inherited models because it does
+        not learn autoincremented parent keys from a bulk insert. CIDs are
+        assigned before compounds are saved, so the `BaseCompound` rows are
+        inserted first and the rows of the concrete model follow with the same
+        keys. No save signals are sent.
+        """
+        parents = self.model._meta.parents
+        if not parents:
+            return super().bulk_create(objs, batch_size, ignore_conflicts)
+        ((parent, link),) = parents.items()
+        objs = list(objs)
+        for obj in objs:
+            setattr(obj, link.attname, getattr(obj, parent._meta.pk.attname))
+        with transaction.atomic(using=self.db, savepoint=False):
+            parent.objects.db_manager(self.db).bulk_create(
+                objs, batch_size, ignore_conflicts
+            )
+            self._for_write = True
+            self._batched_insert(
+                objs,
+                self.model._meta.local_concrete_fields,
+                batch_size,
+                ignore_conflicts,
+            )
+        return objs
+
 
 class SoftDeleteCompoundManager(PolymorphicManager):
     """Filters out the soft deleted compounds."""
@@ -55,7 +92,7 @@ class BaseCompound(PolymorphicModel, CommonInfo):
 
     Attributes:
         id (str): The compound CID.
-        structure (str): Definitive structure string
+        structure (str): Definitive structure string, stored compressed
         replaced_by (foreign key): A user deleted the compound and specified this CID as the replacement
         qc_note (str): An explanation of why the compound was deleted and replaced
     """
@@ -63,7 +100,7 @@ class BaseCompound(PolymorphicModel, CommonInfo):
     id = models.CharField(
         default=build_cid, primary_key=True, max_length=50, unique=True
     )
-    structure = models.TextField()
+    structure = CompressedTextField()
     # soft delete functionality
     replaced_by = models.ForeignKey(
         "self",
@@ -100,32 +137,238 @@ class BaseCompound(PolymorphicModel, CommonInfo):
 class DefinedCompound(BaseCompound):
     """A defined compound.
 
+    The descriptors are computed from the structure when the compound is saved
+    with a new structure. The element counts and components, see `ElementCount`
+    and `CompoundComponent`, are replaced once it is saved. Compounds
+    registered before they were stored can be filled in with the
+    `backfill_descriptors` management command.
+
     Attributes:
         molfile_v3000 (str): A v3000 molfile. Alias to definitive structure string.
         inchikey (str): A hashed key based off of the chemical structure.
+        inchikey_connectivity (str): The connectivity block of the InChIKey,
+            shared by stereoisomers.
+        inchikey_protonation (str): The protonation flag of the InChIKey.
+        molecular_weight (float): The molecular weight [g/mol].
+        molecular_formula (str): The gross formula.
+        smiles (str): A SMILES string computed from the structure.
+        canonical_smiles (str): The canonical SMILES computed from the
+            structure, see `chemreg.indigo.smiles`.
+        canonical_smiles_hash (str): The indexed SHA-256 digest of the
+            canonical SMILES.
+        calculated_inchikey (str): The InChIKey computed from the structure.
+        component_inchikeys (str): The InChIKeys of the components computed
+            from the structure, separated by spaces.
+        substructure_fingerprint (bytes): The Indigo substructure fingerprint
+            used to screen substructure searches, see `chemreg.compound.search`.
+        similarity_fingerprint (bytes): The Indigo similarity fingerprint used
+            for similarity searches, see `chemreg.compound.search`.
+        serialized_structure (bytes): The molecule in Indigo's binary format,
+            which `indigo_structure` loads without parsing the molfile.
 
     """
 
     molfile_v3000 = StructureAliasField(
         validators=[validate_molfile_v3000, validate_inchikey_computable]
     )
-    inchikey = models.CharField(null=True, max_length=29)
+    inchikey = models.CharField(null=True, max_length=29, db_index=True)
+    inchikey_connectivity = models.CharField(null=True, max_length=14)
+    inchikey_protonation = models.CharField(null=True, max_length=1)
+    molecular_weight = models.FloatField(null=True, db_index=True)
+    molecular_formula = models.CharField(null=True, max_length=255, db_index=True)
+    smiles = models.TextField(null=True)
+    canonical_smiles = models.TextField(null=True)
+    canonical_smiles_hash = models.CharField(null=True, max_length=64, db_index=True)
+    calculated_inchikey = models.CharField(null=True, max_length=29)
+    component_inchikeys = models.TextField(null=True)
+    substructure_fingerprint = models.BinaryField(null=True)
+    similarity_fingerprint = models.BinaryField(null=True)
+    serialized_structure = models.BinaryField(null=True)
+
+    class Meta(BaseCompound.Meta):
+        indexes = [
+            models.Index(fields=["inchikey_connectivity", "inchikey_protonation"])
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._descriptors_structure = instance.__dict__.get("structure")
+        return instance
+
+    @property
+    def descriptors_outdated(self) -> bool:
+        """Whether the structure changed since the descriptors were computed."""
+        return getattr(self, "_descriptors_structure", None) != self.structure
+
+    def update_inchikey_blocks(self) -> None:
+        """Splits the stored InChIKey into its indexed blocks."""
+        connectivity, protonation = split_inchikey(self.inchikey)
+        self.inchikey_connectivity = connectivity
+        self.inchikey_protonation = protonation
+
+    def update_descriptors(self) -> None:
+        """Recomputes the stored descriptors from the structure.
+
+        The descriptors are cleared if Indigo cannot load the structure.
+        """
+        structure = Structure.coerce(self.molfile_v3000)
+        try:
+            self.molecular_weight = structure.molecular_weight
+            self.molecular_formula = structure.molecular_formula
+            self.smiles = structure.smiles
+            self.canonical_smiles = structure.canonical_smiles
+            self.calculated_inchikey = structure.inchikey
+            self.component_inchikeys = " ".join(structure.component_inchikeys)
+            self.substructure_fingerprint = structure.substructure_fingerprint
+            self.similarity_fingerprint = structure.similarity_fingerprint
+            self.serialized_structure = structure.serialized
+        except (IndigoException, BudgetExceeded):
+            self.molecular_weight = None
+            self.molecular_formula = None
+            self.smiles = None
+            self.canonical_smiles = None
+            self.calculated_inchikey = None
+            self.component_inchikeys = None
+            self.substructure_fingerprint = None
+            self.similarity_fingerprint = None
+            self.serialized_structure = None
+        self.canonical_smiles_hash = hash_smiles(self.canonical_smiles)
+        self._descriptors_structure = self.structure
+        # These rows need the compound to be saved, see `update_descriptor_rows`.
+        self._descriptor_rows_outdated = True
 
     @property
     def _inchikey(self):
         """Computes the inchikey from the molfile."""
         try:
             return get_inchikey(self.molfile_v3000)
-        except IndigoException:
+        except (IndigoException, BudgetExceeded):
             return None
 
-    @cached_property
+    @property
     def indigo_structure(self):
+        """The structure loaded into an Indigo instance of its own.
+
+        The molecule outlives any pooled session, so it is not loaded through
+        `chemreg.indigo.pool`. The stored serialized molecule is loaded instead
+        of the molfile while it is up to date, see
+        `chemreg.indigo.structure.load_serialized` for how the two differ.
+        """
         indigo = Indigo()
         indigo.setOption("molfile-saving-mode", "3000")
+        if self.serialized_structure and not self.descriptors_outdated:
+            try:
+                return indigo.unserialize(bytes(self.serialized_structure))
+            except IndigoException:
+                pass
         return indigo.loadStructure(structureStr=self.molfile_v3000)
 
 
+class ElementCount(CommonInfo):
+    """The number of atoms of an element in a defined compound.
+
+    These are the molecular formula as indexed rows, so compounds can be
+    filtered by composition in the database. Elements a compound lacks have
+    no row.
+
+    Attributes:
+        compound (foreign key): The defined compound.
+        element (str): The element symbol.
+        count (int): The number of atoms, including implicit hydrogens.
+
+    """
+
+    compound = models.ForeignKey(
+        DefinedCompound, on_delete=models.CASCADE, related_name="element_counts"
+    )
+    element = models.CharField(max_length=3)
+    count = models.PositiveIntegerField()
+
+    class Meta(CommonInfo.Meta):
+        unique_together = ["compound", "element"]
+        indexes = [models.Index(fields=["element", "count"])]
+
+    @classmethod
+    def update_compounds(cls, compounds) -> None:
+        """Replaces the element counts of compounds with their formulas'.
+
+        Args:
+            compounds: The saved defined compounds.
+
+        """
+        compounds = list(compounds)
+        cls.objects.filter(compound__in=compounds).delete()
+        cls.objects.bulk_create(
+            cls(compound=compound, element=element, count=count)
+            for compound in compounds
+            if compound.molecular_formula
+            for element, count in parse_formula(compound.molecular_formula).items()
+        )
+
+
+class CompoundComponent(CommonInfo):
+    """A component of a defined compound, e.g. the counterion of a salt.
+
+    Every compound has a row for each distinct component, so a salt is found
+    by the InChIKey of its parent as well as the parent itself.
+
+    Attributes:
+        compound (foreign key): The defined compound.
+        inchikey (str): The InChIKey of the component.
+        parent_inchikey (str): The InChIKey of its neutral parent, see
+            `chemreg.compound.utils.parent_inchikey`.
+
+    """
+
+    compound = models.ForeignKey(
+        DefinedCompound, on_delete=models.CASCADE, related_name="components"
+    )
+    inchikey = models.CharField(max_length=29)
+    parent_inchikey = models.CharField(max_length=29, db_index=True)
+
+    class Meta(CommonInfo.Meta):
+        unique_together = ["compound", "inchikey"]
+
+    @classmethod
+    def update_compounds(cls, compounds) -> None:
+        """Replaces the components of compounds with their computed ones.
+
+        Args:
+            compounds: The saved defined compounds.
+
+        """
+        compounds = list(compounds)
+        cls.objects.filter(compound__in=compounds).delete()
+        cls.objects.bulk_create(
+            cls(
+                compound=compound,
+                inchikey=inchikey,
+                parent_inchikey=parent_inchikey(inchikey),
+            )
+            for compound in compounds
+            if compound.component_inchikeys
+            for inchikey in compound.component_inchikeys.split()
+        )
+
+
+def update_descriptor_rows(compounds) -> None:
+    """Replaces the element counts and components of saved defined compounds.
+
+    These are derived from stored descriptors, so this is called after the
+    descriptors are.
+
+    Args:
+        compounds: The saved defined compounds.
+
+    """
+    compounds = list(compounds)
+    ElementCount.update_compounds(compounds)
+    CompoundComponent.update_compounds(compounds)
+    for compound in compounds:
+        compound._descriptor_rows_outdated = False
+
+
 class QueryStructureType(ControlledVocabulary):
     """A controlled vocabulary
 
@@ -154,12 +397,16 @@ class IllDefinedCompound(BaseCompound):
 
     Attributes:
         mrvfile (str): Alias to definitive structure string.
+        mrvfile_hash (str): The indexed SHA-256 digest of the canonical MRV
+            document, shared by exact duplicates, see
+            `chemreg.compound.utils.canonicalize_mrvfile`.
         query_structure_type (foreign key): A foreign key to the "ill-defined" record in the "query structure type"
          controlled vocabulary
 
     """
 
     mrvfile = StructureAliasField()
+    mrvfile_hash = models.CharField(null=True, max_length=64, db_index=True)
     query_structure_type = models.ForeignKey(
         "QueryStructureType",
         on_delete=models.PROTECT,
@@ -169,3 +416,7 @@ class IllDefinedCompound(BaseCompound):
 
     class Meta(BaseCompound.Meta):
         verbose_name = "ill-defined compound"
+
+    def update_mrvfile_hash(self) -> None:
+        """Rehashes the canonical form of the MRV document."""
+        self.mrvfile_hash = hash_mrvfile(self.mrvfile)
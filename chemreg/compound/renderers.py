@@ -0,0 +1,37 @@
+from chemreg.indigo.depiction import DEPICTION_FORMATS
+from chemreg.jsonapi.renderers import JSONRenderer
+
+
+class FileRenderer(JSONRenderer):
+    """Passes files, such as rendered images, through unchanged.
+
+    The format is chosen by the `format` query parameter or the Accept header.
+    Errors are still reported as JSON:API documents, which is why this extends
+    the JSON:API renderer.
+    """
+
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        response = renderer_context.get("response")
+        if response is not None and response.exception:
+            response["Content-Type"] = JSONRenderer.media_type
+            return super().render(data, JSONRenderer.media_type, renderer_context)
+        return data or b""
+
+
+class SVGRenderer(FileRenderer):
+    media_type = DEPICTION_FORMATS["svg"]
+    format = "svg"
+
+
+class PNGRenderer(FileRenderer):
+    media_type = DEPICTION_FORMATS["png"]
+    format = "png"
+
+
+class SDFRenderer(FileRenderer):
+    media_type = "chemical/x-mdl-sdfile"
+    format = "sdf"
@@ -0,0 +1,505 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.utils import timezone
+
+import numpy as np
+
+from chemreg.compound.exceptions import StructureTooComplex
+from chemreg.compound.models import DefinedCompound
+from chemreg.compound.settings import compound_settings
+from chemreg.indigo.budget import time_budget_exceeded
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import Structure
+from chemreg.indigo.substructure import compute_query_fingerprint, match_substructure
+
+FINGERPRINTS_VERSION_KEY = "chemreg.compound.fingerprints.version"
+"""The cache key that changes whenever stored fingerprints change."""
+
+REFRESH_OVERLAP = timedelta(minutes=5)
+"""How far back a refresh looks before the previous one started.
+
+Compounds are timestamped when they are saved, not when they are committed,
+so this covers transactions that were still open during the previous refresh.
+"""
+
+QUERY_BATCH_SIZE = 900
+"""The number of candidates fetched per query, within SQLite's limits."""
+
+
+class SimilarityIndexMissing(Exception):
+    """No similarity index has been built on this host yet."""
+
+
+def fingerprints_changed() -> None:
+    """Tells the fingerprint index of every worker to pick up new fingerprints.
+
+    This is called when defined compounds are saved. Code that stores
+    fingerprints without sending save signals, e.g. bulk creates, has to
+    call it once the transaction is committed.
+    """
+    cache.set(FINGERPRINTS_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(1 << 16)], dtype=np.uint8)
+"""The number of bits set in every 16 bit integer."""
+
+SCORE_BLOCK_SIZE = 1 << 16
+"""The number of fingerprints scored at once, which bounds temporary arrays."""
+
+
+def to_words(fingerprint: bytes) -> np.ndarray:
+    """Pads a fingerprint to whole 64 bit words, so it is screened a word at a time."""
+    padded = bytes(fingerprint) + bytes(-len(fingerprint) % 8)
+    return np.frombuffer(padded, dtype=np.uint64)
+
+
+class FingerprintIndex:
+    """An in-memory matrix of the stored substructure fingerprints.
+
+    The fingerprints of all defined compounds are loaded when the index is
+    first screened. After that, the compounds updated since the previous
+    refresh are reloaded whenever `fingerprints_changed` was called. Soft
+    deleted compounds stay in the index; searches filter them out along with
+    anything else the queryset excludes.
+
+    Screening compares the query with every row at once: a compound remains
+    a candidate if its fingerprint has every bit of the query's set.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pks: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._version: Optional[str] = None
+        self._refreshed_at = None
+
+    def __len__(self) -> int:
+        return len(self._pks)
+
+    def refresh(self) -> None:
+        """Loads the fingerprints stored since the previous refresh, if any."""
+        version = cache.get(FINGERPRINTS_VERSION_KEY)
+        if self._refreshed_at is not None and version == self._version:
+            return
+        with self._lock:
+            if self._refreshed_at is not None and version == self._version:
+                return
+            started = timezone.now()
+            qs = DefinedCompound.objects.with_deleted().exclude(
+                substructure_fingerprint=None
+            )
+            if self._refreshed_at is not None:
+                qs = qs.filter(updated_at__gte=self._refreshed_at - REFRESH_OVERLAP)
+            pks = []
+            words = []
+            for pk, fingerprint in qs.values_list(
+                "pk", "substructure_fingerprint"
+            ).iterator():
+                row = self._rows.get(pk)
+                if row is None:
+                    pks.append(pk)
+                    words.append(to_words(fingerprint))
+                else:
+                    self._matrix[row] = to_words(fingerprint)
+            if words:
+                added = np.stack(words)
+                if self._matrix is not None:
+                    added = np.concatenate([self._matrix, added])
+                self._rows.update((pk, row) for row, pk in enumerate(pks, len(self)))
+                self._pks.extend(pks)
+                self._matrix = added
+            self._version = version
+            self._refreshed_at = started
+
+    def screen(self, fingerprint: bytes) -> List[str]:
+        """Finds the compounds that may contain a query.
+
+        Args:
+            fingerprint: The query's substructure fingerprint.
+
+        Returns:
+            The CIDs of the candidates.
+
+        """
+        self.refresh()
+        if self._matrix is None:
+            return []
+        query = to_words(fingerprint)
+        candidates = ((self._matrix & query) == query).all(axis=1)
+        return [self._pks[row] for row in np.flatnonzero(candidates)]
+
+
+fingerprint_index = FingerprintIndex()
+"""The per-process fingerprint index."""
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Counts the bits set in each row of a matrix of 64 bit words."""
+    halves = np.ascontiguousarray(words).view(np.uint16)
+    return POPCOUNT[halves].sum(axis=-1, dtype=np.uint16)
+
+
+class SimilarityIndex:
+    """The similarity fingerprints of all defined compounds in memory-mapped files.
+
+    The fingerprints are kept as a matrix of 64 bit words in a directory that
+    all workers on a host share. Each worker maps the files rather than
+    loading them, so the operating system holds a single copy in its page
+    cache. Builds are written to a new subdirectory that `current.json` is
+    then pointed at, so readers always see a complete build.
+
+    The first build is made ahead of time by the `build_similarity_index`
+    management command; searches never build the whole index. When
+    `fingerprints_changed` was called since the current build, the first
+    worker to search fetches the compounds updated since it started and has
+    the process pool write them into a copy of it, see
+    `write_similarity_build`; the other workers keep searching the current
+    build until it is done. Soft deleted compounds stay in the index, as in
+    `FingerprintIndex`.
+
+    Args:
+        directory: Where the index is stored. Defaults to the
+            `SIMILARITY_INDEX_DIR` compound setting.
+
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._build: Optional[str] = None
+        self._pks: Optional[np.ndarray] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._counts: Optional[np.ndarray] = None
+        self._timed_out_version: Optional[str] = None
+
+    @property
+    def directory(self) -> str:
+        """The directory the index is stored in."""
+        if self._directory is not None:
+            return self._directory
+        return compound_settings.SIMILARITY_INDEX_DIR or os.path.join(
+            tempfile.gettempdir(), "chemreg-similarity"
+        )
+
+    def __len__(self) -> int:
+        return 0 if self._pks is None else len(self._pks)
+
+    def refresh(self) -> None:
+        """Maps the current build, bringing it up to date first if needed.
+
+        Raises:
+            SimilarityIndexMissing: If the index has not been built yet.
+
+        """
+        current = self._read_current()
+        if current is None:
+            raise SimilarityIndexMissing(
+                f"No similarity index has been built in {self.directory}."
+            )
+        version = cache.get(FINGERPRINTS_VERSION_KEY)
+        # An update that timed out is not retried by every search until the
+        # fingerprints change again.
+        if current["version"] != version and version != self._timed_out_version:
+            try:
+                current = (
+                    self.build(
+                        wait=False, timeout=compound_settings.SIMILARITY_BUILD_TIMEOUT
+                    )
+                    or current
+                )
+            except TimeoutError:
+                self._timed_out_version = version
+        if current["build"] != self._build:
+            self._open(current["build"])
+
+    def build(
+        self, full: bool = False, wait: bool = True, timeout: Optional[float] = None
+    ) -> Optional[dict]:
+        """Brings the stored index up to date.
+
+        Args:
+            full: Rebuild the index from scratch rather than from the
+                current build.
+            wait: Wait for another process that is already building.
+            timeout: Seconds to wait for the process pool to write the build,
+                where calls are offloaded.
+
+        Returns:
+            The contents of `current.json`, or `None` if another process is
+            building and `wait` is false.
+
+        Raises:
+            TimeoutError: If the build was not written within `timeout`. The
+                current build is left in place.
+
+        """
+        # Record locks are held per process, so greenlets and threads of
+        # this one take turns on a lock of their own. Unlike `flock`, they
+        # are not inherited by the process pool when it forks mid-build.
+        if not self._lock.acquire(blocking=wait):
+            return None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, "lock"), "w") as lock:
+                try:
+                    fcntl.lockf(
+                        lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB
+                    )
+                except OSError:
+                    return None
+                version = cache.get(FINGERPRINTS_VERSION_KEY)
+                current = self._read_current()
+                if current is not None and current["version"] == version and not full:
+                    return current
+                return self._update(None if full else current, version, timeout)
+        finally:
+            self._lock.release()
+
+    def _update(
+        self, current: Optional[dict], version: Optional[str], timeout: Optional[float]
+    ) -> dict:
+        started = timezone.now()
+        qs = DefinedCompound.objects.with_deleted().exclude(similarity_fingerprint=None)
+        if current is not None:
+            refreshed_at = datetime.fromisoformat(current["refreshed_at"])
+            qs = qs.filter(updated_at__gte=refreshed_at - REFRESH_OVERLAP)
+        changed = [
+            (pk.encode(), bytes(fingerprint))
+            for pk, fingerprint in qs.values_list(
+                "pk", "similarity_fingerprint"
+            ).iterator()
+        ]
+        # Copying and rewriting the matrix is CPU and disk bound, so it is
+        # offloaded like structure work rather than stalling the search that
+        # triggered it.
+        build = process_pool.run(
+            write_similarity_build,
+            self.directory,
+            current and current["build"],
+            changed,
+            timeout=timeout,
+        )
+        # The pointer only moves while the lock is held, so a build that
+        # timed out is never made current and is removed by the next one.
+        pointer = os.path.join(self.directory, "current.json.tmp")
+        with open(pointer, "w") as f:
+            json.dump(
+                {
+                    "build": build,
+                    "version": version,
+                    "refreshed_at": started.isoformat(),
+                },
+                f,
+            )
+        os.replace(pointer, os.path.join(self.directory, "current.json"))
+        # Workers that read the pointer just before it moved may still open
+        # the previous build. Mapped files stay readable once removed, so
+        # older builds can go.
+        keep = {build, current and current["build"]}
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and entry.name not in keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        return self._read_current()
+
+    def search(
+        self, fingerprint: bytes, threshold: float, limit: int
+    ) -> List[Tuple[str, float]]:
+        """Finds the compounds most similar to a query.
+
+        Args:
+            fingerprint: The query's similarity fingerprint.
+            threshold: The minimum Tanimoto similarity.
+            limit: The maximum number of compounds returned.
+
+        Returns:
+            `(CID, similarity)` pairs, most similar first.
+
+        Raises:
+            SimilarityIndexMissing: If the index has not been built yet.
+
+        """
+        self.refresh()
+        query = to_words(fingerprint)
+        query_count = int(popcount(query))
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_SIZE):
+            block = slice(start, start + SCORE_BLOCK_SIZE)
+            common = popcount(self._matrix[block] & query).astype(np.float32)
+            union = self._counts[block] + query_count - common
+            np.divide(common, union, out=scores[block], where=union > 0)
+            scores[block][union == 0] = 0
+        rows = np.flatnonzero(scores >= threshold)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return [(self._pks[row].decode(), float(scores[row])) for row in rows]
+
+    def _read_current(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.directory, "current.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _open(self, build: str) -> None:
+        path = os.path.join(self.directory, build)
+        self._pks = np.load(os.path.join(path, "pks.npy"), mmap_mode="r")
+        self._matrix = np.load(os.path.join(path, "fingerprints.npy"), mmap_mode="r")
+        self._counts = np.load(os.path.join(path, "counts.npy"), mmap_mode="r")
+        self._build = build
+
+
+def write_similarity_build(
+    directory: str, current: Optional[str], changed: List[Tuple[bytes, bytes]]
+) -> str:
+    """Writes a new `SimilarityIndex` build.
+
+    Args:
+        directory: Where the index is stored.
+        current: The build that `changed` is applied to, or `None` to write
+            a build of `changed` alone.
+        changed: `(CID, fingerprint)` pairs to add or replace.
+
+    Returns:
+        The name of the new build.
+
+    """
+    pks: List[bytes] = []
+    matrix = None
+    if current is not None:
+        path = os.path.join(directory, current)
+        pks = list(np.load(os.path.join(path, "pks.npy")))
+        # An empty build has no fingerprint width to add rows to.
+        if pks:
+            matrix = np.load(os.path.join(path, "fingerprints.npy"))
+    rows = {pk: row for row, pk in enumerate(pks)}
+    added = []
+    for pk, fingerprint in changed:
+        row = rows.get(pk)
+        if row is None:
+            pks.append(pk)
+            added.append(to_words(fingerprint))
+        else:
+            matrix[row] = to_words(fingerprint)
+    if added:
+        added = np.stack(added)
+        matrix = added if matrix is None else np.concatenate([matrix, added])
+    if matrix is None:
+        matrix = np.zeros((0, 1), dtype=np.uint64)
+
+    build = uuid.uuid4().hex
+    path = os.path.join(directory, build)
+    os.makedirs(path)
+    np.save(os.path.join(path, "pks.npy"), np.array(pks, dtype=bytes))
+    np.save(os.path.join(path, "fingerprints.npy"), matrix)
+    np.save(os.path.join(path, "counts.npy"), popcount(matrix))
+    return build
+
+
+similarity_index = SimilarityIndex()
+"""The similarity index of this host."""
+
+
+def search_substructure(query: str, queryset: QuerySet) -> List[str]:
+    """Finds the defined compounds in a queryset that contain a query.
+
+    Candidates are screened by fingerprint in process and then matched
+    exactly by Indigo across the process pool.
+
+    Args:
+        query: A SMILES, SMARTS or molfile query.
+        queryset: The `DefinedCompound` queryset to search.
+
+    Returns:
+        The CIDs of the compounds that contain the query.
+
+    Raises:
+        IndigoException: If Indigo cannot load the query.
+        BudgetExceeded: If the query exceeds a budget.
+        StructureTooComplex: If too many candidates survive screening.
+
+    """
+    try:
+        fingerprint = process_pool.run(
+            compute_query_fingerprint, query, timeout=indigo_settings.TIMEOUT
+        )
+    except TimeoutError:
+        raise time_budget_exceeded()
+    candidates = fingerprint_index.screen(fingerprint)
+    if len(candidates) > compound_settings.SUBSTRUCTURE_CANDIDATES:
+        raise StructureTooComplex(
+            "Substructure query is too general; "
+            f"{len(candidates)} compounds would need to be matched."
+        )
+    targets = []
+    for start in range(0, len(candidates), QUERY_BATCH_SIZE):
+        batch = queryset.filter(pk__in=candidates[start : start + QUERY_BATCH_SIZE])
+        rows = list(batch.values_list("pk", "smiles"))
+        targets.extend(row for row in rows if row[1] is not None)
+        # Structures are stored compressed, so they are only fetched for
+        # compounds without a SMILES to match instead.
+        missing = [pk for pk, smiles in rows if smiles is None]
+        if missing:
+            targets.extend(batch.filter(pk__in=missing).values_list("pk", "structure"))
+    if not targets:
+        return []
+    batch_size = -(-len(targets) // (process_pool.processes * 4))
+    batches = [
+        targets[start : start + batch_size]
+        for start in range(0, len(targets), batch_size)
+    ]
+    try:
+        # Each call matches a batch, and each match has the time budget.
+        results = process_pool.map(
+            partial(match_substructure, query),
+            batches,
+            timeout=indigo_settings.TIMEOUT * batch_size,
+        )
+    except TimeoutError:
+        raise time_budget_exceeded()
+    matches = []
+    for batch in results:
+        matches.extend(batch)
+    return matches
+
+
+def search_similar(
+    query: str, threshold: Optional[float] = None, limit: Optional[int] = None
+) -> List[Tuple[str, float]]:
+    """Finds the defined compounds most similar to a query structure.
+
+    Args:
+        query: A SMILES or molfile.
+        threshold: The minimum Tanimoto similarity. Defaults to the
+            `SIMILARITY_THRESHOLD` compound setting.
+        limit: The maximum number of compounds returned. Defaults to the
+            `SIMILARITY_LIMIT` compound setting.
+
+    Returns:
+        `(CID, similarity)` pairs, most similar first.
+
+    Raises:
+        IndigoException: If Indigo cannot load the query.
+        BudgetExceeded: If the query exceeds a budget.
+        SimilarityIndexMissing: If the similarity index has not been built yet.
+
+    """
+    if threshold is None:
+        threshold = compound_settings.SIMILARITY_THRESHOLD
+    if limit is None:
+        limit = compound_settings.SIMILARITY_LIMIT
+    fingerprint = Structure(query).similarity_fingerprint
+    return similarity_index.search(fingerprint, threshold, limit)
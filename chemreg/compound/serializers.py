@@ -12,17 +12,33 @@ from chemreg.compound.models import (
     IllDefinedCompound,
     QueryStructureType,
 )
+from chemreg.compound.settings import compound_settings
+from chemreg.compound.utils import split_inchikey
 from chemreg.compound.validators import (
     validate_inchikey_computable,
     validate_molfile_v2000,
     validate_molfile_v3000_computable,
     validate_smiles,
+    validate_structure_size,
 )
-from chemreg.indigo.inchi import get_inchikey
-from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.structure import Structure
 from chemreg.jsonapi.serializers import PolymorphicModelSerializer
 
 
+class StructureField(serializers.CharField):
+    """A structure string that is validated and converted as a `Structure`.
+
+    Every validator on the field shares the same `Structure`, so the structure
+    is only parsed by Indigo once. Structures over the input size budget are
+    rejected before any validator runs.
+    """
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        validate_structure_size(value)
+        return Structure(value)
+
+
 class BaseCompoundSerializer(CommonInfoSerializer):
     """The base serializer for compounds."""
 
@@ -51,7 +67,11 @@ class BaseCompoundSerializer(CommonInfoSerializer):
 class DefinedCompoundSerializer(BaseCompoundSerializer):
     """The serializer for defined compounds."""
 
-    molfile_v2000 = serializers.CharField(
+    serializer_field_mapping = {
+        **BaseCompoundSerializer.serializer_field_mapping,
+        StructureAliasField: StructureField,
+    }
+    molfile_v2000 = StructureField(
         write_only=True,
         required=False,
         validators=[
@@ -61,7 +81,7 @@ class DefinedCompoundSerializer(BaseCompoundSerializer):
         ],
         trim_whitespace=False,
     )
-    smiles = serializers.CharField(
+    smiles = StructureField(
         write_only=True,
         required=False,
         validators=[
@@ -103,22 +123,33 @@ class DefinedCompoundSerializer(BaseCompoundSerializer):
         return value
 
     def validate(self, data):
-        qs = self.Meta.model.objects.filter(inchikey=data["inchikey"])
+        inchikey = data["inchikey"]
+        connectivity, _ = split_inchikey(inchikey)
+        if connectivity is None:
+            qs = self.Meta.model.objects.filter(inchikey=inchikey)
+        else:
+            # Conflicts share the connectivity block, so the same indexed query
+            # finds them and the near-duplicates, e.g. other stereoisomers.
+            qs = self.Meta.model.objects.filter(inchikey_connectivity=connectivity)
         if self.instance:
             qs = qs.exclude(pk=self.instance.pk)
-        if qs.exists() and not self.admin_override:
-            matched = []
+        conflicts = []
+        self.near_duplicates = []
+        for pk, other_inchikey in qs.values_list("pk", "inchikey"):
+            if other_inchikey == inchikey:
+                conflicts.append(pk)
+            else:
+                self.near_duplicates.append(pk)
+        if conflicts and not self.admin_override:
             req = self.context.get("request", None)
-            for obj in qs:
-                matched.append(
-                    drf_reverse(
-                        "definedcompound-detail", request=req, kwargs={"pk": obj.pk}
-                    )
-                )
+            matched = [
+                drf_reverse("definedcompound-detail", request=req, kwargs={"pk": pk})
+                for pk in conflicts
+            ]
             raise ValidationError(
                 {
                     "detail": {
-                        "detail": f"Inchikey conflicts with {[x.id for x in qs]}",
+                        "detail": f"Inchikey conflicts with {conflicts}",
                         "links": matched,
                         "status": "400",
                         "source": {"pointer": "/data/attributes/inchikey"},
@@ -128,6 +159,13 @@ class DefinedCompoundSerializer(BaseCompoundSerializer):
             )
         return data
 
+    def get_root_meta(self, resource, many):
+        """Adds the near-duplicates found by `validate` to single compounds."""
+        meta = super().get_root_meta(resource, many)
+        if not many and getattr(self, "near_duplicates", None):
+            meta["near_duplicates"] = self.near_duplicates
+        return meta
+
     def to_internal_value(self, data):
         matched_fields = set(self.alt_structures) & set(self.initial_data.keys())
         formatted_fields = [format_value(f) for f in sorted(self.alt_structures)]
@@ -146,18 +184,15 @@ class DefinedCompoundSerializer(BaseCompoundSerializer):
                 }
             )
         data = super().to_internal_value(data)  # calls field validators
-        structure = next(k for k in self.alt_structures if k in data)
-        data["molfile_v3000"] = get_molfile_v3000(data.pop(structure))
+        structure = data.pop(next(k for k in self.alt_structures if k in data))
+        data["molfile_v3000"] = structure.molfile_v3000
         if "inchikey" not in data:
-            data["inchikey"] = get_inchikey(data["molfile_v3000"])
+            data["inchikey"] = structure.inchikey
         return data
 
 
 class DefinedCompoundDetailSerializer(DefinedCompoundSerializer):
-    molecular_weight = serializers.SerializerMethodField()
-    molecular_formula = serializers.SerializerMethodField()
-    smiles = serializers.SerializerMethodField()
-    calculated_inchikey = serializers.SerializerMethodField()
+    smiles = serializers.CharField(read_only=True)
 
     class Meta(DefinedCompoundSerializer.Meta):
         fields = DefinedCompoundSerializer.Meta.fields + [
@@ -166,18 +201,67 @@ class DefinedCompoundDetailSerializer(DefinedCompoundSerializer):
             "smiles",
             "calculated_inchikey",
         ]
+        read_only_fields = [
+            "molecular_weight",
+            "molecular_formula",
+            "calculated_inchikey",
+        ]
 
-    def get_molecular_weight(self, obj):
-        return obj.indigo_structure.molecularWeight()
 
-    def get_molecular_formula(self, obj):
-        return obj.indigo_structure.grossFormula()
+class StandardizedStructureSerializer(serializers.Serializer):
+    """The serializer for structures standardized without being stored.
 
-    def get_smiles(self, obj):
-        return obj.indigo_structure.smiles()
+    Requests hold a list of SMILES or molfile `structures`; each one is
+    returned as a separate resource, identified by its position in the list.
+    """
 
-    def get_calculated_inchikey(self, obj):
-        return get_inchikey(obj.molfile_v3000)
+    structures = serializers.ListField(
+        child=serializers.CharField(trim_whitespace=False),
+        write_only=True,
+        allow_empty=False,
+    )
+    molfile_v3000 = serializers.CharField(read_only=True)
+    inchikey = serializers.CharField(read_only=True)
+    validation_errors = serializers.ListField(
+        child=serializers.CharField(), read_only=True
+    )
+    cid = serializers.CharField(read_only=True)
+
+    class Meta:
+        resource_name = "standardizedStructure"
+
+    def validate_structures(self, value):
+        limit = compound_settings.STANDARDIZE_LIMIT
+        if len(value) > limit:
+            raise ValidationError(f"No more than {limit} structures allowed.")
+        return value
+
+
+class StructureLookupSerializer(serializers.Serializer):
+    """The serializer for structures looked up among defined compounds.
+
+    Requests hold a list of SMILES or molfile `structures`; each one is
+    returned as a separate resource, identified by its position in the list,
+    with the CID of the matching compound or none.
+    """
+
+    structures = serializers.ListField(
+        child=serializers.CharField(trim_whitespace=False),
+        write_only=True,
+        allow_empty=False,
+    )
+    inchikey = serializers.CharField(read_only=True)
+    cid = serializers.CharField(read_only=True)
+    error = serializers.CharField(read_only=True)
+
+    class Meta:
+        resource_name = "structureLookup"
+
+    def validate_structures(self, value):
+        limit = compound_settings.LOOKUP_LIMIT
+        if len(value) > limit:
+            raise ValidationError(f"No more than {limit} structures allowed.")
+        return value
 
 
 class QueryStructureTypeSerializer(ControlledVocabSerializer):
@@ -11,17 +11,55 @@ class CompoundSettings:
 
     Attributes:
         defaults (dict): The default settings to fallback to.
+        COMPRESS_STRUCTURES (bool): Whether compound structures are stored
+            compressed. Stored structures are read in either case. Defaults
+            to `True`.
+        IMAGE_MAX_AGE (int): Seconds clients may cache compound images
+            before revalidating them. Defaults to 7 days.
+        IMAGE_MAX_SIZE (int): The largest compound image, in pixels, that is
+            rendered. Defaults to 1000.
+        IMAGE_SIZE (int): The size, in pixels, of compound images rendered
+            when none is requested. Defaults to 300.
         INCREMENT_START (int): Added to the compound primary key to derive
             the CID. Defaults to 2,000,000.
+        LOOKUP_LIMIT (int): The maximum number of structures in a single
+            lookup request. Defaults to 5000.
         PREFIX (str): The prefix to place in the CID. Defaults to "DTX".
         SEQUENCE_KEY (bool): The cache key to store the sequence under.
+        SIMILARITY_BUILD_TIMEOUT (float): Seconds a search waits for the
+            similarity index to be updated before it searches the previous
+            build instead. Defaults to 30.
+        SIMILARITY_INDEX_DIR (str): The directory the workers of a host share
+            the similarity index in. Defaults to "chemreg-similarity" in the
+            temporary directory.
+        SIMILARITY_LIMIT (int): The maximum number of compounds a similarity
+            search returns. Defaults to 1000.
+        SIMILARITY_THRESHOLD (float): The minimum Tanimoto similarity of
+            compounds a similarity search returns. Defaults to 0.8.
+        STANDARDIZE_LIMIT (int): The maximum number of structures in a single
+            standardization request. Defaults to 1000.
+        SUBSTRUCTURE_CANDIDATES (int): The maximum number of compounds a
+            substructure query may leave after fingerprint screening. Each is
+            matched exactly, so more general queries are refused. Defaults
+            to 50,000.
 
     """
 
     defaults = {
+        "COMPRESS_STRUCTURES": True,
+        "IMAGE_MAX_AGE": 7 * 24 * 60 * 60,
+        "IMAGE_MAX_SIZE": 1000,
+        "IMAGE_SIZE": 300,
         "INCREMENT_START": 2000000,
+        "LOOKUP_LIMIT": 5000,
         "PREFIX": "DTX",
         "SEQUENCE_KEY": "compound_seq",
+        "SIMILARITY_BUILD_TIMEOUT": 30,
+        "SIMILARITY_INDEX_DIR": None,
+        "SIMILARITY_LIMIT": 1000,
+        "SIMILARITY_THRESHOLD": 0.8,
+        "STANDARDIZE_LIMIT": 1000,
+        "SUBSTRUCTURE_CANDIDATES": 50000,
     }
 
     def __init__(self, user_settings):
@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from chemreg.compound.models import (
+    DefinedCompound,
+    IllDefinedCompound,
+    update_descriptor_rows,
+)
+from chemreg.compound.search import fingerprints_changed
+
+
+@receiver(pre_save, sender=DefinedCompound)
+def update_defined_compound_descriptors(instance, **kwargs):
+    """Signal to recompute `DefinedCompound` descriptors when the structure changes.
+
+    Arguments:
+        instance: the `DefinedCompound` being saved.
+    """
+    if not kwargs.get("raw") and instance.descriptors_outdated:
+        instance.update_descriptors()
+
+
+@receiver(pre_save, sender=DefinedCompound)
+def update_defined_compound_inchikey_blocks(instance, **kwargs):
+    """Signal to keep the indexed `DefinedCompound` InChIKey blocks in step.
+
+    Arguments:
+        instance: the `DefinedCompound` being saved.
+    """
+    if not kwargs.get("raw"):
+        instance.update_inchikey_blocks()
+
+
+@receiver(post_save, sender=DefinedCompound)
+def update_defined_compound_descriptor_rows(instance, **kwargs):
+    """Signal to replace `DefinedCompound` element counts and components.
+
+    They are only replaced after the descriptors were recomputed.
+
+    Arguments:
+        instance: the saved `DefinedCompound`.
+    """
+    if not kwargs.get("raw") and getattr(instance, "_descriptor_rows_outdated", False):
+        update_descriptor_rows([instance])
+
+
+@receiver(post_save, sender=DefinedCompound)
+def refresh_fingerprint_index(**kwargs):
+    """Signal to add saved `DefinedCompound` fingerprints to the search index.
+
+    The index of every worker is refreshed once the transaction is committed.
+    """
+    transaction.on_commit(fingerprints_changed)
+
+
+@receiver(pre_save, sender=IllDefinedCompound)
+def update_ill_defined_compound_mrvfile_hash(instance, **kwargs):
+    """Signal to keep the indexed `IllDefinedCompound` MRV hash in step.
+
+    Arguments:
+        instance: the `IllDefinedCompound` being saved.
+    """
+    if not kwargs.get("raw"):
+        instance.update_mrvfile_hash()
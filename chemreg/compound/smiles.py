@@ -0,0 +1,290 @@
+import functools
+from typing import Dict, List, Optional, Set, Tuple
+
+from partialsmiles import SMILESSyntaxError
+from partialsmiles.elements import elements
+
+ATOM_START = set("CcONon[BPSFIbps*")
+BOND_ORDERS = {"-": 1, "=": 2, "#": 3, "$": 4, "\\": 1, "/": 1, ":": 1}
+FIRST_LETTERS = {symbol[0] for symbol in elements} | set("cnpostb")
+
+
+class SmilesScanner:
+    """Checks the syntax of a SMILES string the way `partialsmiles` does.
+
+    `partialsmiles` builds a molecule to check valences and kekulize aromatic
+    systems, which is most of its cost. Valence errors are ignored by
+    `validate_smiles`, and only aromatic systems can fail to kekulize, so for
+    SMILES without aromatic atoms the syntax alone decides. The scanner
+    follows the syntax rules of `partialsmiles.ParseSmiles(smiles,
+    partial=False)` without building anything, and raises the same errors
+    for the same characters.
+
+    Args:
+        smiles: The SMILES string.
+
+    """
+
+    def __init__(self, smiles: str):
+        self.smi = smiles
+        self.n = len(smiles)
+        self.idx = 0
+        self.prev: List[Optional[int]] = [None]
+        self.bondchar: Optional[str] = None
+        self.openbonds: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+        self.bonds: Set[Tuple[int, int]] = set()
+        self.atom_ends: List[int] = []
+        self.reaction_part = 0
+        self.aromatic = False
+
+    def error(self, message: str, idx: Optional[int] = None) -> SMILESSyntaxError:
+        return SMILESSyntaxError(message, self.smi, self.idx if idx is None else idx)
+
+    def scan(self) -> bool:
+        """Checks the syntax.
+
+        Returns:
+            Whether `partialsmiles` must still parse the SMILES: only the
+            syntax of aromatic SMILES is decided by the scanner.
+
+        Raises:
+            SMILESSyntaxError: The error `partialsmiles` would raise.
+
+        """
+        smi = self.smi
+        while self.idx < self.n:
+            x = smi[self.idx]
+            if x in ATOM_START:
+                self.scan_atom()
+            elif x in ". \t>":
+                self.end_component()
+                self.prev[-1] = None
+                if x == ".":
+                    self.check_closed()
+                    self.idx += 1
+                elif x == ">":
+                    self.reaction_part += 1
+                    if self.reaction_part == 3:
+                        raise self.error("Reactions only have three parts")
+                    self.check_closed()
+                    self.idx += 1
+                else:
+                    # Whitespace ends the SMILES.
+                    break
+            elif x == ")":
+                if self.idx > 1 and smi[self.idx - 1] == "(":
+                    raise self.error("Empty branches are not allowed")
+                if self.idx > 1 and smi[self.idx - 1] == ")":
+                    raise self.error(
+                        "The final branch should not be within parentheses",
+                        self.idx - 1,
+                    )
+                if self.bondchar:
+                    raise self.error("An atom must follow a bond symbol")
+                self.prev.pop()
+                if not self.prev:
+                    raise self.error("Unmatched close parenthesis")
+                self.idx += 1
+            elif x == "(":
+                if self.prev[-1] is None or smi[self.idx - 1] == "(":
+                    raise self.error("An atom must precede an open parenthesis")
+                if self.bondchar:
+                    raise self.error(
+                        "A bond symbol should not precede an open parenthesis"
+                    )
+                self.prev.append(self.prev[-1])
+                self.idx += 1
+            elif x in BOND_ORDERS:
+                if self.prev[-1] is None:
+                    raise self.error("An atom must precede a bond symbol")
+                if self.bondchar:
+                    raise self.error("Only a single bond symbol should be used")
+                if x == ":":
+                    raise self.error("Aromatic bond symbols are rejected by default")
+                self.bondchar = x
+                self.idx += 1
+            elif x.isdigit() or x == "%":
+                if self.prev[-1] is None:
+                    raise self.error("An atom must precede a bond closure symbol")
+                preceding = smi[self.atom_ends[self.prev[-1]] + 1 : self.idx]
+                if ")" in preceding:
+                    raise self.error(
+                        "Ring closure symbols must immediately follow an atom"
+                    )
+                if "(" in preceding:
+                    raise self.error(
+                        "Ring closure symbols should not be in parentheses"
+                    )
+                self.scan_ring_bond()
+            else:
+                raise self.error("Illegal character")
+        self.end_component()
+        self.check_closed()
+        return self.aromatic
+
+    def end_component(self) -> None:
+        smi, idx = self.smi, self.idx
+        if (
+            idx == 0
+            or smi[idx - 1] == "."
+            or (smi[idx - 1] == ">" and self.reaction_part == 2)
+        ):
+            raise self.error("Empty molecules are not allowed")
+        if self.bondchar:
+            raise self.error("An atom must follow a bond symbol")
+        if idx > 1 and smi[idx - 1] == ")":
+            raise self.error(
+                "The final branch should not be within parentheses", idx - 1
+            )
+
+    def check_closed(self) -> None:
+        if self.openbonds:
+            count = len(self.openbonds)
+            text = "s have" if count > 1 else " has"
+            raise self.error(f"{count} ring opening{text} not been closed")
+        if len(self.prev) > 1:
+            count = len(self.prev) - 1
+            text = "branches have" if count > 1 else "branch has"
+            raise self.error(f"{count} {text} not been closed")
+
+    def scan_ring_bond(self) -> None:
+        if self.smi[self.idx] == "%":
+            symbol = self.smi[self.idx : self.idx + 3]
+            self.idx += 2
+        else:
+            symbol = self.smi[self.idx]
+        atom = self.prev[-1]
+        if symbol in self.openbonds:
+            opening, openbc = self.openbonds.pop(symbol)
+            if opening == atom:
+                raise self.error(
+                    "Cannot have a bond opening and closing on the same atom"
+                )
+            pair = (opening, atom) if opening < atom else (atom, opening)
+            if pair in self.bonds:
+                raise self.error("Cannot have a second bond between the same atoms")
+            openbo = BOND_ORDERS[openbc] if openbc else 0
+            closebo = BOND_ORDERS[self.bondchar] if self.bondchar else 0
+            if closebo and openbo and closebo != openbo:
+                raise self.error("Inconsistent bond orders")
+            self.bonds.add(pair)
+        else:
+            self.openbonds[symbol] = (atom, self.bondchar)
+        self.idx += 1
+        self.bondchar = None
+
+    def next_in_bracket(self) -> None:
+        self.idx += 1
+        if self.idx == self.n:
+            raise self.error(
+                "An open square brackets is present without the corresponding "
+                "close square brackets"
+            )
+
+    def scan_bracket_atom(self) -> str:
+        smi = self.smi
+        self.next_in_bracket()
+        if smi[self.idx].isdigit():
+            if smi[self.idx] == "0":
+                raise self.error("Isotope value of 0 not allowed")
+            for _ in range(2):
+                self.next_in_bracket()
+                if not smi[self.idx].isdigit():
+                    break
+            else:
+                self.next_in_bracket()
+        if smi[self.idx] not in FIRST_LETTERS:
+            raise self.error("An element symbol is required")
+        if (
+            self.idx + 1 < self.n
+            and smi[self.idx].upper() + smi[self.idx + 1] in elements
+        ):
+            symbol = smi[self.idx : self.idx + 2]
+            self.idx += 1
+        else:
+            symbol = smi[self.idx]
+            if symbol.upper() not in elements:
+                raise self.error("An element symbol is required")
+        self.next_in_bracket()
+        if smi[self.idx] == "@":
+            self.next_in_bracket()
+            if smi[self.idx] == "@":
+                self.next_in_bracket()
+        if smi[self.idx] == "H":
+            self.next_in_bracket()
+            if smi[self.idx].isdigit():
+                self.next_in_bracket()
+        if smi[self.idx] in "+-":
+            self.next_in_bracket()
+            if smi[self.idx].isdigit():
+                self.next_in_bracket()
+            elif smi[self.idx] in "+-":
+                while smi[self.idx] == smi[self.idx - 1]:
+                    self.next_in_bracket()
+        if smi[self.idx] != "]":
+            raise self.error("Missing the close bracket")
+        self.idx += 1
+        return symbol
+
+    def scan_atom(self) -> None:
+        smi, idx = self.smi, self.idx
+        if smi[idx] == "[":
+            # A bracket atom ends at the first close bracket, if it is valid.
+            end = smi.find("]", idx) + 1
+            symbol = end and bracket_atom_symbol(smi[idx:end])
+            if symbol:
+                self.idx = end
+            else:
+                symbol = self.scan_bracket_atom()
+        elif smi[idx : idx + 2] in ("Cl", "Br"):
+            symbol = smi[idx : idx + 2]
+            self.idx += 2
+        else:
+            symbol = smi[idx]
+            self.idx += 1
+        if symbol[0].islower():
+            self.aromatic = True
+        atom = len(self.atom_ends)
+        if self.prev[-1] is not None:
+            self.bonds.add((self.prev[-1], atom))
+        self.prev[-1] = atom
+        self.atom_ends.append(self.idx - 1)
+        self.bondchar = None
+
+
+@functools.lru_cache(maxsize=4096)
+def bracket_atom_symbol(token: str) -> Optional[str]:
+    """The element symbol of a bracket atom such as "[13CH3+]".
+
+    The same few bracket atoms recur in most SMILES, so they are only scanned
+    once.
+
+    Returns:
+        The symbol, or `None` if the token is not a valid bracket atom.
+
+    """
+    scanner = SmilesScanner(token)
+    try:
+        symbol = scanner.scan_bracket_atom()
+    except SMILESSyntaxError:
+        return None
+    return symbol if scanner.idx == len(token) else None
+
+
+def scan_smiles(smiles: str) -> bool:
+    """Checks the syntax of a SMILES string without `partialsmiles`.
+
+    Args:
+        smiles: The SMILES string.
+
+    Returns:
+        Whether `partialsmiles` must still parse the SMILES, which is the case
+        for aromatic SMILES and those with characters outside ASCII.
+
+    Raises:
+        SMILESSyntaxError: The error `partialsmiles` would raise.
+
+    """
+    if not smiles.isascii():
+        return True
+    return SmilesScanner(smiles).scan()
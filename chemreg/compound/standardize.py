@@ -0,0 +1,135 @@
+from typing import List, Optional
+
+from rest_framework.exceptions import APIException, ValidationError
+
+from chemreg.compound.lookup import registered_cids
+from chemreg.compound.validators import (
+    validate_inchikey_computable,
+    validate_molfile_v3000_computable,
+    validate_single_structure,
+    validate_smiles,
+    validate_structure_size,
+)
+from chemreg.indigo.budget import record, time_budget_exceeded
+from chemreg.indigo.cache import conversion_cache
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.reader import SMILES, sniff
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import CACHE_KIND, Structure, compute_structure
+
+
+class StandardizedStructure:
+    """A submitted structure as it would be registered, without storing it.
+
+    Args:
+        pk: The position of the structure in the request.
+        structure: The computed structure.
+        validation_errors: The messages of the validators that failed.
+
+    Attributes:
+        cid (str): The CID of a registered compound with the same InChIKey.
+
+    """
+
+    def __init__(self, pk: int, structure: Structure, validation_errors: List[str]):
+        self.pk = pk
+        self.structure = structure
+        self.validation_errors = validation_errors
+        self.cid: Optional[str] = None
+
+    @property
+    def molfile_v3000(self) -> Optional[str]:
+        """The v3000 molfile, if it could be computed."""
+        return self.structure._computed.get("molfile_v3000")
+
+    @property
+    def inchikey(self) -> Optional[str]:
+        """The InChIKey, if it could be computed."""
+        return self.structure._computed.get("inchikey")
+
+
+def structure_validators(structure: str) -> list:
+    """The validators a submitted structure must pass, based on its format.
+
+    Args:
+        structure: A molfile (either v2000 or v3000) or SMILES string.
+
+    """
+    validators = [validate_structure_size, validate_single_structure]
+    if sniff(structure) == SMILES:
+        validators.append(validate_smiles)
+    return validators + [
+        validate_inchikey_computable,
+        validate_molfile_v3000_computable,
+    ]
+
+
+def standardize(structure: str) -> dict:
+    """Converts and validates a single structure.
+
+    This runs in the process pool, so it neither caches nor queries anything.
+
+    Args:
+        structure: A molfile (either v2000 or v3000) or SMILES string.
+
+    Returns:
+        The results of `compute_structure` under "computed" and the messages
+        of the validators that failed under "validation_errors".
+
+    """
+    computed = compute_structure(structure)
+    loaded = Structure.from_computed(structure, computed)
+    validation_errors = []
+    for validator in structure_validators(structure):
+        try:
+            validator(loaded)
+        except ValidationError as e:
+            validation_errors.extend(str(detail) for detail in e.detail)
+        except APIException as e:
+            # A budget was exceeded, so the other validators would fail alike.
+            validation_errors.append(str(e.detail))
+            break
+    return {"computed": computed, "validation_errors": validation_errors}
+
+
+def standardize_structures(structures: List[str]) -> List[StandardizedStructure]:
+    """Standardizes structures across the process pool.
+
+    The results are added to the conversion cache and matched to registered
+    compounds by InChIKey in a single query.
+
+    Args:
+        structures: Molfiles (either v2000 or v3000) or SMILES strings.
+
+    Returns:
+        The standardized structures in the order given.
+
+    Raises:
+        TimeBudgetExceeded: If the pool did not standardize the structures
+            within the time budget of each structure.
+
+    """
+    try:
+        results = process_pool.map(
+            standardize, structures, timeout=indigo_settings.TIMEOUT
+        )
+    except TimeoutError:
+        raise time_budget_exceeded()
+    standardized = []
+    for pk, (structure, result) in enumerate(zip(structures, results)):
+        computed = result["computed"]
+        record(computed)
+        if "error" not in computed:
+            conversion_cache.set(CACHE_KIND, structure, computed)
+        standardized.append(
+            StandardizedStructure(
+                pk,
+                Structure.from_computed(structure, computed),
+                result["validation_errors"],
+            )
+        )
+
+    cids = registered_cids(s.inchikey for s in standardized if s.inchikey)
+    for s in standardized:
+        s.cid = cids.get(s.inchikey)
+    return standardized
@@ -5,7 +5,8 @@ import pickle
 from faker.providers import BaseProvider
 from indigo import Indigo
 
-from chemreg.compound.utils import build_cid, format_mrvfile
+from chemreg.compound.utils import build_cid
+from chemreg.indigo.mrvfile import format_mrvfile
 
 with bz2.open(os.path.join(os.path.dirname(__file__), "compounds.bz2"), "rb") as f:
     COMPOUNDS = pickle.load(f)
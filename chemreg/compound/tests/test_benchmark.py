@@ -0,0 +1,35 @@
+from django.core.management import CommandError, call_command
+
+import pytest
+
+from chemreg.compound.benchmarks import BENCHMARKS, OPT_IN_BENCHMARKS
+from chemreg.compound.models import DefinedCompound
+
+
+def benchmarks_run(out):
+    return {line for line in out.splitlines() if line in BENCHMARKS}
+
+
+@pytest.mark.django_db
+def test_benchmark_command(capsys):
+    call_command("benchmark", limit=5)
+    out = capsys.readouterr().out
+    # Benchmarks that fill the database only run when named.
+    assert benchmarks_run(out) == set(BENCHMARKS) - OPT_IN_BENCHMARKS
+    assert "us/structure" in out
+
+
+@pytest.mark.django_db
+def test_benchmark_command_opt_in(capsys):
+    call_command("benchmark", "registration", "indigo_sessions", limit=5)
+    out = capsys.readouterr().out
+    assert benchmarks_run(out) == {"registration", "indigo_sessions"}
+    for label in ("unindexed check", "indexed check", "create"):
+        assert label in out
+    # The registry is rolled back afterwards.
+    assert not DefinedCompound.objects.exists()
+
+
+def test_benchmark_command_unknown():
+    with pytest.raises(CommandError, match="not_a_benchmark"):
+        call_command("benchmark", "not_a_benchmark")
@@ -0,0 +1,200 @@
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.utils import timezone
+
+import pytest
+
+from chemreg.compound import search
+from chemreg.compound.benchmarks import CORPUS_PATH
+from chemreg.compound.models import BaseCompound, DefinedCompound
+from chemreg.compound.search import similarity_index
+from chemreg.compound.settings import compound_settings
+from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.reader import read_sdf
+
+
+@pytest.mark.django_db
+def test_backfill_descriptors(defined_compound_factory):
+    compounds = [s.instance for s in defined_compound_factory.create_batch(3)]
+    DefinedCompound.objects.update(
+        molecular_weight=None,
+        molecular_formula=None,
+        smiles=None,
+        canonical_smiles=None,
+        canonical_smiles_hash=None,
+        calculated_inchikey=None,
+        substructure_fingerprint=None,
+        serialized_structure=None,
+        component_inchikeys=None,
+    )
+    # Resume after the first compound
+    first, *rest = sorted(compounds, key=lambda c: c.pk)
+    call_command("backfill_descriptors", start_after=first.pk, chunk_size=1)
+    assert DefinedCompound.objects.get(pk=first.pk).calculated_inchikey is None
+    for compound in rest:
+        backfilled = DefinedCompound.objects.get(pk=compound.pk)
+        assert backfilled.calculated_inchikey == compound.calculated_inchikey
+        assert backfilled.molecular_formula == compound.molecular_formula
+        assert backfilled.canonical_smiles_hash == compound.canonical_smiles_hash
+        assert bytes(backfilled.substructure_fingerprint) == bytes(
+            compound.substructure_fingerprint
+        )
+        assert bytes(backfilled.serialized_structure) == bytes(
+            compound.serialized_structure
+        )
+        assert backfilled.component_inchikeys == compound.component_inchikeys
+        components = backfilled.components.order_by("pk")
+        assert [c.inchikey for c in components] == compound.component_inchikeys.split()
+    call_command("backfill_descriptors")
+    assert not DefinedCompound.objects.filter(calculated_inchikey=None).exists()
+
+
+@pytest.mark.django_db
+def test_backfill_descriptors_reach_indexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(search, "fingerprint_index", search.FingerprintIndex())
+    monkeypatch.setattr(
+        search, "similarity_index", search.SimilarityIndex(str(tmp_path))
+    )
+    smiles = "CC(=O)Oc1ccccc1C(=O)O"
+    aspirin = DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000(smiles))
+    # Fingerprints missing since before the indexes were last refreshed
+    DefinedCompound.objects.update(
+        substructure_fingerprint=None,
+        similarity_fingerprint=None,
+        updated_at=timezone.now() - timedelta(days=1),
+    )
+    search.similarity_index.build()
+    assert search.search_substructure(smiles, DefinedCompound.objects.all()) == []
+    assert search.search_similar(smiles) == []
+
+    call_command("backfill_descriptors")
+    assert search.search_substructure(smiles, DefinedCompound.objects.all()) == [
+        aspirin.pk
+    ]
+    assert [pk for pk, _ in search.search_similar(smiles)] == [aspirin.pk]
+
+
+@pytest.mark.django_db
+def test_import_sdf(tmp_path, defined_compound_factory):
+    registered = defined_compound_factory().instance
+    molfiles = [get_molfile_v3000(smiles) for smiles in ("CCO", "c1ccccc1", "CCO")]
+    sdf = "".join(
+        f"{molfile}\n> <NAME>\nrecord {i}\n\n$$$$\n"
+        for i, molfile in enumerate(
+            [registered.molfile_v3000, *molfiles, "\n\n\nnot a molfile\n"]
+        )
+    )
+    path = tmp_path / "compounds.sdf.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(sdf)
+    rejected = tmp_path / "rejected.tsv"
+    call_command("import_sdf", str(path), chunk_size=2, rejected=str(rejected))
+
+    ethanol = DefinedCompound.objects.get(inchikey="LFQSCWFLJHTTHZ-UHFFFAOYSA-N")
+    assert ethanol.molecular_formula == "C2 H6 O"
+    assert ethanol.calculated_inchikey == ethanol.inchikey
+    assert ethanol.substructure_fingerprint
+    assert ethanol.serialized_structure
+    assert dict(ethanol.element_counts.values_list("element", "count")) == {
+        "C": 2,
+        "H": 6,
+        "O": 1,
+    }
+    assert DefinedCompound.objects.filter(inchikey="UHOVQNZJYSORNB-UHFFFAOYSA-N")
+    assert DefinedCompound.objects.count() == 3
+    reasons = dict(line.split("\t") for line in rejected.read_text().splitlines())
+    assert sorted(reasons) == ["0", "3", "4"]
+    assert reasons["0"] == f"Duplicate of {registered.pk}"
+    assert reasons["3"] == f"Duplicate of {ethanol.pk}"
+
+
+@pytest.mark.django_db
+def test_export_sdf(tmp_path, capsys, defined_compound_factory):
+    first, second, deleted = sorted(
+        (s.instance for s in defined_compound_factory.create_batch(3)),
+        key=lambda compound: compound.pk,
+    )
+    BaseCompound.objects.filter(pk=deleted.pk).update(replaced_by=first)
+    path = tmp_path / "compounds.sdf"
+    call_command("export_sdf", str(path), chunk_size=1)
+    with open(path) as f:
+        records = list(read_sdf(f))
+    assert [r.data["CID"] for r in records] == [first.pk, second.pk]
+    assert records[1].data["INCHIKEY"] == second.inchikey
+    assert "Exported 2 compounds" in capsys.readouterr().err
+
+    call_command("export_sdf", cid=[deleted.pk], include_deleted=True)
+    records = list(read_sdf(io.StringIO(capsys.readouterr().out)))
+    assert [r.data["CID"] for r in records] == [deleted.pk]
+
+
+@pytest.mark.django_db
+def test_import_sdf_corpus(capsys):
+    call_command("import_sdf", CORPUS_PATH, offset=10, limit=20, chunk_size=10)
+    assert "next offset 30" in capsys.readouterr().out
+    assert 0 < DefinedCompound.objects.count() <= 20
+
+
+@pytest.mark.django_db
+def test_build_similarity_index(tmp_path, monkeypatch, defined_compound_factory):
+    monkeypatch.setattr(compound_settings, "SIMILARITY_INDEX_DIR", str(tmp_path))
+    defined_compound_factory.create_batch(2)
+    call_command("build_similarity_index", full=True)
+    assert (tmp_path / "current.json").exists()
+    assert len(similarity_index) == 2
+
+
+@pytest.mark.django_db
+def test_audit_inchikeys(tmp_path, defined_compound_factory):
+    a, b, c, d, e = sorted(
+        (s.instance for s in defined_compound_factory.create_batch(5)),
+        key=lambda compound: compound.pk,
+    )
+    drifted = "AAAAAAAAAAAAAA-AAAAAAAAAA-N"
+    DefinedCompound.objects.filter(pk=a.pk).update(inchikey=drifted)
+    DefinedCompound.objects.filter(pk=b.pk).update(inchikey=c.inchikey)
+    DefinedCompound.objects.filter(pk=d.pk).update(inchikey=a.inchikey)
+    BaseCompound.objects.filter(pk=e.pk).update(structure="\n\n\nnot a molfile\n")
+    report = tmp_path / "audit.csv"
+    checkpoint = tmp_path / "audit.json"
+    call_command(
+        "audit_inchikeys",
+        report=str(report),
+        checkpoint=str(checkpoint),
+        chunk_size=2,
+    )
+    assert not checkpoint.exists()
+    with open(report, newline="") as f:
+        issues = {(row["cid"], row["issue"]): row for row in csv.DictReader(f)}
+    assert sorted(issues) == sorted(
+        [
+            (a.pk, "mismatch"),
+            (a.pk, "collision"),
+            (b.pk, "mismatch"),
+            (b.pk, "duplicate"),
+            (c.pk, "duplicate"),
+            (d.pk, "mismatch"),
+            (e.pk, "error"),
+        ]
+    )
+    assert issues[a.pk, "mismatch"]["inchikey"] == drifted
+    assert issues[a.pk, "mismatch"]["computed_inchikey"] == a.inchikey
+    assert issues[a.pk, "collision"]["detail"] == d.pk
+    assert issues[b.pk, "duplicate"]["detail"] == c.pk
+    assert issues[d.pk, "mismatch"]["computed_inchikey"] == d.inchikey
+
+    # Resume after d, reporting as JSON
+    report = tmp_path / "audit.jsonl"
+    checkpoint.write_text(json.dumps({"last_cid": d.pk, "audited": 4, "issues": 5}))
+    call_command(
+        "audit_inchikeys", report=str(report), checkpoint=str(checkpoint), format="json"
+    )
+    issues = [json.loads(line) for line in report.read_text().splitlines()]
+    assert sorted((row["cid"], row["issue"]) for row in issues) == sorted(
+        [(e.pk, "error"), (b.pk, "duplicate"), (c.pk, "duplicate")]
+    )
@@ -0,0 +1,56 @@
+from django.db import connection
+
+import pytest
+
+from chemreg.compound.fields import (
+    DEFLATE,
+    RAW,
+    compress_structure,
+    decompress_structure,
+)
+from chemreg.compound.models import BaseCompound, DefinedCompound
+from chemreg.compound.settings import compound_settings
+
+
+@pytest.mark.parametrize("value", ["", "C", "M  V30 END CTAB\n" * 20, "<cml>é</cml>"])
+def test_compress_structure(value):
+    stored = compress_structure(value)
+    assert stored[:1] in (RAW, DEFLATE)
+    assert decompress_structure(stored) == value
+    assert decompress_structure(memoryview(stored)) == value
+
+
+def test_compress_structure_shrinks(monkeypatch):
+    value = "M  V30 1 C 0.0 0.0 0.0 0\n" * 20
+    compressed = compress_structure(value)
+    assert compressed[:1] == DEFLATE
+    assert len(compressed) < len(value) / 4
+    # Values that would grow are stored as is
+    assert compress_structure("C") == RAW + b"C"
+    monkeypatch.setattr(compound_settings, "COMPRESS_STRUCTURES", False)
+    assert compress_structure(value) == RAW + value.encode()
+    assert decompress_structure(compressed) == value
+
+
+def test_decompress_structure_unknown_format():
+    with pytest.raises(ValueError):
+        decompress_structure(b"\x02data")
+
+
+@pytest.mark.django_db
+def test_compressed_text_field(defined_compound_factory):
+    compound = defined_compound_factory().instance
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT structure FROM compound_basecompound WHERE id = %s",
+            [compound.pk],
+        )
+        (stored,) = cursor.fetchone()
+    assert bytes(stored)[:1] == DEFLATE
+    assert len(stored) < len(compound.molfile_v3000)
+    assert DefinedCompound.objects.get(pk=compound.pk).molfile_v3000 == (
+        compound.molfile_v3000
+    )
+    assert BaseCompound.objects.non_polymorphic().values_list(
+        "structure", flat=True
+    ).get(pk=compound.pk) == (compound.molfile_v3000)
@@ -1,5 +1,17 @@
+from unittest.mock import PropertyMock, patch
+
 import pytest
 
+from chemreg.compound import search
+from chemreg.compound.models import DefinedCompound, ElementCount, IllDefinedCompound
+from chemreg.compound.settings import compound_settings
+from chemreg.compound.utils import hash_mrvfile, hash_smiles
+from chemreg.indigo.inchi import get_inchikey
+from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.mrvfile import get_mrvfile
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import Structure
+
 
 @pytest.mark.parametrize("search_type", ["V3000", "V2000", "SMILES"])
 @pytest.mark.django_db
@@ -35,3 +47,243 @@ def test_defined_compound_filters(
     # Test with invalid molfile
     response = client.get(f"/definedCompounds?filter[{field}]=foo")
     assert f"Structure is not in {search_type} format" in response.data[0]["detail"]
+
+
+@pytest.mark.django_db
+def test_defined_compound_filter_budgets(user, client, monkeypatch):
+    """Structures over a budget are rejected with a JSON:API error."""
+    client.force_authenticate(user=user)
+    monkeypatch.setattr(indigo_settings, "MAX_SIZE", 10)
+    response = client.get("/definedCompounds", {"filter[smiles]": "C" * 11})
+    assert response.status_code == 413
+    assert response.json()["errors"][0]["code"] == "structure_too_large"
+    monkeypatch.setattr(indigo_settings, "MAX_ATOMS", 3)
+    response = client.get("/definedCompounds", {"filter[smiles]": "CCCC"})
+    assert response.status_code == 422
+    assert response.json()["errors"][0]["code"] == "structure_too_complex"
+
+
+@pytest.mark.django_db
+def test_defined_compound_substructure_filter(user, client, monkeypatch):
+    client.force_authenticate(user=user)
+    monkeypatch.setattr(search, "fingerprint_index", search.FingerprintIndex())
+    phenol, cresol, ethanol = [
+        DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000(smiles))
+        for smiles in ("Oc1ccccc1", "Cc1ccccc1O", "CCO")
+    ]
+
+    response = client.get("/definedCompounds", {"filter[substructure]": "c1ccccc1O"})
+    cids = sorted(r["url"].rsplit("/", 1)[-1] for r in response.data["results"])
+    assert cids == sorted([phenol.pk, cresol.pk])
+    response = client.get("/definedCompounds", {"filter[substructure]": "[#6][OH]"})
+    assert len(response.data["results"]) == 3
+    response = client.get("/definedCompounds", {"filter[substructure]": "CN"})
+    assert response.data["results"] == []
+
+    response = client.get("/definedCompounds", {"filter[substructure]": "foo"})
+    assert response.status_code == 400
+    monkeypatch.setattr(compound_settings, "SUBSTRUCTURE_CANDIDATES", 2)
+    response = client.get("/definedCompounds", {"filter[substructure]": "C"})
+    assert response.status_code == 422
+    assert response.json()["errors"][0]["code"] == "structure_too_complex"
+
+
+@pytest.mark.django_db
+def test_defined_compound_similarity_filter(user, client, monkeypatch, tmp_path):
+    client.force_authenticate(user=user)
+    monkeypatch.setattr(
+        search, "similarity_index", search.SimilarityIndex(str(tmp_path))
+    )
+    methyl_aspirin, aspirin, ethanol = [
+        DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000(smiles))
+        for smiles in ("CC(=O)Oc1ccccc1C(=O)OC", "CC(=O)Oc1ccccc1C(=O)O", "CCO")
+    ]
+
+    query = {"filter[similarTo]": "CC(=O)Oc1ccccc1C(=O)O"}
+    # Searches never build the index.
+    response = client.get("/definedCompounds", query)
+    assert response.status_code == 503
+    assert response.json()["errors"][0]["code"] == "similarity_index_unavailable"
+    search.similarity_index.build()
+
+    response = client.get("/definedCompounds", query)
+    cids = [r["url"].rsplit("/", 1)[-1] for r in response.data["results"]]
+    assert cids == [aspirin.pk, methyl_aspirin.pk]
+    response = client.get("/definedCompounds", {**query, "filter[threshold]": 0})
+    assert len(response.data["results"]) == 3
+    response = client.get("/definedCompounds", {**query, "sort": "-id"})
+    cids = [r["url"].rsplit("/", 1)[-1] for r in response.data["results"]]
+    assert cids == sorted([methyl_aspirin.pk, aspirin.pk], reverse=True)
+
+    response = client.get("/definedCompounds", {**query, "filter[threshold]": 2})
+    assert response.status_code == 400
+    response = client.get("/definedCompounds", {"filter[similarTo]": "foo"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_defined_compound_connectivity_filters(user, client):
+    client.force_authenticate(user=user)
+    ethanol, labelled, _ = [
+        DefinedCompound.objects.create(
+            molfile_v3000=get_molfile_v3000(smiles),
+            inchikey=get_inchikey(smiles),
+        )
+        for smiles in ("CCO", "[13CH3]CO", "CC")
+    ]
+    ethanols = sorted([ethanol.pk, labelled.pk])
+
+    for params in [
+        {"filter[structureConnectivity]": "C[13CH2]O"},
+        {"filter[inchikeyConnectivity]": ethanol.inchikey},
+        {"filter[inchikeyConnectivity]": ethanol.inchikey[:14].lower()},
+    ]:
+        response = client.get("/definedCompounds", params)
+        cids = sorted(r["url"].rsplit("/", 1)[-1] for r in response.data["results"])
+        assert cids == ethanols
+
+    response = client.get("/definedCompounds", {"filter[inchikeyConnectivity]": "foo"})
+    assert response.status_code == 400
+    response = client.get(
+        "/definedCompounds", {"filter[structureConnectivity]": "\n\n\nfoo"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_defined_compound_smiles_filter(user, client):
+    client.force_authenticate(user=user)
+    acid, _ = [
+        DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000(smiles))
+        for smiles in ("CC(=O)O", "CC(=O)OC")
+    ]
+    assert acid.canonical_smiles_hash == hash_smiles(acid.canonical_smiles)
+
+    # Different spellings of the structure match without computing InChIKeys.
+    for smiles in ("CC(=O)O", "OC(C)=O", "C(C)(O)=O"):
+        with patch.object(Structure, "inchikey", new_callable=PropertyMock) as inchikey:
+            response = client.get("/definedCompounds", {"filter[smiles]": smiles})
+        assert not inchikey.called
+        cids = [r["url"].rsplit("/", 1)[-1] for r in response.data["results"]]
+        assert cids == [acid.pk]
+
+    response = client.get("/definedCompounds", {"filter[smiles]": "CC(=O)N"})
+    assert response.data["results"] == []
+
+    # Compounds not backfilled yet match on their InChIKey.
+    DefinedCompound.objects.filter(pk=acid.pk).update(
+        inchikey=acid.calculated_inchikey,
+        canonical_smiles=None,
+        canonical_smiles_hash=None,
+    )
+    response = client.get("/definedCompounds", {"filter[smiles]": "OC(C)=O"})
+    cids = [r["url"].rsplit("/", 1)[-1] for r in response.data["results"]]
+    assert cids == [acid.pk]
+
+
+@pytest.mark.django_db
+def test_defined_compound_composition_filters(user, client):
+    client.force_authenticate(user=user)
+    ethanol, chloroform, urea, glycine = [
+        DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000(smiles))
+        for smiles in ("CCO", "ClC(Cl)Cl", "NC(N)=O", "NCC(=O)O")
+    ]
+
+    def cids(params):
+        response = client.get("/definedCompounds", params)
+        assert response.status_code == 200, response.data
+        return sorted(r["url"].rsplit("/", 1)[-1] for r in response.data["results"])
+
+    assert cids(
+        {"filter[molecularWeight.gte]": 60, "filter[molecularWeight.lte]": 100}
+    ) == sorted([urea.pk, glycine.pk])
+    assert cids({"filter[molecularFormula]": "CH4N2O"}) == [urea.pk]
+    assert cids({"filter[molecularFormula]": "C2 H6 O"}) == [ethanol.pk]
+    assert cids({"filter[elements]": "Cl"}) == [chloroform.pk]
+    assert cids({"filter[elements]": "N"}) == sorted([urea.pk, glycine.pk])
+    assert cids({"filter[elements]": "N<2"}) == sorted(
+        [ethanol.pk, chloroform.pk, glycine.pk]
+    )
+    assert cids({"filter[elements]": "N=2,O"}) == [urea.pk]
+    assert cids({"filter[elements]": "C>=2, O<=1"}) == [ethanol.pk]
+    assert cids({"filter[elements]": "Cl=0,N>1"}) == [urea.pk]
+
+    response = client.get("/definedCompounds", {"filter[elements]": "Xx"})
+    assert "Unknown element 'Xx'" in response.data[0]["detail"]
+    response = client.get("/definedCompounds", {"filter[elements]": "N<<2"})
+    assert "Invalid element term" in response.data[0]["detail"]
+    response = client.get("/definedCompounds", {"filter[molecularFormula]": "c2h6o"})
+    assert "Expected a molecular formula" in response.data[0]["detail"]
+
+
+@pytest.mark.django_db
+def test_element_counts_follow_structure():
+    compound = DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000("CCO"))
+    assert dict(compound.element_counts.values_list("element", "count")) == {
+        "C": 2,
+        "H": 6,
+        "O": 1,
+    }
+    compound.molfile_v3000 = get_molfile_v3000("ClC(Cl)Cl")
+    compound.save()
+    assert dict(compound.element_counts.values_list("element", "count")) == {
+        "C": 1,
+        "H": 1,
+        "Cl": 3,
+    }
+    compound.qc_note = "checked"
+    with patch.object(ElementCount, "update_compounds") as update_compounds:
+        compound.save()
+    update_compounds.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_defined_compound_contains_component_filter(user, client):
+    client.force_authenticate(user=user)
+    methylamine, hydrochloride, acetate, ethanol = [
+        DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000(smiles))
+        for smiles in ("CN", "C[NH3+].[Cl-]", "CC(=O)[O-].[Na+]", "CCO")
+    ]
+    assert sorted(hydrochloride.components.values_list("inchikey", flat=True)) == [
+        "BAVYZALUXZFZLV-UHFFFAOYSA-O",
+        "VEXZGXHMUGYJMC-UHFFFAOYSA-M",
+    ]
+
+    def cids(value):
+        response = client.get("/definedCompounds", {"filter[containsComponent]": value})
+        assert response.status_code == 200, response.data
+        return sorted(r["url"].rsplit("/", 1)[-1] for r in response.data["results"])
+
+    assert cids("CN") == sorted([methylamine.pk, hydrochloride.pk])
+    assert cids("C[NH3+]") == sorted([methylamine.pk, hydrochloride.pk])
+    assert cids("CC(=O)O") == [acetate.pk]
+    assert cids("[Cl-]") == [hydrochloride.pk]
+    assert cids("CN.Cl") == [hydrochloride.pk]
+    assert cids("CN.CC(=O)O") == []
+    assert cids("CCO") == [ethanol.pk]
+    response = client.get("/definedCompounds", {"filter[containsComponent]": "foo"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_ill_defined_compound_mrvfile_filter(user, client):
+    client.force_authenticate(user=user)
+    mrvfile = get_mrvfile("CC(=O)O")
+    first, second, other = [
+        IllDefinedCompound.objects.create(mrvfile=value)
+        for value in (mrvfile, mrvfile.replace("><", ">\n  <"), get_mrvfile("CCO"))
+    ]
+    assert first.mrvfile_hash == second.mrvfile_hash == hash_mrvfile(mrvfile)
+    assert other.mrvfile_hash != first.mrvfile_hash
+
+    # Attribute order and whitespace are ignored.
+    query = '<?xml version="1.0"?>\n' + mrvfile.replace(
+        'id="a1" elementType="C"', 'elementType="C"  id="a1"'
+    )
+    assert query != mrvfile
+    response = client.get("/illDefinedCompounds", {"filter[mrvfile]": query})
+    assert response.status_code == 200, response.data
+    cids = sorted(r["url"].rsplit("/", 1)[-1] for r in response.data["results"])
+    assert cids == sorted([first.pk, second.pk])
+    response = client.get("/illDefinedCompounds", {"filter[mrvfile]": "<cml>"})
+    assert response.status_code == 400
@@ -0,0 +1,43 @@
+import pytest
+
+from chemreg.compound import lookup
+from chemreg.compound.lookup import (
+    compute_lookup_inchikey,
+    lookup_error,
+    registered_cids,
+)
+from chemreg.compound.models import DefinedCompound
+from chemreg.indigo.budget import AtomCountExceeded
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import Structure
+
+
+def test_compute_lookup_inchikey(monkeypatch):
+    # Registration reads SMILES back from their molfile, which drops this stereo.
+    smiles = "C/C=C/C"
+    computed = compute_lookup_inchikey(smiles)
+    assert computed == {"inchikey": Structure(smiles).inchikey}
+    assert lookup_error(computed) is None
+
+    computed = compute_lookup_inchikey("C1=CC=CC=C1)")
+    assert lookup_error(computed) == "InChIKey not computable for provided structure."
+
+    monkeypatch.setattr(indigo_settings, "MAX_ATOMS", 3)
+    computed = compute_lookup_inchikey("CCCC")
+    assert isinstance(computed["error"], AtomCountExceeded)
+    assert lookup_error(computed) == "Structure has more than 3 atoms."
+
+
+@pytest.mark.django_db
+def test_registered_cids(monkeypatch, defined_compound_factory):
+    first, second, third = sorted(
+        (s.instance for s in defined_compound_factory.create_batch(3)),
+        key=lambda compound: compound.pk,
+    )
+    DefinedCompound.objects.filter(pk=third.pk).update(inchikey=first.inchikey)
+    monkeypatch.setattr(lookup, "QUERY_BATCH_SIZE", 1)
+    inchikeys = [first.inchikey, second.inchikey, "AAAAAAAAAAAAAA-AAAAAAAAAA-N"]
+    assert registered_cids(iter(inchikeys)) == {
+        first.inchikey: first.pk,
+        second.inchikey: second.pk,
+    }
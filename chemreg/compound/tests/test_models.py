@@ -1,8 +1,12 @@
+from unittest.mock import patch
+
 from django.db import models
 
+import pytest
+from indigo import Indigo
 from polymorphic.models import PolymorphicModel
 
-from chemreg.compound.fields import StructureAliasField
+from chemreg.compound.fields import CompressedTextField, StructureAliasField
 from chemreg.compound.models import (
     BaseCompound,
     DefinedCompound,
@@ -12,6 +16,7 @@ from chemreg.compound.models import (
 )
 from chemreg.compound.utils import build_cid
 from chemreg.compound.validators import validate_inchikey_computable
+from chemreg.indigo.molfile import get_molfile_v3000
 
 
 def test_basecompound():
@@ -24,7 +29,8 @@ def test_basecompound():
     assert id.unique
     # structure
     structure = BaseCompound._meta.get_field("structure")
-    assert isinstance(structure, models.TextField)
+    assert isinstance(structure, CompressedTextField)
+    assert structure.editable
 
 
 def test_definedcompound():
@@ -37,6 +43,16 @@ def test_definedcompound():
     inchikey = DefinedCompound._meta.get_field("inchikey")
     assert isinstance(inchikey, models.CharField)
     assert inchikey.max_length == 29
+    # descriptors
+    assert isinstance(
+        DefinedCompound._meta.get_field("molecular_weight"), models.FloatField
+    )
+    assert isinstance(
+        DefinedCompound._meta.get_field("molecular_formula"), models.CharField
+    )
+    assert isinstance(DefinedCompound._meta.get_field("smiles"), models.TextField)
+    calculated_inchikey = DefinedCompound._meta.get_field("calculated_inchikey")
+    assert calculated_inchikey.max_length == 29
 
 
 def test_illdefinedcompound():
@@ -68,3 +84,21 @@ def test_querystructuretype():
     # long_description
     long_description = QueryStructureType._meta.get_field("long_description")
     assert isinstance(long_description, models.TextField)
+
+
+@pytest.mark.django_db
+def test_definedcompound_indigo_structure(defined_compound_smiles_factory):
+    compound = defined_compound_smiles_factory.create(smiles="CC(=O)O").instance
+    compound = DefinedCompound.objects.get(pk=compound.pk)
+    assert compound.serialized_structure
+    with patch.object(Indigo, "loadStructure") as load_structure:
+        assert compound.indigo_structure.canonicalSmiles() == "CC(O)=O"
+        assert "V3000" in compound.indigo_structure.molfile()
+    load_structure.assert_not_called()
+    # The molfile is parsed if the serialized molecule is outdated or unusable
+    compound.molfile_v3000 = get_molfile_v3000("C=O")
+    assert compound.indigo_structure.canonicalSmiles() == "C=O"
+    assert "V3000" in compound.indigo_structure.molfile()
+    compound = DefinedCompound.objects.get(pk=compound.pk)
+    compound.serialized_structure = b"not a molecule"
+    assert compound.indigo_structure.canonicalSmiles() == "CC(O)=O"
@@ -0,0 +1,115 @@
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from chemreg.compound.models import DefinedCompound
+from chemreg.compound.search import (
+    FingerprintIndex,
+    SimilarityIndex,
+    SimilarityIndexMissing,
+    fingerprints_changed,
+)
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import Structure
+from chemreg.indigo.substructure import compute_query_fingerprint
+
+
+@pytest.mark.django_db
+def test_fingerprint_index():
+    index = FingerprintIndex()
+    benzene = DefinedCompound.objects.create(
+        molfile_v3000=get_molfile_v3000("c1ccccc1")
+    )
+    query = compute_query_fingerprint("c1ccccc1")
+    assert index.screen(query) == [benzene.pk]
+
+    # New fingerprints are only loaded once they are announced.
+    toluene = DefinedCompound.objects.create(
+        molfile_v3000=get_molfile_v3000("Cc1ccccc1")
+    )
+    assert index.screen(query) == [benzene.pk]
+    fingerprints_changed()
+    assert sorted(index.screen(query)) == sorted([benzene.pk, toluene.pk])
+    assert len(index) == 2
+
+    # Updated fingerprints replace the old ones.
+    benzene.molfile_v3000 = get_molfile_v3000("CCO")
+    benzene.save()
+    fingerprints_changed()
+    assert index.screen(query) == [toluene.pk]
+    assert len(index) == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("offload", [False, True])
+def test_similarity_index(tmp_path, monkeypatch, offload):
+    # Builds are written in the process pool where calls are offloaded.
+    monkeypatch.setattr(indigo_settings, "OFFLOAD", offload)
+    index = SimilarityIndex(str(tmp_path))
+    aspirin, methyl_aspirin, ethanol = [
+        DefinedCompound.objects.create(molfile_v3000=get_molfile_v3000(smiles))
+        for smiles in ("CC(=O)Oc1ccccc1C(=O)O", "CC(=O)Oc1ccccc1C(=O)OC", "CCO")
+    ]
+    query = Structure("CC(=O)Oc1ccccc1C(=O)O").similarity_fingerprint
+    # Searches never build the index.
+    with pytest.raises(SimilarityIndexMissing):
+        index.search(query, 0.5, 10)
+    index.build()
+    results = index.search(query, 0.5, 10)
+    assert [pk for pk, _ in results] == [aspirin.pk, methyl_aspirin.pk]
+    assert results[0][1] == pytest.approx(1)
+    assert results[1][1] == pytest.approx(0.977, abs=0.001)
+    assert index.search(query, 0.5, 1) == results[:1]
+    assert len(index.search(query, 0, 10)) == 3
+
+    # Other workers map the same build.
+    other = SimilarityIndex(str(tmp_path))
+    assert other.search(query, 0.5, 10) == results
+
+    # Changes are added to a new build once they are announced.
+    ethanol.molfile_v3000 = get_molfile_v3000("CC(=O)Oc1ccccc1C(=O)OCC")
+    ethanol.save()
+    fingerprints_changed()
+    assert len(other.search(query, 0.5, 10)) == 3
+    assert len(index.search(query, 0.5, 10)) == 3
+    assert len(index) == 3
+    assert len(os.listdir(tmp_path)) <= 4
+    process_pool.shutdown()
+
+
+@pytest.mark.django_db
+def test_similarity_index_from_empty_build(tmp_path):
+    index = SimilarityIndex(str(tmp_path))
+    index.build()
+    query = Structure("CC(=O)Oc1ccccc1C(=O)O").similarity_fingerprint
+    assert index.search(query, 0, 10) == []
+    aspirin = DefinedCompound.objects.create(
+        molfile_v3000=get_molfile_v3000("CC(=O)Oc1ccccc1C(=O)O")
+    )
+    fingerprints_changed()
+    assert [pk for pk, _ in index.search(query, 0.5, 10)] == [aspirin.pk]
+
+
+@pytest.mark.django_db
+def test_similarity_index_update_timeout(tmp_path, monkeypatch):
+    index = SimilarityIndex(str(tmp_path))
+    index.build()
+    aspirin = DefinedCompound.objects.create(
+        molfile_v3000=get_molfile_v3000("CC(=O)Oc1ccccc1C(=O)O")
+    )
+    query = Structure("CC(=O)Oc1ccccc1C(=O)O").similarity_fingerprint
+    run = Mock(side_effect=TimeoutError)
+    monkeypatch.setattr(process_pool, "run", run)
+    fingerprints_changed()
+    # The previous build is searched, and not updated again until the
+    # fingerprints change.
+    assert index.search(query, 0.5, 10) == []
+    assert index.search(query, 0.5, 10) == []
+    assert run.call_count == 1
+    assert len(os.listdir(tmp_path)) == 3
+    monkeypatch.undo()
+    fingerprints_changed()
+    assert [pk for pk, _ in index.search(query, 0.5, 10)] == [aspirin.pk]
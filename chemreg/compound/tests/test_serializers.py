@@ -1,6 +1,8 @@
 import re
+from unittest.mock import patch
 
 import pytest
+from indigo import Indigo
 
 from chemreg.compound.serializers import (
     CompoundSerializer,
@@ -9,6 +11,7 @@ from chemreg.compound.serializers import (
     PolymorphicModelSerializer,
 )
 from chemreg.compound.settings import compound_settings
+from chemreg.indigo.cache import conversion_cache
 
 
 @pytest.mark.django_db
@@ -128,6 +131,23 @@ def test_override_unique_inchikey_via_smiles(defined_compound_smiles_factory):
     assert one.inchikey == two.inchikey
 
 
+@pytest.mark.django_db
+def test_near_duplicate_inchikey(defined_compound_smiles_factory):
+    serializer = defined_compound_smiles_factory.build(smiles="CCO")
+    assert serializer.is_valid()
+    ethanol = serializer.save()
+    assert ethanol.inchikey_connectivity == "LFQSCWFLJHTTHZ"
+    assert ethanol.inchikey_protonation == "N"
+    # Isotopologues and stereoisomers are registered, but reported.
+    serialized = defined_compound_smiles_factory.build(smiles="[13CH3]CO")
+    assert serialized.is_valid()
+    labelled = serialized.save()
+    assert labelled.inchikey_connectivity == ethanol.inchikey_connectivity
+    assert serialized.near_duplicates == [ethanol.pk]
+    meta = serialized.get_root_meta({}, False)
+    assert meta["near_duplicates"] == [ethanol.pk]
+
+
 @pytest.mark.django_db
 def test_defined_compound_from_v2000_molfile(defined_compound_v2000_factory):
     dc = defined_compound_v2000_factory.build()
@@ -176,3 +196,26 @@ def test_compound_serializer():
         DefinedCompoundSerializer,
         IllDefinedCompoundSerializer,
     ]
+
+
+@pytest.mark.parametrize("field", ["molfile_v3000", "molfile_v2000", "smiles"])
+@pytest.mark.django_db
+def test_defined_compound_parses_structure_once(
+    field,
+    defined_compound_factory,
+    defined_compound_v2000_factory,
+    defined_compound_smiles_factory,
+):
+    factory = {
+        "molfile_v3000": defined_compound_factory,
+        "molfile_v2000": defined_compound_v2000_factory,
+        "smiles": defined_compound_smiles_factory,
+    }[field]
+    serializer = factory.build()
+    with patch.object(conversion_cache, "get", return_value=None), patch.object(
+        Indigo, "loadMolecule", autospec=True, side_effect=Indigo.loadMolecule
+    ) as load:
+        assert serializer.is_valid()
+        serializer.save()
+    # SMILES are read back from their v3000 molfile to compute the InChIKey
+    assert load.call_count == (2 if field == "smiles" else 1)
@@ -0,0 +1,29 @@
+import pytest
+
+from chemreg.compound.models import DefinedCompound
+from chemreg.indigo.inchi import get_inchikey
+from chemreg.indigo.molfile import get_molfile_v3000
+
+
+@pytest.mark.django_db
+def test_descriptors_computed_on_save(defined_compound_smiles_factory):
+    compound = defined_compound_smiles_factory.create(smiles="C=O").instance
+    compound = DefinedCompound.objects.get(pk=compound.pk)
+    assert compound.molecular_formula == "C H2 O"
+    assert round(compound.molecular_weight, 2) == 30.03
+    assert compound.smiles == "C=O"
+    assert compound.calculated_inchikey == compound.inchikey
+
+
+@pytest.mark.django_db
+def test_descriptors_recomputed_on_structure_change(defined_compound_smiles_factory):
+    compound = defined_compound_smiles_factory.create(smiles="C=O").instance
+    compound = DefinedCompound.objects.get(pk=compound.pk)
+    assert not compound.descriptors_outdated
+    molfile = get_molfile_v3000("ClC=C(Cl)Cl")
+    compound.molfile_v3000 = molfile
+    assert compound.descriptors_outdated
+    compound.save()
+    compound.refresh_from_db()
+    assert compound.molecular_formula == "C2 H Cl3"
+    assert compound.calculated_inchikey == get_inchikey(molfile)
@@ -0,0 +1,77 @@
+import pytest
+from partialsmiles import ParseSmiles, SMILESSyntaxError
+
+from chemreg.compound.smiles import bracket_atom_symbol, scan_smiles
+
+
+@pytest.mark.parametrize(
+    "smiles",
+    [
+        "",
+        "CC(C)",
+        "CC(C)C",
+        "CC()C",
+        "C(C)(C)C",
+        "C((C))C",
+        "C=(C)C",
+        "C==C",
+        "C=",
+        "CC)",
+        "C:C",
+        "1CC",
+        "C(C)1CC",
+        "C1CC",
+        "C1C1",
+        "C11",
+        "C=1CC#1",
+        "C%10CC%10",
+        "C.C..C",
+        "C>C>C>C",
+        "C>>C",
+        "CC trailing text",
+        "[",
+        "[13",
+        "[0C]",
+        "[1234C]",
+        "[Xx]",
+        "[C@@H]",
+        "[C@@H](O)N",
+        "[NH4+]",
+        "[Fe+++]",
+        "[Fe+-]",
+        "[O-2]",
+        "[CH3",
+        "C$C",
+        "C\\C=C/C",
+        "foo",
+        "Cl.[Na+]",
+    ],
+)
+def test_scan_smiles(smiles):
+    """The scanner raises the errors of `partialsmiles` for the same input."""
+    try:
+        ParseSmiles(smiles, partial=False)
+    except SMILESSyntaxError as e:
+        with pytest.raises(SMILESSyntaxError) as raised:
+            scan_smiles(smiles)
+        assert str(raised.value) == str(e)
+        return
+    except Exception:
+        pass
+    assert scan_smiles(smiles) is False
+
+
+def test_scan_smiles_aromatic():
+    # Kekulization is left to `partialsmiles`, as are non-ASCII SMILES.
+    assert scan_smiles("c1ccccc1") is True
+    assert scan_smiles("C[se]C") is True
+    assert scan_smiles("CC²") is True
+    with pytest.raises(SMILESSyntaxError):
+        scan_smiles("c1cccc")
+
+
+def test_bracket_atom_symbol():
+    assert bracket_atom_symbol("[13CH3+]") == "C"
+    assert bracket_atom_symbol("[se]") == "se"
+    assert bracket_atom_symbol("[CH3") is None
+    assert bracket_atom_symbol("[Xx]") is None
@@ -6,7 +6,17 @@ import pytest
 
 from chemreg.compound.models import BaseCompound
 from chemreg.compound.settings import compound_settings
-from chemreg.compound.utils import build_cid, extract_int
+from chemreg.compound.utils import (
+    build_cid,
+    canonicalize_mrvfile,
+    extract_int,
+    format_formula,
+    hash_mrvfile,
+    hash_smiles,
+    parent_inchikey,
+    parse_formula,
+    split_inchikey,
+)
 
 
 @pytest.mark.django_db
@@ -33,3 +43,57 @@ def test_build_cid():
     cid = build_cid()
     assert cid_re.match(cid)
     assert extract_int(cid) == test_i + 1
+
+
+def test_split_inchikey():
+    assert split_inchikey("QNAYBMKLOCPYGJ-REOHCLBHSA-N") == ("QNAYBMKLOCPYGJ", "N")
+    assert split_inchikey("INCHI") == (None, None)
+    assert split_inchikey(None) == (None, None)
+
+
+def test_canonicalize_mrvfile():
+    canonical = '<cml><MDocument><atom id="a1" x2="0"></atom></MDocument></cml>'
+    assert canonicalize_mrvfile(canonical) == canonical
+    formatted = (
+        '<?xml version="1.0"?>\n<cml>\n  <MDocument>\n'
+        '    <atom x2="0" id="a1"/>\n  <!-- atom --></MDocument>\n</cml>\n'
+    )
+    assert canonicalize_mrvfile(formatted) == canonical
+    assert canonicalize_mrvfile("<cml>") is None
+    assert canonicalize_mrvfile(None) is None
+    assert hash_mrvfile(formatted) == hash_mrvfile(canonical)
+    assert len(hash_mrvfile(canonical)) == 64
+    assert hash_mrvfile(canonical.replace('"0"', '"1"')) != hash_mrvfile(canonical)
+    assert hash_mrvfile("<cml>") is None
+
+
+def test_hash_smiles():
+    assert len(hash_smiles("CCO")) == 64
+    assert hash_smiles("CCO") != hash_smiles("OCC")
+    assert hash_smiles(None) is None
+
+
+def test_parse_formula():
+    assert parse_formula("C2 H6 O") == {"C": 2, "H": 6, "O": 1}
+    assert parse_formula("C2H6O") == {"C": 2, "H": 6, "O": 1}
+    assert parse_formula("CH3 Cl Cl") == {"C": 1, "H": 3, "Cl": 2}
+    for formula in ("", "c2h6o", "C2-H6"):
+        with pytest.raises(ValueError):
+            parse_formula(formula)
+
+
+def test_format_formula():
+    assert format_formula({"O": 1, "H": 6, "C": 2}) == "C2 H6 O"
+    assert format_formula({"Cl": 3, "C": 1, "H": 1}) == "C H Cl3"
+    # Without carbon, every element is in alphabetical order
+    assert format_formula({"O": 1, "H": 2}) == "H2 O"
+    assert format_formula({"Na": 1, "Cl": 1, "Br": 0}) == "Cl Na"
+
+
+def test_parent_inchikey():
+    assert parent_inchikey("BAVYZALUXZFZLV-UHFFFAOYSA-O") == (
+        "BAVYZALUXZFZLV-UHFFFAOYSA-N"
+    )
+    assert parent_inchikey("QTBSBXVTEAMEQO-UHFFFAOYSA-M") == (
+        "QTBSBXVTEAMEQO-UHFFFAOYSA-N"
+    )
@@ -1,4 +1,5 @@
 import json
+from unittest.mock import patch
 
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAdminUser
@@ -6,12 +7,20 @@ from rest_framework.reverse import reverse
 from rest_framework.test import force_authenticate
 
 import pytest
+from indigo import Indigo, IndigoException
 
+from chemreg.compound.models import DefinedCompound
+from chemreg.compound.settings import compound_settings
 from chemreg.compound.tests.factories import (
     DefinedCompoundFactory,
     IllDefinedCompoundFactory,
 )
 from chemreg.compound.views import CompoundViewSet, DefinedCompoundViewSet
+from chemreg.indigo.depiction import get_depiction
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.mrvfile import get_mrvfile
+from chemreg.indigo.reader import read_sdf
+from chemreg.indigo.settings import indigo_settings
 from chemreg.jsonapi.views import ReadOnlyModelViewSet
 
 
@@ -126,6 +135,16 @@ def test_defined_compound_view():
         "molfile_v3000",
         "molfile_v2000",
         "smiles",
+        "inchikey_connectivity",
+        "structure_connectivity",
+        "substructure",
+        "similar_to",
+        "threshold",
+        "molecular_weight__gte",
+        "molecular_weight__lte",
+        "molecular_formula",
+        "elements",
+        "contains_component",
     ]
 
 
@@ -513,3 +532,231 @@ def test_compound_delete_type_change(
     resp = client.get(f"/illDefinedCompounds/{ill_defined.id}")
     assert resp.status_code == 301
     assert resp.url == f"/compounds/{defined.id}"
+
+
+@pytest.mark.django_db
+def test_defined_compound_detail_served_from_database(client, defined_compound_factory):
+    """Detail attributes are read from stored columns without calling Indigo."""
+    dc = defined_compound_factory().instance
+    with patch.object(Indigo, "loadMolecule") as load, patch.object(
+        Indigo, "loadStructure"
+    ) as load_structure:
+        resp = client.get(f"/definedCompounds/{dc.pk}").json()["data"]["attributes"]
+    assert not load.called
+    assert not load_structure.called
+    assert resp["molecularFormula"] == dc.molecular_formula
+    assert resp["calculatedInchikey"] == dc.calculated_inchikey
+
+
+@pytest.mark.django_db
+def test_defined_compound_mrvfile(client, defined_compound_factory):
+    dc = defined_compound_factory().instance
+    resp = client.get(f"/definedCompounds/{dc.pk}/mrvfile")
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "chemical/x-mrv"
+    assert resp.content.decode() == get_mrvfile(dc.molfile_v3000)
+    assert client.get("/definedCompounds/DTXCID000/mrvfile").status_code == 404
+
+
+@pytest.mark.django_db
+def test_defined_compound_export(client, defined_compound_factory, substance_factory):
+    substance = substance_factory(defined=True).instance
+    dc = substance.associated_compound
+    other = defined_compound_factory().instance
+    resp = client.get("/definedCompounds/export.sdf")
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "chemical/x-mdl-sdfile"
+    assert resp.streaming
+    records = list(read_sdf(b"".join(resp.streaming_content).splitlines()))
+    assert [r.data["CID"] for r in records] == sorted([dc.pk, other.pk])
+    data = next(r.data for r in records if r.data["CID"] == dc.pk)
+    assert data["INCHIKEY"] == dc.inchikey
+    assert data["SID"] == substance.pk
+    assert data["CASRN"] == substance.casrn
+    assert data["PREFERRED_NAME"] == substance.preferred_name
+    resp = client.get("/definedCompounds/export.sdf", {"filter[id]": other.pk})
+    records = list(read_sdf(b"".join(resp.streaming_content).splitlines()))
+    assert [r.data for r in records] == [{"CID": other.pk, "INCHIKEY": other.inchikey}]
+    assert records[0].molfile == other.molfile_v3000.rstrip("\n")
+    resp = client.get(
+        "/definedCompounds/export.sdf", {"filter[molecularWeight.gte]": "x"}
+    )
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+def test_defined_compound_image(client, defined_compound_factory):
+    dc = defined_compound_factory().instance
+    url = f"/definedCompounds/{dc.pk}/image"
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "image/svg+xml"
+    assert resp.content == get_depiction(dc.molfile_v3000, "svg", 300)
+    assert "private" in resp["Cache-Control"]
+    assert "max-age" in resp["Cache-Control"]
+    etag = resp["ETag"]
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+    assert resp["ETag"] == etag
+    resp = client.get(url, {"format": "png", "size": "120"})
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "image/png"
+    assert resp.content == get_depiction(dc.molfile_v3000, "png", 120)
+    assert resp["ETag"] != etag
+    resp = client.get(url, HTTP_ACCEPT="image/png")
+    assert resp["Content-Type"] == "image/png"
+    resp = client.get(url, {"size": "100000"})
+    assert resp.status_code == 400
+    assert resp["Content-Type"] == "application/vnd.api+json"
+    assert client.get(url, {"size": "big"}).status_code == 400
+    assert client.get(url, {"format": "gif"}).status_code == 404
+    assert client.get("/definedCompounds/DTXCID000/image").status_code == 404
+
+
+@pytest.mark.django_db
+def test_defined_compound_image_errors(client, defined_compound_factory, monkeypatch):
+    dc = defined_compound_factory().instance
+    url = f"/definedCompounds/{dc.pk}/image"
+    monkeypatch.setattr(indigo_settings, "MAX_ATOMS", 3)
+    resp = client.get(url, {"size": "123"})
+    assert resp.status_code == 422
+    assert resp.json()["errors"][0]["code"] == "structure_too_complex"
+    monkeypatch.undo()
+    with patch(
+        "chemreg.compound.views.get_depiction", side_effect=IndigoException(b"render")
+    ):
+        resp = client.get(url, {"size": "124"})
+    assert resp.status_code == 422
+    assert resp["Content-Type"] == "application/vnd.api+json"
+
+
+@pytest.mark.django_db
+def test_defined_compound_standardize(client, defined_compound_factory, user):
+    """Structures are standardized and matched to registered compounds."""
+    dc = defined_compound_factory().instance
+    client.force_authenticate(user=user)
+    structures = [dc.molfile_v3000, "C1=CC=CC=C1", "C1=CC=CC=C1)"]
+    resp = client.post(
+        "/definedCompounds/standardize",
+        {
+            "data": {
+                "type": "standardizedStructure",
+                "attributes": {"structures": structures},
+            }
+        },
+    )
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert [d["id"] for d in data] == ["0", "1", "2"]
+    assert all(d["type"] == "standardizedStructure" for d in data)
+    registered, benzene, invalid = [d["attributes"] for d in data]
+    assert registered["cid"] == dc.pk
+    assert registered["inchikey"] == dc.inchikey
+    assert not registered["validationErrors"]
+    assert benzene["inchikey"] == "UHOVQNZJYSORNB-UHFFFAOYSA-N"
+    assert "V3000" in benzene["molfileV3000"]
+    assert benzene["cid"] is None
+    assert invalid["validationErrors"]
+    assert not DefinedCompound.objects.filter(inchikey=benzene["inchikey"]).exists()
+
+
+@pytest.mark.django_db
+def test_defined_compound_standardize_limit(client, monkeypatch, user):
+    monkeypatch.setattr(compound_settings, "STANDARDIZE_LIMIT", 1)
+    client.force_authenticate(user=user)
+    resp = client.post(
+        "/definedCompounds/standardize",
+        {
+            "data": {
+                "type": "standardizedStructure",
+                "attributes": {"structures": ["C", "CC"]},
+            }
+        },
+    )
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+def test_defined_compound_lookup(client, defined_compound_smiles_factory, user):
+    """Structures in any format are matched to CIDs by InChIKey."""
+    dc = defined_compound_smiles_factory().instance
+    client.force_authenticate(user=user)
+    structures = [
+        dc.molfile_v3000,
+        Indigo().loadMolecule(dc.molfile_v3000).molfile(),
+        "C1=CC=CC=C1",
+        "C1=CC=CC=C1)",
+        "<cml></cml>",
+    ]
+    resp = client.post(
+        "/definedCompounds/lookup",
+        {
+            "data": {
+                "type": "structureLookup",
+                "attributes": {"structures": structures},
+            }
+        },
+    )
+    assert resp.status_code == 200
+    data = resp.json()["data"]
+    assert [d["id"] for d in data] == ["0", "1", "2", "3", "4"]
+    assert all(d["type"] == "structureLookup" for d in data)
+    v3000, v2000, benzene, invalid, unsupported = [d["attributes"] for d in data]
+    assert v3000 == {"inchikey": dc.inchikey, "cid": dc.pk, "error": None}
+    assert v2000 == v3000
+    assert benzene["inchikey"] == "UHOVQNZJYSORNB-UHFFFAOYSA-N"
+    assert benzene["cid"] is None
+    assert invalid["error"] == "InChIKey not computable for provided structure."
+    assert unsupported["error"]
+
+
+@pytest.mark.django_db
+def test_defined_compound_lookup_limit(client, monkeypatch, user):
+    monkeypatch.setattr(compound_settings, "LOOKUP_LIMIT", 1)
+    client.force_authenticate(user=user)
+    resp = client.post(
+        "/definedCompounds/lookup",
+        {
+            "data": {
+                "type": "structureLookup",
+                "attributes": {"structures": ["C", "CC"]},
+            }
+        },
+    )
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("endpoint", ["lookup", "standardize"])
+def test_defined_compound_batch_timeout(client, user, endpoint):
+    """Batches the process pool does not finish in time are refused."""
+    client.force_authenticate(user=user)
+    with patch.object(process_pool, "map", side_effect=TimeoutError):
+        resp = client.post(
+            f"/definedCompounds/{endpoint}",
+            {
+                "data": {
+                    "type": {
+                        "lookup": "structureLookup",
+                        "standardize": "standardizedStructure",
+                    }[endpoint],
+                    "attributes": {"structures": ["C"]},
+                }
+            },
+        )
+    assert resp.status_code == 422
+    assert resp.json()["errors"][0]["code"] == "structure_too_complex"
+
+
+@pytest.mark.django_db
+def test_defined_compound_post_budget(admin_user, client, monkeypatch):
+    """Structures over the atom budget are rejected before being stored."""
+    client.force_authenticate(user=admin_user)
+    monkeypatch.setattr(indigo_settings, "MAX_ATOMS", 3)
+    response = client.post(
+        "/definedCompounds",
+        {"data": {"type": "definedCompound", "attributes": {"smiles": "CCCC"}}},
+    )
+    assert response.status_code == 422
+    assert response.json()["errors"][0]["code"] == "structure_too_complex"
+    assert not DefinedCompound.objects.exists()
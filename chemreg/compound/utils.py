@@ -1,8 +1,8 @@
+import hashlib
+import re
 import time
-import xml
 import xml.etree.ElementTree as ET
-from typing import Optional
-from xml.dom.minidom import Node
+from typing import Dict, Optional, Tuple
 
 from django.apps import apps
 from django.core.cache import cache
@@ -12,6 +12,16 @@ from django.db.models.functions import Cast, Substr
 from chemreg.common.utils import chemreg_checksum
 from chemreg.compound.settings import compound_settings
 
+INCHIKEY_PATTERN = re.compile(r"^([A-Z]{14})-[A-Z]{10}-([A-Z])$")
+"""Matches a standard InChIKey, capturing its connectivity block and
+protonation flag."""
+
+FORMULA_PATTERN = re.compile(r"^(?:\s*[A-Z][a-z]?\d*)+\s*$")
+"""Matches a molecular formula such as "C2 H6 O", with or without spaces."""
+
+FORMULA_ELEMENT_PATTERN = re.compile(r"([A-Z][a-z]?)(\d*)")
+"""Matches an element and its count in a molecular formula."""
+
 
 def build_cid(i=None) -> str:
     """Builds a unique CID.
@@ -92,37 +102,142 @@ def extract_checksum(cid: str) -> Optional[int]:
         return None
 
 
-def remove_blanks(node):
-    for x in node.childNodes:
-        if x.nodeType == Node.TEXT_NODE:
-            if x.nodeValue:
-                x.nodeValue = x.nodeValue.strip()
-        elif x.nodeType == Node.ELEMENT_NODE:
-            remove_blanks(x)
+def split_inchikey(inchikey: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Extracts the connectivity block and protonation flag from an InChIKey.
+
+    Stereoisomers and isotopologues share both, since their differences are
+    encoded in the second block.
+
+    Args:
+        inchikey: An InChIKey.
+
+    Returns:
+        The 14 character connectivity block and the protonation flag, or
+        `(None, None)` if `inchikey` is not a standard InChIKey.
+
+    """
+    match = INCHIKEY_PATTERN.match(inchikey or "")
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+
+def parent_inchikey(inchikey: str) -> str:
+    """The InChIKey of the neutral parent of a component.
+
+    Salts hold their parents protonated or deprotonated, which InChIKeys only
+    encode in their last character, so setting it to "N" gives the InChIKey
+    of the neutral parent.
+
+    Args:
+        inchikey: A standard InChIKey.
+
+    Returns:
+        The InChIKey with the protonation flag "N".
+
+    """
+    return inchikey[:-1] + "N"
+
 
+def hash_smiles(smiles: Optional[str]) -> Optional[str]:
+    """Hashes a canonical SMILES string for indexed lookups.
 
-def format_mrvfile(s: str):
-    """Formats an XML string.
+    SMILES have no length limit, so the fixed length hash is indexed instead
+    of the string itself.
 
     Args:
-        s (str): The compound that is returned from Indigo's cml method.
+        smiles: A canonical SMILES string.
 
     Returns:
-        An XML string that can be used as an mrvfile to load into MarvinJS.
+        The hex SHA-256 digest, or `None` if `smiles` is `None`.
 
     """
+    if smiles is None:
+        return None
+    return hashlib.sha256(smiles.encode()).hexdigest()
+
+
+def canonicalize_mrvfile(mrvfile: Optional[str]) -> Optional[str]:
+    """Writes an MRV document in a canonical form.
 
-    s = s[s.index("<cml>") :]
-    xml_string = xml.dom.minidom.parseString(s)
-    remove_blanks(xml_string)
-    mol = xml_string.getElementsByTagName("molecule")[0]
-    mol_tree = ET.fromstring(mol.toxml())
-    # create wrapping elements
-    m_struct = ET.Element("MChemicalStruct")
-    m_doc = ET.Element("MDocument")
-    cml = ET.Element("cml")
-    # append from inside out
-    m_struct.append(mol_tree)
-    m_doc.append(m_struct)
-    cml.append(m_doc)
-    return ET.tostring(cml, encoding="unicode")
+    The document is written as Canonical XML 2.0 with the whitespace around
+    text removed, so attributes are sorted, empty elements expanded and the
+    XML declaration, comments and indentation dropped. Documents that differ
+    only in formatting have the same canonical form.
+
+    Args:
+        mrvfile: An MRV document.
+
+    Returns:
+        The canonical document, or `None` if `mrvfile` is `None` or not
+        well-formed XML.
+
+    """
+    if mrvfile is None:
+        return None
+    try:
+        return ET.canonicalize(mrvfile, strip_text=True)
+    except ET.ParseError:
+        return None
+
+
+def hash_mrvfile(mrvfile: Optional[str]) -> Optional[str]:
+    """Hashes the canonical form of an MRV document for indexed lookups.
+
+    Args:
+        mrvfile: An MRV document.
+
+    Returns:
+        The hex SHA-256 digest of `canonicalize_mrvfile(mrvfile)`, or `None`
+        if there is no canonical form.
+
+    """
+    canonical = canonicalize_mrvfile(mrvfile)
+    if canonical is None:
+        return None
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def parse_formula(formula: str) -> Dict[str, int]:
+    """Counts the atoms of each element in a molecular formula.
+
+    Args:
+        formula: A molecular formula such as "C2 H6 O", with or without
+            spaces. Elements may repeat.
+
+    Returns:
+        The number of atoms by element symbol.
+
+    Raises:
+        ValueError: If `formula` is not a molecular formula.
+
+    """
+    if not FORMULA_PATTERN.match(formula):
+        raise ValueError(f"Invalid molecular formula {formula!r}.")
+    counts: Dict[str, int] = {}
+    for element, count in FORMULA_ELEMENT_PATTERN.findall(formula):
+        counts[element] = counts.get(element, 0) + int(count or 1)
+    return counts
+
+
+def format_formula(counts: Dict[str, int]) -> str:
+    """Writes element counts as a molecular formula the way Indigo does.
+
+    Elements are in Hill order and separated by spaces, e.g. "C2 H6 O", so
+    the result can be compared with stored formulas.
+
+    Args:
+        counts: The number of atoms by element symbol.
+
+    Returns:
+        The molecular formula.
+
+    """
+    hill = ["C", "H"] if "C" in counts else []
+    order = [element for element in hill if element in counts]
+    order += sorted(element for element in counts if element not in hill)
+    return " ".join(
+        element if counts[element] == 1 else f"{element}{counts[element]}"
+        for element in order
+        if counts[element]
+    )
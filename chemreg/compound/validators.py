@@ -6,25 +6,55 @@ from rest_framework.exceptions import ValidationError
 import partialsmiles as ps
 from indigo import IndigoException
 
+from chemreg.compound.exceptions import budget_exception
 from chemreg.compound.settings import compound_settings
+from chemreg.compound.smiles import scan_smiles
 from chemreg.compound.utils import chemreg_checksum, extract_checksum, extract_int
-from chemreg.indigo.inchi import get_inchikey
-from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.budget import BudgetExceeded, check_size
+from chemreg.indigo.reader import (
+    MOLFILE_V2000,
+    MOLFILE_V3000,
+    SMILES,
+    molfile_version,
+    sniff,
+)
+from chemreg.indigo.structure import Structure
+
+
+def validate_structure_size(structure: str) -> None:
+    """Validates that a structure is within the input size budget.
+
+    This should run before any other structure validator, so oversized input
+    is never parsed.
+
+    Args:
+        structure: The structure string
+
+    Raises:
+        StructureTooLarge: If the structure exceeds the budget.
+    """
+    try:
+        check_size(structure)
+    except BudgetExceeded as e:
+        raise budget_exception(e)
 
 
 def validate_inchikey_computable(molfile: str) -> None:
     """Validates that an InChIKey can be computed from the provided molfile.
 
     Args:
-        molfile: The molfile string
+        molfile: The molfile string or an already loaded `Structure`
 
     Raises:
         ValidationError: If the InChIKey cannot be computed.
+        StructureTooComplex: If the structure exceeds a budget.
     """
     try:
-        get_inchikey(molfile)
+        Structure.coerce(molfile).inchikey
     except IndigoException:
         raise ValidationError("InChIKey not computable for provided structure.")
+    except BudgetExceeded as e:
+        raise budget_exception(e)
 
 
 def validate_smiles(smiles: str) -> None:
@@ -42,7 +72,9 @@ def validate_smiles(smiles: str) -> None:
         the parser encountered an invalid character.
     """
     try:
-        ps.ParseSmiles(smiles, partial=False)
+        # Most SMILES are decided without the slower parser, see `scan_smiles`.
+        if scan_smiles(smiles):
+            ps.ParseSmiles(smiles, partial=False)
     except ps.ValenceError:
         pass
     except ps.SMILESSyntaxError as e:
@@ -58,12 +90,7 @@ def validate_molfile_v3000(molfile: str) -> None:
     Raises:
         ValidationError: The counts line does not specify V3000.
     """
-    try:
-        # last 5 non-whitespace chars of the 4th line.
-        # page 9, here:  https://www.daylight.com/meetings/mug05/Kappler/ctfile.pdf
-        version = molfile.split("\n")[3].strip()[-5:]
-        assert version == "V3000"
-    except (AssertionError, IndexError):
+    if molfile_version(molfile) != "V3000":
         raise ValidationError("Structure is not in V3000 format.")
 
 
@@ -76,28 +103,40 @@ def validate_molfile_v2000(molfile: str) -> None:
     Raises:
         ValidationError: The counts line does not specify "V2000"
     """
-    try:
-        # last 5 non-whitespace chars of the 4th line.
-        # page 9, here:  https://www.daylight.com/meetings/mug05/Kappler/ctfile.pdf
-        version = molfile.split("\n")[3].strip()[-5:]
-        assert version == "V2000"
-    except (AssertionError, IndexError):
+    if molfile_version(molfile) != "V2000":
         raise serializers.ValidationError("Structure is not in V2000 format.")
 
 
+def validate_single_structure(structure: str) -> None:
+    """Validates that a structure is a SMILES string or a single molfile.
+
+    Args:
+        structure: The structure string
+
+    Raises:
+        ValidationError: The format is not recognized or is an SD file or MRV.
+    """
+    if sniff(structure) not in (SMILES, MOLFILE_V2000, MOLFILE_V3000):
+        raise ValidationError("Structure is not a SMILES string or a single molfile.")
+
+
 def validate_molfile_v3000_computable(structure: str) -> None:
     """Validates that the structure can be loaded into Indigo without exception.
 
     Args:
-        structure: the structure string ("molfile_v2000", "smiles")
+        structure: the structure string ("molfile_v2000", "smiles") or an already
+            loaded `Structure`
 
     Raises:
         ValidationError: If the InChIKey cannot be computed.
+        StructureTooComplex: If the structure exceeds a budget.
     """
     try:
-        get_molfile_v3000(structure)
+        Structure.coerce(structure).molfile_v3000
     except IndigoException:
         raise ValidationError("Cannot be converted into a molfile.")
+    except BudgetExceeded as e:
+        raise budget_exception(e)
 
 
 # DEPRECATED -- these need to remain defined for migration 0001
@@ -1,17 +1,36 @@
-from django.http import HttpResponsePermanentRedirect
+import hashlib
+
+from django.http import (
+    HttpResponse,
+    HttpResponsePermanentRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
 from rest_framework import status
-from rest_framework.permissions import IsAdminUser
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
+from indigo import IndigoException
+
 from chemreg.common.mixins import DeprecateDeleteMixin
-from chemreg.compound.filters import DefinedCompoundFilter
+from chemreg.compound.exceptions import StructureTooComplex, budget_exception
+from chemreg.compound.export import export_sdf
+from chemreg.compound.filters import DefinedCompoundFilter, IllDefinedCompoundFilter
+from chemreg.compound.lookup import lookup_structures
 from chemreg.compound.models import (
     BaseCompound,
     DefinedCompound,
     IllDefinedCompound,
     QueryStructureType,
 )
+from chemreg.compound.renderers import PNGRenderer, SDFRenderer, SVGRenderer
 from chemreg.compound.serializers import (
     CompoundDeleteSerializer,
     CompoundDetailSerializer,
@@ -20,7 +39,15 @@ from chemreg.compound.serializers import (
     DefinedCompoundSerializer,
     IllDefinedCompoundSerializer,
     QueryStructureTypeSerializer,
+    StandardizedStructureSerializer,
+    StructureLookupSerializer,
 )
+from chemreg.compound.settings import compound_settings
+from chemreg.compound.standardize import standardize_structures
+from chemreg.indigo.budget import BudgetExceeded
+from chemreg.indigo.cache import conversion_cache
+from chemreg.indigo.depiction import MIN_SIZE, depiction_kind, get_depiction
+from chemreg.indigo.mrvfile import get_mrvfile
 from chemreg.jsonapi.views import ModelViewSet, ReadOnlyModelViewSet
 
 
@@ -110,6 +137,10 @@ class DefinedCompoundViewSet(
     def get_serializer_class(self, *args, **kwargs):
         if self.action == "retrieve":
             return DefinedCompoundDetailSerializer
+        if self.action == "standardize":
+            return StandardizedStructureSerializer
+        if self.action == "lookup":
+            return StructureLookupSerializer
         return super().get_serializer_class(*args, **kwargs)
 
     @property
@@ -126,6 +157,125 @@ class DefinedCompoundViewSet(
             kwargs["admin_override"] = True
         return super().get_serializer(*args, **kwargs)
 
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    def standardize(self, request):
+        """Standardizes a list of structures without storing them.
+
+        Nothing is stored, so any authenticated user may standardize.
+        """
+        context = self.get_serializer_context()
+        serializer = StandardizedStructureSerializer(data=request.data, context=context)
+        serializer.is_valid(raise_exception=True)
+        try:
+            standardized = standardize_structures(
+                serializer.validated_data["structures"]
+            )
+        except BudgetExceeded as e:
+            raise budget_exception(e)
+        serializer = StandardizedStructureSerializer(
+            standardized, many=True, context=context
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    def lookup(self, request):
+        """Looks up the CIDs of a list of structures.
+
+        Structures are matched by InChIKey, as the molfile filters do, but a
+        single request resolves thousands of them.
+        """
+        context = self.get_serializer_context()
+        serializer = StructureLookupSerializer(data=request.data, context=context)
+        serializer.is_valid(raise_exception=True)
+        try:
+            looked_up = lookup_structures(serializer.validated_data["structures"])
+        except BudgetExceeded as e:
+            raise budget_exception(e)
+        serializer = StructureLookupSerializer(looked_up, many=True, context=context)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path="export.sdf",
+        url_name="export",
+        renderer_classes=[SDFRenderer],
+    )
+    def export(self, request):
+        """Streams the compounds, filtered as when listed, as an SD file.
+
+        Records are written as they are read from the database, so the
+        response can hold the whole registry.
+        """
+        response = StreamingHttpResponse(
+            export_sdf(self.filter_queryset(self.get_queryset())),
+            content_type=SDFRenderer.media_type,
+        )
+        response["Content-Disposition"] = 'attachment; filename="definedCompounds.sdf"'
+        return response
+
+    @action(detail=True, methods=["get"])
+    def mrvfile(self, request, pk=None):
+        """Returns the structure as an MRV document for MarvinJS.
+
+        Documents are cached by structure, so they are converted again once
+        the structure changes.
+        """
+        compound = self.get_object()
+        try:
+            mrvfile = get_mrvfile(compound.molfile_v3000)
+        except BudgetExceeded as e:
+            raise budget_exception(e)
+        return HttpResponse(mrvfile, content_type="chemical/x-mrv")
+
+    @action(
+        detail=True,
+        methods=["get"],
+        renderer_classes=[SVGRenderer, PNGRenderer],
+        filter_backends=[],
+    )
+    def image(self, request, pk=None):
+        """Returns the structure rendered as an SVG or PNG image.
+
+        The `format` query parameter, or the Accept header, chooses the format
+        and `size` the width and height in pixels. Images are cached by
+        structure and options, and their ETag changes with either, so clients
+        may keep them for `IMAGE_MAX_AGE` and then revalidate.
+        """
+        compound = self.get_object()
+        image_format = request.accepted_renderer.format
+        size = request.query_params.get("size", compound_settings.IMAGE_SIZE)
+        try:
+            size = int(size)
+        except ValueError:
+            raise ValidationError("The image size must be a number of pixels.")
+        if not MIN_SIZE <= size <= compound_settings.IMAGE_MAX_SIZE:
+            raise ValidationError(
+                f"The image size must be between {MIN_SIZE} and "
+                f"{compound_settings.IMAGE_MAX_SIZE} pixels."
+            )
+        structure = compound.molfile_v3000
+        key = conversion_cache.key(depiction_kind(image_format, size), structure)
+        digest = hashlib.sha256(f"{compound.pk}\0{key}".encode()).hexdigest()
+        etag = f'"{digest}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                image = get_depiction(structure, image_format, size)
+            except IndigoException:
+                raise StructureTooComplex("Structure could not be rendered.")
+            except BudgetExceeded as e:
+                raise budget_exception(e)
+            response = Response(image)
+        response["ETag"] = etag
+        # What a user may see depends on who they are, e.g. soft deleted
+        # compounds, so only their own browser may keep images.
+        patch_cache_control(
+            response, private=True, max_age=compound_settings.IMAGE_MAX_AGE
+        )
+        patch_vary_headers(response, ["Accept"])
+        return response
+
 
 class IllDefinedCompoundViewSet(
     SoftDeleteCompoundMixin, CIDPermissionsMixin, ModelViewSet
@@ -133,7 +283,7 @@ class IllDefinedCompoundViewSet(
 
     queryset = IllDefinedCompound.objects.with_deleted().all()
     serializer_class = IllDefinedCompoundSerializer
-    filterset_fields = ["id"]
+    filterset_class = IllDefinedCompoundFilter
     permission_classes_by_action = {
         "create": [IsAdminUser],
         "partial_update": [IsAdminUser],
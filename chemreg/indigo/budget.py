@@ -0,0 +1,78 @@
+from prometheus_client import Counter
+
+from chemreg.indigo.settings import indigo_settings
+
+BUDGET_EXCEEDED = Counter(
+    "chemreg_indigo_budget_exceeded",
+    "Structures rejected for exceeding a chemistry budget.",
+    ["budget"],
+)
+
+
+class BudgetExceeded(Exception):
+    """A structure exceeded one of the budgets for chemistry calls.
+
+    Attributes:
+        budget (str): The budget that was exceeded, as used in metrics.
+
+    """
+
+    budget = ""
+
+
+class InputSizeExceeded(BudgetExceeded):
+    """The structure string is longer than `MAX_SIZE`."""
+
+    budget = "size"
+
+
+class AtomCountExceeded(BudgetExceeded):
+    """The structure has more atoms than `MAX_ATOMS`."""
+
+    budget = "atoms"
+
+
+class TimeBudgetExceeded(BudgetExceeded):
+    """Computing the structure took longer than `TIMEOUT`."""
+
+    budget = "time"
+
+
+def check_size(structure: str) -> None:
+    """Checks a structure string against the input size budget.
+
+    Raises:
+        InputSizeExceeded: If the structure is longer than `MAX_SIZE`.
+
+    """
+    if len(structure) > indigo_settings.MAX_SIZE:
+        raise InputSizeExceeded(
+            f"Structure is longer than {indigo_settings.MAX_SIZE} characters."
+        )
+
+
+def check_atoms(count: int) -> None:
+    """Checks the atom count of a loaded structure against its budget.
+
+    Raises:
+        AtomCountExceeded: If `count` is more than `MAX_ATOMS`.
+
+    """
+    if count > indigo_settings.MAX_ATOMS:
+        raise AtomCountExceeded(
+            f"Structure has more than {indigo_settings.MAX_ATOMS} atoms."
+        )
+
+
+def time_budget_exceeded() -> TimeBudgetExceeded:
+    """Builds the error for a computation cancelled after `TIMEOUT`."""
+    return TimeBudgetExceeded(
+        f"Structure took longer than {indigo_settings.TIMEOUT} seconds to process."
+    )
+
+
+def record(computed: dict) -> None:
+    """Counts a budget violation stored in the results of `compute_structure`."""
+    error = computed.get("error")
+    if isinstance(error, BudgetExceeded):
+        BUDGET_EXCEEDED.labels(budget=error.budget).inc()
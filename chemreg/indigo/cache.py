@@ -0,0 +1,139 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from django.core.cache import caches
+
+from prometheus_client import Counter
+
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.settings import indigo_settings
+
+CACHE_HITS = Counter(
+    "chemreg_indigo_cache_hits",
+    "Structure conversions served from cache.",
+    ["kind", "tier"],
+)
+CACHE_MISSES = Counter(
+    "chemreg_indigo_cache_misses",
+    "Structure conversions computed by Indigo.",
+    ["kind"],
+)
+
+
+@functools.lru_cache(maxsize=None)
+def indigo_version() -> str:
+    """The version of the Indigo library in use."""
+    with indigo_pool.session() as session:
+        return session.indigo.version()
+
+
+class ConversionCache:
+    """A two-tier, content-addressed cache of structure conversions.
+
+    Results are keyed by a hash of the exact input string and the Indigo
+    version, so they never need invalidating: a library upgrade simply
+    starts a new key space. Lookups try a bounded LRU dictionary in the
+    worker first and then the shared Django cache, which is Redis in
+    production. Hits and misses are exported as Prometheus metrics.
+
+    Args:
+        maxsize: The number of entries kept in process. Defaults to the
+            `CACHE_SIZE` Indigo setting.
+
+    """
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self._maxsize = maxsize
+        self._local: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self) -> int:
+        """The number of entries kept in process."""
+        if self._maxsize is None:
+            return indigo_settings.CACHE_SIZE
+        return self._maxsize
+
+    @property
+    def shared(self):
+        """The Django cache shared between workers."""
+        return caches[indigo_settings.CACHE_ALIAS]
+
+    def key(self, kind: str, structure: str) -> str:
+        """Builds the cache key for a conversion of `structure`."""
+        digest = hashlib.sha256()
+        digest.update(indigo_version().encode())
+        digest.update(b"\0")
+        digest.update(structure.encode())
+        return f"chemreg.indigo.{kind}.{digest.hexdigest()}"
+
+    def get(self, kind: str, structure: str) -> Any:
+        """Looks up a conversion.
+
+        Returns:
+            The cached result, or `None` on a miss.
+
+        """
+        key = self.key(kind, structure)
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                CACHE_HITS.labels(kind=kind, tier="local").inc()
+                return self._local[key]
+        value = self.shared.get(key)
+        if value is None:
+            CACHE_MISSES.labels(kind=kind).inc()
+            return None
+        CACHE_HITS.labels(kind=kind, tier="shared").inc()
+        self._set_local(key, value)
+        return value
+
+    def set(self, kind: str, structure: str, value: Any) -> None:
+        """Stores a conversion in both tiers."""
+        key = self.key(kind, structure)
+        self._set_local(key, value)
+        self.shared.set(key, value, timeout=indigo_settings.CACHE_TIMEOUT)
+
+    def clear(self) -> None:
+        """Empties the in-process tier."""
+        with self._lock:
+            self._local.clear()
+
+    def _set_local(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+
+conversion_cache = ConversionCache()
+"""The per-process conversion cache."""
+
+
+def cached_conversion(kind: str) -> Callable:
+    """Caches the results of a single-argument structure conversion.
+
+    Exceptions are not cached, so invalid structures are always reported by
+    Indigo itself.
+
+    Args:
+        kind: Distinguishes the conversion in the cache key.
+
+    """
+
+    def decorator(func: Callable[[str], Any]) -> Callable[[str], Any]:
+        @functools.wraps(func)
+        def wrapper(structure: str) -> Any:
+            value = conversion_cache.get(kind, structure)
+            if value is None:
+                value = func(structure)
+                conversion_cache.set(kind, structure, value)
+            return value
+
+        return wrapper
+
+    return decorator
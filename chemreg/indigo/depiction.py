@@ -0,0 +1,84 @@
+from indigo import IndigoException
+from indigo.renderer import IndigoRenderer
+
+from chemreg.indigo.budget import check_atoms, check_size, time_budget_exceeded
+from chemreg.indigo.cache import conversion_cache
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.settings import indigo_settings
+
+DEPICTION_FORMATS = {"svg": "image/svg+xml", "png": "image/png"}
+"""The media types of the image formats that can be rendered."""
+
+MIN_SIZE = 16
+"""The smallest image, in pixels, that Indigo lays out a structure in."""
+
+
+def depiction_kind(image_format: str, size: int) -> str:
+    """The kind of conversion a depiction is cached under.
+
+    Depictions are keyed by the structure, as every conversion is, and by the
+    render options.
+    """
+    return f"depiction.{image_format}.{size}"
+
+
+def get_depiction(compound: str, image_format: str = "svg", size: int = 300) -> bytes:
+    """Renders a compound string as an image.
+
+    Results are cached by content and options, see `chemreg.indigo.cache`, so
+    a compound is rendered again once its structure changes. They are
+    rendered in the process pool where calls are offloaded, see
+    `chemreg.indigo.executor`, within the budgets of `chemreg.indigo.budget`.
+
+    Args:
+        compound: A molfile (either v2000 or v3000), SMILES, etc.
+        image_format: One of `DEPICTION_FORMATS`.
+        size: The width and height of the image, in pixels.
+
+    Returns:
+        The image.
+
+    Raises:
+        IndigoException: If Indigo cannot load or render the compound.
+        BudgetExceeded: If the compound exceeds a budget.
+
+    """
+    check_size(compound)
+    kind = depiction_kind(image_format, size)
+    depiction = conversion_cache.get(kind, compound)
+    if depiction is None:
+        try:
+            depiction = process_pool.run(
+                compute_depiction,
+                str(compound),
+                image_format,
+                size,
+                timeout=indigo_settings.TIMEOUT,
+            )
+        except TimeoutError:
+            raise time_budget_exceeded()
+        conversion_cache.set(kind, compound, depiction)
+    return depiction
+
+
+def compute_depiction(compound: str, image_format: str, size: int) -> bytes:
+    """Computes `get_depiction` without caching or offloading."""
+    if image_format not in DEPICTION_FORMATS:
+        raise ValueError(f"Unknown image format '{image_format}'.")
+    check_size(compound)
+    with indigo_pool.session() as session:
+        # The renderer defines the render options, so it is created first.
+        renderer = IndigoRenderer(session.indigo)
+        session.indigo.setOption("render-output-format", image_format)
+        session.indigo.setOption("render-image-size", size, size)
+        session.indigo.setOption("timeout", int(indigo_settings.TIMEOUT * 1000))
+        try:
+            molecule = session.indigo.loadMolecule(compound)
+            check_atoms(molecule.countAtoms())
+            return bytes(renderer.renderToBuffer(molecule))
+        except IndigoException as e:
+            # Indigo reports its "timeout" option through the message alone.
+            if "timed out" in str(e):
+                raise time_budget_exceeded()
+            raise
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from gevent import monkey
+from prometheus_client import Gauge, Histogram
+
+from chemreg.indigo.settings import indigo_settings
+
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "chemreg_indigo_executor_queue_depth",
+    "Number of calls sent to the process pool that have not yet returned.",
+)
+EXECUTOR_WAIT = Histogram(
+    "chemreg_indigo_executor_wait_seconds",
+    "Time calls spent queued for, or in transit to and from, the process pool.",
+)
+EXECUTOR_RUN = Histogram(
+    "chemreg_indigo_executor_run_seconds",
+    "Time calls spent executing in the process pool.",
+)
+
+_in_pool = False
+
+
+def _mark_pool_process() -> None:
+    global _in_pool
+    _in_pool = True
+
+
+def _call_each(func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+    return [func(item) for item in items]
+
+
+def _timed(func: Callable, args: tuple) -> Tuple[bool, Any, float]:
+    start = time.perf_counter()
+    try:
+        result, ok = func(*args), True
+    except Exception as e:
+        result, ok = e, False
+    return ok, result, time.perf_counter() - start
+
+
+class ProcessPool:
+    """A lazily started pool of processes for structure work.
+
+    Parsing structures is CPU bound native code, so it blocks every other
+    greenlet in a gevent worker. The pool moves that work into separate
+    processes: `map` spreads long lists across them and `run` hands over
+    single calls while the calling greenlet waits cooperatively. Processes
+    are only started when the pool is first used, and a forked worker starts
+    its own pool rather than sharing its parent's.
+
+    Functions run in the pool must not use the database or the Django cache.
+
+    Args:
+        processes: The number of processes. Defaults to the `PROCESSES`
+            Indigo setting, or the number of CPUs.
+
+    """
+
+    def __init__(self, processes: Optional[int] = None):
+        self._processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def processes(self) -> int:
+        """The number of processes in the pool."""
+        if self._processes is not None:
+            return self._processes
+        return indigo_settings.PROCESSES or os.cpu_count() or 1
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The executor owned by the current process."""
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, initializer=_mark_pool_process
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    @property
+    def offload(self) -> bool:
+        """Whether `run` sends calls to the pool.
+
+        This follows the `OFFLOAD` Indigo setting. By default calls are only
+        offloaded from gevent workers, where running them in place would stall
+        the event loop. Calls made within the pool always run in place.
+        """
+        if _in_pool:
+            return False
+        if indigo_settings.OFFLOAD is None:
+            return monkey.is_module_patched("threading")
+        return indigo_settings.OFFLOAD
+
+    def map(
+        self,
+        func: Callable[[Any], Any],
+        items: Iterable,
+        timeout: Optional[float] = None,
+    ) -> List[Any]:
+        """Calls `func` on every item in the pool's processes.
+
+        Items are sent in chunks so that each process gets a few of them.
+        Each chunk is recorded in the executor metrics as a call.
+
+        Args:
+            func: A picklable, i.e. module level, function.
+            items: The arguments for `func`.
+            timeout: Seconds each call may take. A chunk is waited for that
+                long per item once the chunks before it have returned.
+
+        Returns:
+            The results in the order of `items`.
+
+        Raises:
+            TimeoutError: If a chunk did not finish within its timeout.
+            Exception: Whatever `func` raised first.
+
+        """
+        items = list(items)
+        chunksize = max(1, len(items) // (self.processes * 4))
+        chunks = [
+            items[offset : offset + chunksize]
+            for offset in range(0, len(items), chunksize)
+        ]
+        EXECUTOR_QUEUE_DEPTH.inc(len(chunks))
+        start = time.perf_counter()
+        submitted = [
+            self.executor.submit(_timed, _call_each, (func, chunk)) for chunk in chunks
+        ]
+        results = []
+        for i, (chunk, future) in enumerate(zip(chunks, submitted)):
+            try:
+                results.extend(
+                    self._wait(
+                        future, start, None if timeout is None else timeout * len(chunk)
+                    )
+                )
+            except BaseException:
+                # The remaining chunks are no longer waited for.
+                for pending in submitted[i + 1 :]:
+                    pending.cancel()
+                EXECUTOR_QUEUE_DEPTH.dec(len(chunks) - i - 1)
+                raise
+        return results
+
+    def run(self, func: Callable, *args: Any, timeout: Optional[float] = None) -> Any:
+        """Calls `func`, in the pool if calls are offloaded.
+
+        Args:
+            func: A picklable, i.e. module level, function.
+            *args: The arguments for `func`; they must be picklable.
+            timeout: Seconds to wait for an offloaded call. A call that has not
+                started by then is cancelled; one that has keeps its process
+                until it finishes, but the caller no longer waits for it.
+
+        Returns:
+            The result of `func`.
+
+        Raises:
+            TimeoutError: If an offloaded call did not finish within `timeout`.
+            Exception: Whatever `func` raised.
+
+        """
+        if not self.offload:
+            return func(*args)
+        EXECUTOR_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        future = self.executor.submit(_timed, func, args)
+        return self._wait(future, start, timeout)
+
+    def _wait(
+        self, future: futures.Future, start: float, timeout: Optional[float]
+    ) -> Any:
+        try:
+            ok, result, elapsed = future.result(timeout=timeout)
+        except futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Call did not finish within {timeout} seconds.")
+        finally:
+            EXECUTOR_QUEUE_DEPTH.dec()
+        EXECUTOR_RUN.observe(elapsed)
+        EXECUTOR_WAIT.observe(time.perf_counter() - start - elapsed)
+        if not ok:
+            raise result
+        return result
+
+    def shutdown(self) -> None:
+        """Stops the processes; they are started again when next used."""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+
+process_pool = ProcessPool()
+"""The per-process pool for structure work."""
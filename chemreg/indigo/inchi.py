@@ -1,19 +1,48 @@
-from indigo import Indigo
-from indigo.inchi import IndigoInchi
+from indigo import IndigoException
 
+from chemreg.indigo.budget import time_budget_exceeded
+from chemreg.indigo.cache import cached_conversion
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.settings import indigo_settings
 
+
+@cached_conversion("inchikey")
 def get_inchikey(compound: str) -> str:
     """Computes the InChIKey from a compound string.
 
+    Results are cached by content, see `chemreg.indigo.cache`, and computed
+    in the process pool where calls are offloaded, see
+    `chemreg.indigo.executor`.
+
     Args:
         compound: A molfile (either v2000 or v3000), MRV file, SMILES, etc.
 
     Returns:
         The InChIKey for the compound.
 
+    Raises:
+        IndigoException: If Indigo cannot load the compound.
+        TimeBudgetExceeded: If the compound exceeds the time budget.
+
     """
-    indigo = Indigo()
-    indigo_inchi = IndigoInchi(indigo)
-    molecule = indigo.loadMolecule(compound)
-    inchi = indigo_inchi.getInchi(molecule)
-    return indigo_inchi.getInchiKey(inchi)
+    try:
+        return process_pool.run(
+            compute_inchikey, str(compound), timeout=indigo_settings.TIMEOUT
+        )
+    except TimeoutError:
+        raise time_budget_exceeded()
+
+
+def compute_inchikey(compound: str) -> str:
+    """Computes `get_inchikey` without caching or offloading."""
+    with indigo_pool.session() as session:
+        session.indigo.setOption("timeout", int(indigo_settings.TIMEOUT * 1000))
+        try:
+            molecule = session.indigo.loadMolecule(compound)
+            inchi = session.inchi.getInchi(molecule)
+            return session.inchi.getInchiKey(inchi)
+        except IndigoException as e:
+            if "timed out" in str(e):
+                raise time_budget_exceeded()
+            raise
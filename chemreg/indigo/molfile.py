@@ -1,17 +1,48 @@
-from indigo import Indigo
+from indigo import IndigoException
 
+from chemreg.indigo.budget import time_budget_exceeded
+from chemreg.indigo.cache import cached_conversion
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.settings import indigo_settings
 
+
+@cached_conversion("molfile_v3000")
 def get_molfile_v3000(compound: str) -> str:
     """Computes the molfile v3000 from a compound string.
 
+    Results are cached by content, see `chemreg.indigo.cache`, and computed
+    in the process pool where calls are offloaded, see
+    `chemreg.indigo.executor`.
+
     Args:
         compound: A molfile (either v2000 or v3000), MRV file, etc.
 
     Returns:
         The molfile v3000.
 
+    Raises:
+        IndigoException: If Indigo cannot load the compound.
+        TimeBudgetExceeded: If the compound exceeds the time budget.
+
     """
-    indigo = Indigo()
-    indigo.setOption("molfile-saving-mode", "3000")
-    molecule = indigo.loadMolecule(compound)
-    return molecule.molfile()
+    try:
+        return process_pool.run(
+            compute_molfile_v3000, str(compound), timeout=indigo_settings.TIMEOUT
+        )
+    except TimeoutError:
+        raise time_budget_exceeded()
+
+
+def compute_molfile_v3000(compound: str) -> str:
+    """Computes `get_molfile_v3000` without caching or offloading."""
+    with indigo_pool.session() as session:
+        session.indigo.setOption("molfile-saving-mode", "3000")
+        session.indigo.setOption("timeout", int(indigo_settings.TIMEOUT * 1000))
+        try:
+            molecule = session.indigo.loadMolecule(compound)
+            return molecule.molfile()
+        except IndigoException as e:
+            if "timed out" in str(e):
+                raise time_budget_exceeded()
+            raise
@@ -0,0 +1,90 @@
+import io
+import xml.etree.ElementTree as ET
+
+from indigo import IndigoException
+
+from chemreg.indigo.budget import time_budget_exceeded
+from chemreg.indigo.cache import cached_conversion
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.settings import indigo_settings
+
+
+def format_mrvfile(cml: str) -> str:
+    """Converts CML to an MRV document that can be loaded into MarvinJS.
+
+    The CML is parsed in a single pass that strips the whitespace around
+    text as it goes and stops after the first molecule.
+
+    Args:
+        cml: The CML returned by Indigo's `cml` method.
+
+    Returns:
+        The first molecule, wrapped in the MDocument elements MarvinJS expects.
+
+    Raises:
+        ValueError: If the CML holds no molecule.
+
+    """
+    cml = cml[cml.index("<cml>") :]
+    molecule = None
+    for event, element in ET.iterparse(io.StringIO(cml), events=("start", "end")):
+        if event == "start":
+            if molecule is None and element.tag == "molecule":
+                molecule = element
+            continue
+        if element.text:
+            element.text = element.text.strip()
+        # A tail is only complete once the parent element ends.
+        for child in element:
+            if child.tail:
+                child.tail = child.tail.strip()
+        if element is molecule:
+            break
+    if molecule is None:
+        raise ValueError("CML holds no molecule.")
+    molecule.tail = None
+    document = ET.Element("cml")
+    structure = ET.SubElement(ET.SubElement(document, "MDocument"), "MChemicalStruct")
+    structure.append(molecule)
+    return ET.tostring(document, encoding="unicode")
+
+
+@cached_conversion("mrvfile")
+def get_mrvfile(compound: str) -> str:
+    """Computes the MRV document of a compound string.
+
+    Results are cached by content, see `chemreg.indigo.cache`, so a compound
+    is converted again once its structure changes. They are computed in the
+    process pool where calls are offloaded, see `chemreg.indigo.executor`.
+
+    Args:
+        compound: A molfile (either v2000 or v3000), SMILES, etc.
+
+    Returns:
+        The MRV document.
+
+    Raises:
+        IndigoException: If Indigo cannot load the compound.
+        TimeBudgetExceeded: If the compound exceeds the time budget.
+
+    """
+    try:
+        return process_pool.run(
+            compute_mrvfile, str(compound), timeout=indigo_settings.TIMEOUT
+        )
+    except TimeoutError:
+        raise time_budget_exceeded()
+
+
+def compute_mrvfile(compound: str) -> str:
+    """Computes `get_mrvfile` without caching or offloading."""
+    with indigo_pool.session() as session:
+        session.indigo.setOption("timeout", int(indigo_settings.TIMEOUT * 1000))
+        try:
+            molecule = session.indigo.loadMolecule(compound)
+            return format_mrvfile(molecule.cml())
+        except IndigoException as e:
+            if "timed out" in str(e):
+                raise time_budget_exceeded()
+            raise
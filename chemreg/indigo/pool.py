@@ -0,0 +1,127 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from indigo import Indigo
+from indigo.inchi import IndigoInchi
+from prometheus_client import Gauge, Histogram
+
+from chemreg.indigo.settings import indigo_settings
+
+POOL_SIZE = Gauge(
+    "chemreg_indigo_pool_size", "Number of Indigo sessions created by this worker."
+)
+POOL_IN_USE = Gauge(
+    "chemreg_indigo_pool_in_use", "Number of Indigo sessions currently checked out."
+)
+POOL_WAIT = Histogram(
+    "chemreg_indigo_pool_wait_seconds",
+    "Time spent waiting for a free Indigo session.",
+)
+
+
+class IndigoSession:
+    """An initialized Indigo session and its InChI plugin.
+
+    Attributes:
+        indigo (Indigo): The Indigo session.
+        inchi (IndigoInchi): The InChI plugin bound to `indigo`.
+
+    """
+
+    def __init__(self):
+        self.indigo = Indigo()
+        self.inchi = IndigoInchi(self.indigo)
+
+    def reset(self) -> None:
+        """Restores the default options so the next borrower starts clean."""
+        self.indigo.resetOptions()
+        self.inchi.resetOptions()
+
+
+class IndigoSessionPool:
+    """A bounded pool of reusable `IndigoSession` objects.
+
+    Building an `Indigo` session costs more than loading most structures, so
+    sessions are created lazily up to `size` and then handed out again. Once
+    every session is checked out, borrowers block until one is returned. The
+    queue is built on first use in each process, which keeps the pool
+    per-worker and ensures it picks up gevent's patched locks.
+
+    Args:
+        size: The maximum number of sessions. Defaults to the `POOL_SIZE`
+            Indigo setting.
+
+    """
+
+    def __init__(self, size: Optional[int] = None):
+        self._size = size
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """The maximum number of sessions in the pool."""
+        if self._size is None:
+            return indigo_settings.POOL_SIZE
+        return self._size
+
+    @property
+    def created(self) -> int:
+        """The number of sessions created in this process."""
+        self._prepare()
+        return self._created
+
+    def _prepare(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._sessions: queue.LifoQueue = queue.LifoQueue()
+                self._created = 0
+                self._pid = os.getpid()
+
+    def _acquire(self) -> IndigoSession:
+        self._prepare()
+        try:
+            return self._sessions.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            POOL_SIZE.inc()
+            return IndigoSession()
+        return self._sessions.get()
+
+    @contextmanager
+    def session(self) -> Iterator[IndigoSession]:
+        """Checks out a session for the duration of the `with` block.
+
+        Objects loaded through the session stay bound to it, so they should
+        not be used after the block unless only read from within a single
+        worker thread.
+
+        Yields:
+            An `IndigoSession` with default options.
+
+        """
+        start = time.perf_counter()
+        session = self._acquire()
+        POOL_WAIT.observe(time.perf_counter() - start)
+        POOL_IN_USE.inc()
+        try:
+            yield session
+        finally:
+            session.reset()
+            self._sessions.put(session)
+            POOL_IN_USE.dec()
+
+
+indigo_pool = IndigoSessionPool()
+"""The per-process pool of Indigo sessions."""
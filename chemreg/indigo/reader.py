@@ -0,0 +1,190 @@
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+SMILES = "smiles"
+MOLFILE_V2000 = "molfile_v2000"
+MOLFILE_V3000 = "molfile_v3000"
+MRV = "mrv"
+SDF = "sdf"
+
+RECORD_SEPARATOR = "$$$$"
+"""Ends each record of an SD file."""
+
+MRV_SNIFF_SIZE = 1024
+"""The number of characters searched for the root element of an MRV file."""
+
+_MOLFILE_VERSIONS = {"V2000": MOLFILE_V2000, "V3000": MOLFILE_V3000}
+_XML_START = re.compile(r"\s*<")
+_DATA_HEADER = re.compile(r">.*?<([^>]*)>")
+
+
+def head(text: str, count: int) -> List[str]:
+    """Reads the first lines of a string without splitting the rest of it.
+
+    Args:
+        text: The string to read.
+        count: The number of lines to read.
+
+    Returns:
+        Up to `count` lines, without line endings.
+
+    """
+    lines = []
+    start = 0
+    while len(lines) < count and start <= len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        lines.append(text[start:end].rstrip("\r"))
+        start = end + 1
+    return lines
+
+
+def molfile_version(structure: str) -> Optional[str]:
+    """Reads the CTfile version from the counts line of a molfile.
+
+    Only the header block and counts line, i.e. the first four lines, are read.
+    See page 9 of https://www.daylight.com/meetings/mug05/Kappler/ctfile.pdf
+
+    Args:
+        structure: The structure string.
+
+    Returns:
+        "V2000" or "V3000", or `None` if the counts line names neither.
+
+    """
+    lines = head(structure, 4)
+    if len(lines) < 4:
+        return None
+    # last 5 non-whitespace chars of the 4th line.
+    version = lines[3].strip()[-5:]
+    return version if version in _MOLFILE_VERSIONS else None
+
+
+def is_molfile(structure: str) -> bool:
+    """Checks whether a structure string looks like a v2000 or v3000 molfile.
+
+    Args:
+        structure: The structure string.
+
+    Returns:
+        True if the counts line names a CTfile version.
+
+    """
+    return molfile_version(structure) is not None
+
+
+def sniff(structure: str) -> Optional[str]:
+    """Identifies the format of a structure string.
+
+    The format is read from the first lines, except that a molfile is only
+    told apart from an SD file by whether anything follows its "M  END" line.
+
+    Args:
+        structure: The structure string.
+
+    Returns:
+        One of `SMILES`, `MOLFILE_V2000`, `MOLFILE_V3000`, `MRV` or `SDF`, or
+        `None` if the format is not recognized.
+
+    """
+    version = molfile_version(structure)
+    if version:
+        end = structure.find("M  END")
+        if end != -1:
+            rest = structure.find("\n", end)
+            if rest != -1 and structure[rest:].strip():
+                return SDF
+        return _MOLFILE_VERSIONS[version]
+    if _XML_START.match(structure):
+        if structure.find("<cml", 0, MRV_SNIFF_SIZE) != -1:
+            return MRV
+        return None
+    first = head(structure, 1)[0].strip()
+    if first and " " not in first and not structure[len(first) :].strip():
+        return SMILES
+    return None
+
+
+class SDFRecord(NamedTuple):
+    """A single record of an SD file.
+
+    Attributes:
+        molfile (str): The molfile, up to and including its "M  END" line.
+        data (dict): The values of the record's data items by field name.
+
+    """
+
+    molfile: str
+    data: Dict[str, str]
+
+
+def read_sdf(lines: Iterable[Union[str, bytes]]) -> Iterator[SDFRecord]:
+    """Iterates over the records of an SD file.
+
+    Records are parsed as their lines are read, so a file object is never
+    loaded whole.
+
+    Args:
+        lines: The lines of the SD file, e.g. a file object opened in either
+            text or binary mode. Bytes are decoded as UTF-8.
+
+    Yields:
+        Each `SDFRecord` in turn.
+
+    """
+    molfile: List[str] = []
+    data: Dict[str, str] = {}
+    field: Optional[str] = None
+    value: List[str] = []
+    in_molfile = True
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r\n")
+        if line.strip() == RECORD_SEPARATOR:
+            if field is not None:
+                data[field] = "\n".join(value)
+            yield SDFRecord("\n".join(molfile), data)
+            molfile, data, field, value, in_molfile = [], {}, None, [], True
+        elif in_molfile:
+            molfile.append(line)
+            in_molfile = not line.startswith("M  END")
+        elif field is None:
+            match = _DATA_HEADER.match(line)
+            if match:
+                field, value = match.group(1), []
+        elif line.strip():
+            value.append(line)
+        else:
+            data[field] = "\n".join(value)
+            field = None
+    if field is not None:
+        data[field] = "\n".join(value)
+    if any(line.strip() for line in molfile):
+        yield SDFRecord("\n".join(molfile), data)
+
+
+def format_sdf_record(molfile: str, data: Dict[str, str]) -> str:
+    """Writes a single record of an SD file, as read by `read_sdf`.
+
+    Blank lines end a data item, so they are dropped from values.
+
+    Args:
+        molfile: The molfile.
+        data: The values of the record's data items by field name. Items
+            without a value are left out.
+
+    Returns:
+        The record, including its separator line.
+
+    """
+    lines = [molfile.rstrip("\r\n")]
+    for field, value in data.items():
+        if value is None:
+            continue
+        lines.append(f"> <{field}>")
+        lines.extend(line for line in str(value).splitlines() if line.strip())
+        lines.append("")
+    lines.append(RECORD_SEPARATOR)
+    return "\n".join(lines) + "\n"
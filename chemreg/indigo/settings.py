@@ -0,0 +1,63 @@
+from django.conf import settings
+
+
+class IndigoSettings:
+    """Loads the Indigo settings from the main settings.
+
+    This centralizes the logic of user modifiable global variables. It
+    looks for a `django.conf.settings.INDIGO` dictionary and uses the
+    setting found there if it exists. Otherwise, it falls back to defaults
+    defined in the `IndigoSettings.defaults` class attribute.
+
+    Attributes:
+        defaults (dict): The default settings to fallback to.
+        CACHE_ALIAS (str): The Django cache shared between workers for
+            conversion results. Defaults to "default".
+        CACHE_SIZE (int): The number of conversion results kept in each
+            worker's in-process cache. Defaults to 1024.
+        CACHE_TIMEOUT (int): Seconds a conversion result is kept in the shared
+            cache. Defaults to 7 days.
+        MAX_ATOMS (int): The most atoms a structure may have. Defaults to
+            1000.
+        MAX_SIZE (int): The longest structure string, in characters, that is
+            parsed. Defaults to 512 KiB.
+        OFFLOAD (bool): Whether single Indigo calls are run in the process
+            pool. Defaults to None, i.e. only in gevent workers.
+        POOL_SIZE (int): The maximum number of Indigo sessions kept by each
+            worker process. Defaults to 4.
+        PROCESSES (int): The number of processes each worker uses for
+            structure work. None or 0 uses the number of CPUs. Defaults to None.
+        TIMEOUT (float): Seconds a structure may take to process before it is
+            cancelled. Defaults to 2.
+
+    """
+
+    defaults = {
+        "CACHE_ALIAS": "default",
+        "CACHE_SIZE": 1024,
+        "CACHE_TIMEOUT": 7 * 24 * 60 * 60,
+        "MAX_ATOMS": 1000,
+        "MAX_SIZE": 512 * 1024,
+        "OFFLOAD": None,
+        "POOL_SIZE": 4,
+        "PROCESSES": None,
+        "TIMEOUT": 2,
+    }
+
+    def __init__(self, user_settings):
+        self.user_settings = user_settings
+
+    def __getattr__(self, attr):
+        if attr not in self.defaults:
+            raise AttributeError(f"Invalid Indigo setting: '{attr}'")
+        if hasattr(self.user_settings, "INDIGO") and attr in self.user_settings.INDIGO:
+            val = self.user_settings.INDIGO[attr]
+        else:
+            val = self.defaults[attr]
+
+        setattr(self, attr, val)
+        return val
+
+
+indigo_settings = IndigoSettings(settings)
+"""The singleton instance of IndigoSettings."""
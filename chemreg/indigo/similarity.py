@@ -0,0 +1,34 @@
+from indigo import IndigoObject
+
+from chemreg.indigo.pool import IndigoSession
+
+FINGERPRINT_OPTIONS = {
+    "fp-ext-enabled": False,
+    "fp-ord-qwords": 0,
+    "fp-any-qwords": 0,
+    "fp-tau-qwords": 0,
+    "fp-sim-qwords": 8,
+}
+"""Indigo options for similarity fingerprints.
+
+Only the 64 byte similarity part is kept, which is the part Indigo itself
+compares for Tanimoto similarity. Changing these requires the stored
+fingerprints to be recomputed.
+"""
+
+
+def similarity_fingerprint(session: IndigoSession, molecule: IndigoObject) -> bytes:
+    """Computes the similarity fingerprint of a molecule.
+
+    Args:
+        session: The session `molecule` was loaded in.
+        molecule: The molecule, which is aromatized in place.
+
+    Returns:
+        The fingerprint bytes.
+
+    """
+    for option, value in FINGERPRINT_OPTIONS.items():
+        session.indigo.setOption(option, value)
+    molecule.aromatize()
+    return molecule.fingerprint("sim").toBuffer().tobytes()
@@ -0,0 +1,62 @@
+from indigo import IndigoException
+
+from chemreg.indigo.budget import (
+    BudgetExceeded,
+    check_size,
+    record,
+    time_budget_exceeded,
+)
+from chemreg.indigo.cache import cached_conversion
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import load_structure
+
+
+@cached_conversion("canonical_smiles")
+def get_canonical_smiles(compound: str) -> str:
+    """Computes the canonical SMILES of a compound string.
+
+    The structure is canonicalized exactly as `compute_structure` does when
+    compounds are registered, so the result can be compared with the stored
+    canonical SMILES, but no InChI or fingerprints are computed. The same
+    budgets apply, see `chemreg.indigo.budget`.
+
+    Args:
+        compound: A molfile (either v2000 or v3000), SMILES, etc.
+
+    Returns:
+        The canonical SMILES for the compound.
+
+    Raises:
+        IndigoException: If Indigo cannot load the compound.
+        BudgetExceeded: If the compound exceeds a budget.
+
+    """
+    try:
+        check_size(compound)
+        try:
+            return process_pool.run(
+                compute_canonical_smiles,
+                str(compound),
+                timeout=indigo_settings.TIMEOUT,
+            )
+        except TimeoutError:
+            raise time_budget_exceeded()
+    except BudgetExceeded as e:
+        record({"error": e})
+        raise
+
+
+def compute_canonical_smiles(compound: str) -> str:
+    """Computes `get_canonical_smiles` without caching or offloading."""
+    with indigo_pool.session() as session:
+        session.indigo.setOption("molfile-saving-mode", "3000")
+        session.indigo.setOption("timeout", int(indigo_settings.TIMEOUT * 1000))
+        try:
+            molecule, _ = load_structure(session, compound)
+            return molecule.canonicalSmiles()
+        except IndigoException as e:
+            if "timed out" in str(e):
+                raise time_budget_exceeded()
+            raise
@@ -0,0 +1,290 @@
+from typing import List, Tuple
+
+from django.utils.functional import cached_property
+
+from indigo import IndigoException, IndigoObject
+
+from chemreg.indigo.budget import (
+    BudgetExceeded,
+    check_atoms,
+    check_size,
+    record,
+    time_budget_exceeded,
+)
+from chemreg.indigo.cache import conversion_cache
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.reader import is_molfile
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.similarity import similarity_fingerprint
+from chemreg.indigo.substructure import substructure_fingerprint
+
+CACHE_KIND = "structure.6"
+"""The conversion cache kind of `compute_structure` results.
+
+Bump this whenever `compute_structure` starts returning something new, so
+that cached results without it are not used.
+"""
+
+
+def load_structure(session, structure: str) -> Tuple[IndigoObject, str]:
+    """Loads a structure into a pooled session as it is registered.
+
+    Structures that are not molfiles carry no coordinates, so they are read
+    back from their v3000 molfile. Anything computed from the molecule then
+    matches what is computed from the stored molfile. The session must save
+    v3000 molfiles.
+
+    Args:
+        session: The pooled session.
+        structure: The structure string.
+
+    Returns:
+        The molecule and its v3000 molfile.
+
+    Raises:
+        IndigoException: If Indigo cannot load the structure.
+        AtomCountExceeded: If the structure has too many atoms.
+
+    """
+    molecule = session.indigo.loadMolecule(structure)
+    check_atoms(molecule.countAtoms())
+    molfile = molecule.molfile()
+    if not is_molfile(structure):
+        molecule = session.indigo.loadMolecule(molfile)
+    return molecule, molfile
+
+
+def load_serialized(session, serialized: bytes) -> IndigoObject:
+    """Loads a molecule serialized by `compute_structure`.
+
+    This is several times faster than parsing the molfile. The molecule is
+    chemically identical, but Indigo's binary format reorders the atoms, so it
+    is meant for descriptors and fingerprints rather than for writing
+    structures back out.
+
+    Args:
+        session: The pooled session.
+        serialized: The molecule in Indigo's binary format.
+
+    Returns:
+        The molecule.
+
+    Raises:
+        IndigoException: If Indigo cannot load the molecule, e.g. if it was
+            serialized by an incompatible version.
+
+    """
+    return session.indigo.unserialize(bytes(serialized))
+
+
+def component_inchikeys(session, molecule: IndigoObject, inchikey: str) -> List[str]:
+    """Computes the InChIKeys of the components of a molecule, e.g. of a salt.
+
+    Args:
+        session: The pooled session the molecule was loaded in.
+        molecule: The molecule.
+        inchikey: The InChIKey of the whole molecule, which is that of its
+            only component if it has one.
+
+    Returns:
+        The distinct InChIKeys in the order of the components. Components
+        InChI cannot describe are left out.
+
+    Raises:
+        IndigoException: If Indigo times out.
+
+    """
+    if molecule.countComponents() < 2:
+        return [inchikey]
+    inchikeys = {}
+    for component in molecule.iterateComponents():
+        try:
+            inchi = session.inchi.getInchi(component.clone())
+            inchikeys[session.inchi.getInchiKey(inchi)] = None
+        except IndigoException as e:
+            if "timed out" in str(e):
+                raise
+    return list(inchikeys)
+
+
+def compute_structure(structure: str) -> dict:
+    """Parses a structure once and computes everything `Structure` provides.
+
+    This does not use the conversion cache, so it is safe to call in other
+    processes.
+
+    Args:
+        structure: The structure string.
+
+    Returns:
+        The computed representations by name. If Indigo fails or a budget is
+        exceeded, the exception is stored under "error" and later
+        representations are missing.
+
+    """
+    computed: dict = {}
+    try:
+        check_size(structure)
+    except BudgetExceeded as e:
+        computed["error"] = e
+        return computed
+    with indigo_pool.session() as session:
+        session.indigo.setOption("molfile-saving-mode", "3000")
+        session.indigo.setOption("timeout", int(indigo_settings.TIMEOUT * 1000))
+        try:
+            molecule, computed["molfile_v3000"] = load_structure(session, structure)
+            computed["serialized"] = bytes(molecule.serialize())
+            computed["smiles"] = molecule.smiles()
+            computed["canonical_smiles"] = molecule.canonicalSmiles()
+            computed["molecular_weight"] = molecule.molecularWeight()
+            computed["molecular_formula"] = molecule.grossFormula()
+            computed["inchi"] = session.inchi.getInchi(molecule)
+            computed["inchikey"] = session.inchi.getInchiKey(computed["inchi"])
+            computed["component_inchikeys"] = component_inchikeys(
+                session, molecule, computed["inchikey"]
+            )
+            computed["substructure_fingerprint"] = substructure_fingerprint(
+                session, molecule
+            )
+            computed["similarity_fingerprint"] = similarity_fingerprint(
+                session, molecule
+            )
+        except IndigoException as e:
+            # Indigo reports its "timeout" option through the message alone.
+            computed["error"] = time_budget_exceeded() if "timed out" in str(e) else e
+        except BudgetExceeded as e:
+            computed["error"] = e
+    return computed
+
+
+class Structure(str):
+    """A structure string that is loaded into Indigo at most once.
+
+    The first time a computed representation is requested the structure is
+    parsed in a single pooled session and the v3000 molfile, serialized
+    molecule, SMILES, canonical SMILES, InChI, InChIKeys of the molecule and
+    its components, fingerprints and descriptors are all derived from that
+    molecule. Structures that are not molfiles (e.g. SMILES) carry no
+    coordinates, so they are read back from their v3000 molfile before
+    anything else is computed; this keeps the InChIKey identical to the one
+    computed from the stored molfile.
+
+    If Indigo fails, the representations computed before the failure remain
+    available and the others raise the original `IndigoException`. Structures
+    that exceed a budget, see `chemreg.indigo.budget`, raise `BudgetExceeded`
+    instead.
+
+    The v3000 molfile is itself a `Structure` that shares these results, so it
+    can be stored and validated again without being reparsed. Successful
+    results are kept in the conversion cache, so a structure that was seen
+    before is not parsed at all.
+
+    """
+
+    @classmethod
+    def coerce(cls, value: str) -> "Structure":
+        """Returns `value` as a `Structure`, reusing it if it already is one."""
+        if isinstance(value, cls):
+            return value
+        return cls(value)
+
+    @classmethod
+    def from_computed(cls, value: str, computed: dict) -> "Structure":
+        """Builds a `Structure` from the results of `compute_structure`.
+
+        This allows the results to be computed elsewhere, e.g. in another
+        process, without the structure being parsed again.
+        """
+        structure = cls(value)
+        structure.__dict__["_computed"] = structure._share(computed)
+        return structure
+
+    @cached_property
+    def _computed(self) -> dict:
+        try:
+            check_size(self)
+        except BudgetExceeded as e:
+            computed = {"error": e}
+        else:
+            computed = conversion_cache.get(CACHE_KIND, self)
+        if computed is None:
+            try:
+                computed = process_pool.run(
+                    compute_structure, str(self), timeout=indigo_settings.TIMEOUT
+                )
+            except TimeoutError:
+                computed = {"error": time_budget_exceeded()}
+            if "error" not in computed:
+                conversion_cache.set(CACHE_KIND, self, computed)
+        record(computed)
+        return self._share(computed)
+
+    def _share(self, computed: dict) -> dict:
+        computed = dict(computed)
+        if "molfile_v3000" in computed:
+            molfile = Structure(computed["molfile_v3000"])
+            molfile.__dict__["_computed"] = computed
+            computed["molfile_v3000"] = molfile
+        return computed
+
+    def _get(self, name: str):
+        try:
+            return self._computed[name]
+        except KeyError:
+            raise self._computed["error"]
+
+    @property
+    def molfile_v3000(self) -> str:
+        """The v3000 molfile."""
+        return self._get("molfile_v3000")
+
+    @property
+    def serialized(self) -> bytes:
+        """The molecule in Indigo's binary format, see `load_serialized`."""
+        return self._get("serialized")
+
+    @property
+    def smiles(self) -> str:
+        """The SMILES string."""
+        return self._get("smiles")
+
+    @property
+    def canonical_smiles(self) -> str:
+        """The canonical SMILES, see `chemreg.indigo.smiles`."""
+        return self._get("canonical_smiles")
+
+    @property
+    def molecular_weight(self) -> float:
+        """The molecular weight in g/mol."""
+        return self._get("molecular_weight")
+
+    @property
+    def molecular_formula(self) -> str:
+        """The gross formula."""
+        return self._get("molecular_formula")
+
+    @property
+    def inchi(self) -> str:
+        """The InChI."""
+        return self._get("inchi")
+
+    @property
+    def inchikey(self) -> str:
+        """The InChIKey."""
+        return self._get("inchikey")
+
+    @property
+    def component_inchikeys(self) -> List[str]:
+        """The InChIKeys of the components, see `component_inchikeys`."""
+        return self._get("component_inchikeys")
+
+    @property
+    def substructure_fingerprint(self) -> bytes:
+        """The substructure fingerprint, see `chemreg.indigo.substructure`."""
+        return self._get("substructure_fingerprint")
+
+    @property
+    def similarity_fingerprint(self) -> bytes:
+        """The similarity fingerprint, see `chemreg.indigo.similarity`."""
+        return self._get("similarity_fingerprint")
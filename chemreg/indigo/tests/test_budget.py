@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import pytest
+from indigo import Indigo, IndigoException
+from prometheus_client import REGISTRY
+
+from chemreg.indigo.budget import (
+    AtomCountExceeded,
+    InputSizeExceeded,
+    TimeBudgetExceeded,
+)
+from chemreg.indigo.cache import conversion_cache
+from chemreg.indigo.executor import process_pool
+from chemreg.indigo.inchi import compute_inchikey, get_inchikey
+from chemreg.indigo.molfile import compute_molfile_v3000, get_molfile_v3000
+from chemreg.indigo.mrvfile import compute_mrvfile, get_mrvfile
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import Structure, compute_structure
+from chemreg.indigo.substructure import compute_query_fingerprint
+
+
+def exceeded(budget):
+    value = REGISTRY.get_sample_value(
+        "chemreg_indigo_budget_exceeded_total", {"budget": budget}
+    )
+    return value or 0
+
+
+def test_input_size_budget(monkeypatch):
+    monkeypatch.setattr(indigo_settings, "MAX_SIZE", 10)
+    count = exceeded("size")
+    with patch.object(Indigo, "loadMolecule") as load:
+        with pytest.raises(InputSizeExceeded):
+            Structure("C" * 11).inchikey
+    assert not load.called
+    assert exceeded("size") == count + 1
+    assert Structure("C" * 10).inchikey
+
+
+def test_atom_count_budget(monkeypatch):
+    monkeypatch.setattr(indigo_settings, "MAX_ATOMS", 3)
+    count = exceeded("atoms")
+    with pytest.raises(AtomCountExceeded):
+        Structure("CCCC").molfile_v3000
+    assert exceeded("atoms") == count + 1
+    assert Structure("CCC").molfile_v3000
+
+
+def test_time_budget():
+    with patch.object(
+        Indigo,
+        "loadMolecule",
+        side_effect=IndigoException(b"The operation timed out: 2000 ms"),
+    ):
+        assert isinstance(compute_structure("CCC")["error"], TimeBudgetExceeded)
+    with patch.object(
+        Indigo, "loadMolecule", side_effect=IndigoException(b"bad structure")
+    ):
+        error = compute_structure("CCC")["error"]
+    assert not isinstance(error, TimeBudgetExceeded)
+
+
+@pytest.mark.parametrize(
+    "compute",
+    [
+        compute_inchikey,
+        compute_molfile_v3000,
+        compute_mrvfile,
+        compute_query_fingerprint,
+    ],
+)
+def test_conversion_time_budget(compute):
+    """Offloaded conversions give up within the time budget themselves."""
+    timed_out = IndigoException(b"The operation timed out: 2000 ms")
+    with patch.object(
+        Indigo, "setOption", autospec=True, side_effect=Indigo.setOption
+    ) as set_option, patch.object(
+        Indigo, "loadMolecule", side_effect=timed_out
+    ), patch.object(
+        Indigo, "loadQueryMolecule", side_effect=timed_out
+    ):
+        with pytest.raises(TimeBudgetExceeded):
+            compute("CCC")
+    assert any(
+        call.args[1:] == ("timeout", int(indigo_settings.TIMEOUT * 1000))
+        for call in set_option.call_args_list
+    )
+
+
+@pytest.mark.parametrize("convert", [get_inchikey, get_molfile_v3000, get_mrvfile])
+def test_offloaded_conversion_time_budget(convert):
+    conversion_cache.clear()
+    with patch.object(process_pool, "run", side_effect=TimeoutError):
+        with pytest.raises(TimeBudgetExceeded):
+            convert("CCCC")
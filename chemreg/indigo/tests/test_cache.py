@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+
+from indigo import Indigo
+
+from chemreg.indigo.cache import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    ConversionCache,
+    conversion_cache,
+    indigo_version,
+)
+from chemreg.indigo.inchi import get_inchikey
+from chemreg.indigo.structure import CACHE_KIND, Structure
+
+
+def test_key_is_content_addressed():
+    conversions = ConversionCache()
+    assert conversions.key("inchikey", "C=O") == conversions.key("inchikey", "C=O")
+    assert conversions.key("inchikey", "C=O") != conversions.key("inchikey", "O=C")
+    assert conversions.key("inchikey", "C=O") != conversions.key("smiles", "C=O")
+    key = conversions.key("inchikey", "C=O")
+    with patch("chemreg.indigo.cache.indigo_version", return_value="0.0"):
+        assert conversions.key("inchikey", "C=O") != key
+    assert indigo_version() == Indigo().version()
+
+
+def test_local_tier_is_bounded():
+    conversions = ConversionCache(maxsize=2)
+    for i in range(3):
+        conversions.set("test", str(i), i)
+    assert len(conversions._local) == 2
+    # Evicted entries are still found in the shared tier
+    assert conversions.get("test", "0") == 0
+    cache.delete(conversions.key("test", "0"))
+    conversions.clear()
+    assert conversions.get("test", "0") is None
+
+
+def test_hits_and_misses_counted():
+    conversions = ConversionCache()
+    hits = CACHE_HITS.labels(kind="counted", tier="local")
+    misses = CACHE_MISSES.labels(kind="counted")
+    before = (hits._value.get(), misses._value.get())
+    conversions.get("counted", "uncached structure")
+    conversions.set("counted", "uncached structure", "value")
+    conversions.get("counted", "uncached structure")
+    assert hits._value.get() == before[0] + 1
+    assert misses._value.get() == before[1] + 1
+
+
+def test_conversions_use_cache():
+    smiles = "CC(C)(C1=CC=C(O)C=C1)C1=CC=C(O)C=C1"
+    inchikey = get_inchikey(smiles)
+    structure = Structure(smiles)
+    structure.inchikey
+    with patch.object(Indigo, "loadMolecule") as load:
+        assert get_inchikey(smiles) == inchikey
+        assert Structure(smiles).inchikey == structure.inchikey
+        assert Structure(smiles).molfile_v3000.inchikey == structure.inchikey
+    assert not load.called
+
+
+def test_failures_not_cached():
+    structure = Structure("\n\n\nnot cached")
+    assert "error" in structure._computed
+    assert conversion_cache.get(CACHE_KIND, structure) is None
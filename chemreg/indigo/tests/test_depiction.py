@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+import pytest
+from indigo.renderer import IndigoRenderer
+
+from chemreg.indigo.budget import AtomCountExceeded, InputSizeExceeded
+from chemreg.indigo.depiction import compute_depiction, get_depiction
+from chemreg.indigo.settings import indigo_settings
+
+
+def test_compute_depiction():
+    svg = compute_depiction("CC(=O)O", "svg", 200)
+    assert svg.startswith(b"<?xml")
+    assert b'viewBox="0 0 200 200"' in svg
+    png = compute_depiction("CC(=O)O", "png", 200)
+    assert png.startswith(b"\x89PNG")
+    with pytest.raises(ValueError):
+        compute_depiction("CC(=O)O", "gif", 200)
+
+
+def test_get_depiction_cached():
+    svg = get_depiction("CCN", "svg", 120)
+    with patch.object(IndigoRenderer, "renderToBuffer") as render:
+        assert get_depiction("CCN", "svg", 120) == svg
+    assert not render.called
+    assert get_depiction("CCN", "svg", 140) != svg
+    assert get_depiction("CCN", "png", 120) != svg
+
+
+def test_depiction_budgets(monkeypatch):
+    monkeypatch.setattr(indigo_settings, "MAX_ATOMS", 3)
+    with pytest.raises(AtomCountExceeded):
+        get_depiction("CCCC", "svg", 100)
+    monkeypatch.setattr(indigo_settings, "MAX_SIZE", 3)
+    with pytest.raises(InputSizeExceeded):
+        get_depiction("CCCC", "svg", 100)
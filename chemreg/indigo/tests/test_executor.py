@@ -0,0 +1,107 @@
+import os
+import time
+
+from django.core.cache import cache
+
+import pytest
+from indigo import IndigoException
+from prometheus_client import REGISTRY
+
+from chemreg.indigo import executor
+from chemreg.indigo.cache import conversion_cache
+from chemreg.indigo.executor import ProcessPool, process_pool
+from chemreg.indigo.inchi import compute_inchikey
+from chemreg.indigo.settings import indigo_settings
+from chemreg.indigo.structure import Structure
+
+
+def pool_offloads(_):
+    return executor.process_pool.offload
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def offload(monkeypatch):
+    monkeypatch.setattr(indigo_settings, "OFFLOAD", True)
+    yield
+    process_pool.shutdown()
+
+
+def test_process_pool_map():
+    pool = ProcessPool(processes=2)
+    try:
+        assert pool.map(str.upper, ["c", "cc", "ccc"]) == ["C", "CC", "CCC"]
+    finally:
+        pool.shutdown()
+
+
+def test_process_pool_map_metrics():
+    pool = ProcessPool(processes=2)
+    count = REGISTRY.get_sample_value("chemreg_indigo_executor_run_seconds_count")
+    try:
+        # Three items make a chunk each for two processes.
+        assert pool.map(str.upper, ["c", "cc", "ccc"]) == ["C", "CC", "CCC"]
+        assert (
+            REGISTRY.get_sample_value("chemreg_indigo_executor_run_seconds_count")
+            == count + 3
+        )
+        with pytest.raises(TimeoutError):
+            pool.map(sleep, [1, 0, 0], timeout=0.05)
+        with pytest.raises(IndigoException):
+            pool.map(compute_inchikey, ["C", "not a structure", "CC"])
+        assert REGISTRY.get_sample_value("chemreg_indigo_executor_queue_depth") == 0
+    finally:
+        pool.shutdown()
+
+
+def test_process_pool_is_lazy():
+    pool = ProcessPool(processes=1)
+    assert pool._executor is None
+    assert pool.executor is pool.executor
+    pool.shutdown()
+    assert pool._executor is None
+
+
+def test_run_in_place_outside_gevent():
+    assert not process_pool.offload
+    assert process_pool.run(os.getpid) == os.getpid()
+
+
+def test_run_offloaded(offload):
+    assert process_pool.offload
+    count = REGISTRY.get_sample_value("chemreg_indigo_executor_run_seconds_count")
+    assert process_pool.run(os.getpid) != os.getpid()
+    assert process_pool.run(compute_inchikey, "C") == "VNWKTOKETHGBQD-UHFFFAOYSA-N"
+    with pytest.raises(IndigoException):
+        process_pool.run(compute_inchikey, "not a structure")
+    assert (
+        REGISTRY.get_sample_value("chemreg_indigo_executor_run_seconds_count")
+        == count + 3
+    )
+    assert REGISTRY.get_sample_value("chemreg_indigo_executor_queue_depth") == 0
+
+
+def test_pool_processes_run_in_place(offload):
+    assert process_pool.map(pool_offloads, [None]) == [False]
+
+
+def test_structure_computed_offloaded(offload):
+    conversion_cache.clear()
+    cache.clear()
+    count = REGISTRY.get_sample_value("chemreg_indigo_executor_run_seconds_count")
+    structure = Structure("CCO")
+    assert structure.inchikey == "LFQSCWFLJHTTHZ-UHFFFAOYSA-N"
+    assert structure.molecular_formula == "C2 H6 O"
+    assert (
+        REGISTRY.get_sample_value("chemreg_indigo_executor_run_seconds_count")
+        == count + 1
+    )
+
+
+def test_run_timeout(offload):
+    with pytest.raises(TimeoutError):
+        process_pool.run(sleep, 1, timeout=0.05)
+    assert REGISTRY.get_sample_value("chemreg_indigo_executor_queue_depth") == 0
@@ -0,0 +1,27 @@
+from unittest.mock import patch
+
+import pytest
+from indigo import Indigo
+
+from chemreg.indigo.mrvfile import format_mrvfile, get_mrvfile
+
+
+def test_format_mrvfile():
+    cml = Indigo().loadMolecule("CC(=O)O").cml()
+    mrvfile = format_mrvfile(cml)
+    assert mrvfile.startswith("<cml><MDocument><MChemicalStruct><molecule>")
+    assert mrvfile.endswith("</molecule></MChemicalStruct></MDocument></cml>")
+    assert "\n" not in mrvfile
+    assert mrvfile.count('elementType="O"') == 2
+    padded = cml.replace('elementType="C" />', 'elementType="C" />\n  \n')
+    assert format_mrvfile(padded) == mrvfile
+    with pytest.raises(ValueError):
+        format_mrvfile("<cml>\n</cml>")
+
+
+def test_get_mrvfile_cached():
+    mrvfile = get_mrvfile("CCN")
+    with patch.object(Indigo, "loadMolecule") as load:
+        assert get_mrvfile("CCN") == mrvfile
+    assert not load.called
+    assert get_mrvfile("CCO") != mrvfile
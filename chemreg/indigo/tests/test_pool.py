@@ -0,0 +1,38 @@
+from chemreg.indigo.inchi import get_inchikey
+from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.pool import IndigoSessionPool, indigo_pool
+
+
+def test_sessions_are_reused():
+    pool = IndigoSessionPool(size=2)
+    with pool.session() as first:
+        pass
+    with pool.session() as second:
+        assert second is first
+    assert pool.created == 1
+
+
+def test_pool_is_bounded():
+    pool = IndigoSessionPool(size=2)
+    with pool.session() as first, pool.session() as second:
+        assert first is not second
+        assert pool.created == 2
+    with pool.session() as third:
+        assert third in (first, second)
+    assert pool.created == 2
+
+
+def test_options_reset_between_uses():
+    pool = IndigoSessionPool(size=1)
+    with pool.session() as session:
+        session.indigo.setOption("molfile-saving-mode", "3000")
+    with pool.session() as session:
+        assert session.indigo.getOption("molfile-saving-mode") == "auto"
+
+
+def test_pooled_conversions():
+    assert get_inchikey("C=O") == "WSFSSNUMVMOOMR-UHFFFAOYSA-N"
+    assert "V3000" in get_molfile_v3000("C=O")
+    # The molfile-saving-mode option does not leak into the pool
+    with indigo_pool.session() as session:
+        assert session.indigo.getOption("molfile-saving-mode") == "auto"
@@ -0,0 +1,80 @@
+import io
+
+from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.reader import (
+    MOLFILE_V2000,
+    MOLFILE_V3000,
+    MRV,
+    SDF,
+    SMILES,
+    format_sdf_record,
+    head,
+    is_molfile,
+    molfile_version,
+    read_sdf,
+    sniff,
+)
+
+
+def molfile_v2000(smiles):
+    with indigo_pool.session() as session:
+        session.indigo.setOption("molfile-saving-mode", "2000")
+        return session.indigo.loadMolecule(smiles).molfile()
+
+
+def test_head():
+    assert head("a\r\nb\nc", 2) == ["a", "b"]
+    assert head("a\nb", 5) == ["a", "b"]
+    assert head("", 1) == [""]
+
+
+def test_molfile_version():
+    assert molfile_version(molfile_v2000("CCO")) == "V2000"
+    assert molfile_version(get_molfile_v3000("CCO")) == "V3000"
+    assert molfile_version("CCO") is None
+    assert is_molfile(get_molfile_v3000("ClC=C(Cl)Cl"))
+    assert not is_molfile("ClC=C(Cl)Cl")
+
+
+def test_sniff():
+    v2000 = molfile_v2000("CCO")
+    assert sniff(v2000) == MOLFILE_V2000
+    assert sniff(get_molfile_v3000("CCO")) == MOLFILE_V3000
+    assert sniff(v2000 + "> <NAME>\nethanol\n\n$$$$\n") == SDF
+    assert sniff("CC(=O)OC1=C(C=CC=C1)C(O)=O\n") == SMILES
+    assert sniff('<?xml version="1.0"?>\n<cml><MDocument/></cml>') == MRV
+    assert sniff("<html></html>") is None
+    assert sniff("CCO ethanol") is None
+    assert sniff("foo\nbar") is None
+    assert sniff("") is None
+
+
+def test_read_sdf():
+    first, second = molfile_v2000("CCO"), get_molfile_v3000("c1ccccc1")
+    sdf = first + "> <NAME>\nethanol\n\n> <CAS>\n64-17-5\n\n$$$$\n" + second + "$$$$\n"
+    records = list(read_sdf(io.StringIO(sdf)))
+    assert [sniff(r.molfile) for r in records] == [MOLFILE_V2000, MOLFILE_V3000]
+    assert records[0].data == {"NAME": "ethanol", "CAS": "64-17-5"}
+    assert records[1].data == {}
+    # binary files and a missing final separator
+    records = list(read_sdf(io.BytesIO(sdf.rstrip("$\n").encode())))
+    assert len(records) == 2
+
+
+def test_format_sdf_record():
+    molfile = get_molfile_v3000("CCO")
+    data = {"NAME": "ethanol", "CAS": None, "NOTE": "first\n\nsecond", "ID": 1}
+    sdf = format_sdf_record(molfile, data) + format_sdf_record(molfile, {})
+    assert sdf.count("$$$$\n") == 2
+    records = list(read_sdf(io.StringIO(sdf)))
+    assert records[0].molfile == molfile.rstrip("\n")
+    assert records[0].data == {"NAME": "ethanol", "NOTE": "first\nsecond", "ID": "1"}
+    assert records[1].data == {}
+
+
+def test_read_sdf_is_lazy():
+    lines = iter((molfile_v2000("CCO") + "$$$$\n" + molfile_v2000("CC")).splitlines())
+    records = read_sdf(lines)
+    assert sniff(next(records).molfile) == MOLFILE_V2000
+    assert list(lines)
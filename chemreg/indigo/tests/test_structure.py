@@ -0,0 +1,61 @@
+import pytest
+from indigo import IndigoException
+
+from chemreg.indigo.inchi import get_inchikey
+from chemreg.indigo.molfile import get_molfile_v3000
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.smiles import get_canonical_smiles
+from chemreg.indigo.structure import Structure, load_serialized
+
+
+def test_structure_from_smiles():
+    smiles = "CC(=O)OC1=C(C=CC=C1)C(O)=O"
+    structure = Structure(smiles)
+    assert structure == smiles
+    molfile = get_molfile_v3000(smiles)
+    # The second line of a molfile holds a timestamp
+    assert structure.molfile_v3000.split("\n")[2:] == molfile.split("\n")[2:]
+    assert structure.inchikey == get_inchikey(molfile)
+    assert structure.inchi.startswith("InChI=")
+    assert structure.smiles
+    assert structure.canonical_smiles == get_canonical_smiles(molfile)
+
+
+def test_structure_from_molfile():
+    molfile = get_molfile_v3000("ClC=C(Cl)Cl")
+    structure = Structure(molfile)
+    assert structure.molfile_v3000 == molfile
+    assert structure.inchikey == get_inchikey(molfile)
+
+
+def test_structure_serialized():
+    structure = Structure("CC(=O)OC1=C(C=CC=C1)C(O)=O")
+    with indigo_pool.session() as session:
+        molecule = load_serialized(session, structure.serialized)
+        assert molecule.canonicalSmiles() == structure.canonical_smiles
+        with pytest.raises(IndigoException):
+            load_serialized(session, b"not a molecule")
+
+
+def test_structure_component_inchikeys():
+    structure = Structure("C[NH3+].[Cl-].C[NH3+]")
+    assert structure.component_inchikeys == [
+        "BAVYZALUXZFZLV-UHFFFAOYSA-O",
+        "VEXZGXHMUGYJMC-UHFFFAOYSA-M",
+    ]
+    structure = Structure("CN")
+    assert structure.component_inchikeys == [structure.inchikey]
+
+
+def test_structure_errors():
+    structure = Structure("\n\n\nfoo")
+    with pytest.raises(IndigoException):
+        structure.molfile_v3000
+    with pytest.raises(IndigoException):
+        structure.inchikey
+
+
+def test_structure_coerce():
+    structure = Structure("C=O")
+    assert Structure.coerce(structure) is structure
+    assert isinstance(Structure.coerce("C=O"), Structure)
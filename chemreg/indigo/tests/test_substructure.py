@@ -0,0 +1,38 @@
+import pytest
+
+from chemreg.indigo.pool import indigo_pool
+from chemreg.indigo.similarity import similarity_fingerprint
+from chemreg.indigo.structure import Structure
+from chemreg.indigo.substructure import (
+    compute_query_fingerprint,
+    match_substructure,
+    substructure_fingerprint,
+)
+
+
+def contains(fingerprint, query):
+    return all(q & f == q for f, q in zip(fingerprint, query))
+
+
+def test_substructure_fingerprint():
+    query = compute_query_fingerprint("c1ccccc1O")
+    assert len(query) == len(Structure("CCO").substructure_fingerprint)
+    # Kekulé and aromatic forms must screen alike.
+    assert contains(Structure("CC1=CC=CC=C1O").substructure_fingerprint, query)
+    assert not contains(Structure("CCO").substructure_fingerprint, query)
+
+
+def test_substructure_fingerprint_options():
+    expected = Structure("c1ccccc1O").substructure_fingerprint
+    with indigo_pool.session() as session:
+        molecule = session.indigo.loadMolecule("c1ccccc1O")
+        similarity_fingerprint(session, molecule)
+        assert substructure_fingerprint(session, molecule) == expected
+
+
+def test_match_substructure():
+    targets = [("a", "Oc1ccccc1"), ("b", "CCO"), ("c", "not a structure")]
+    assert match_substructure("c1ccccc1O", targets) == ["a"]
+    assert match_substructure("[#6][OH]", targets) == ["a", "b"]
+    with pytest.raises(Exception):
+        match_substructure("foo", targets)
@@ -64,7 +64,7 @@ local baseCompound = import 'baseCompound.libsonnet';
       maxLength: 29,
       detailRead: true,
       readOnly: true,
-      description: 'The [InChIKey](https://en.wikipedia.org/wiki/International_Chemical_Identifier#InChIKey) as calculated at the time of the request.',
+      description: 'The [InChIKey](https://en.wikipedia.org/wiki/International_Chemical_Identifier#InChIKey) as calculated from the structure when it was last stored.',
       example: 'MYMOFIZGZYHOMD-UHFFFAOYSA-N',
     },
   },
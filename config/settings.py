@@ -9,8 +9,11 @@ APPS_DIR = ROOT_DIR.path("chemreg")
 env = environ.Env(
     CACHE_URL=(str, "locmemcache://"),
     COMPOUND_PREFIX=(str, ""),
+    COMPOUND_SIMILARITY_INDEX_DIR=(str, ""),
     DATABASE_URL=(str, "sqlite:///.sqlite3"),
     DEBUG=(bool, True),
+    INDIGO_POOL_SIZE=(int, 4),
+    INDIGO_PROCESSES=(int, 0),
     RESOLUTION_URL=(str, ""),
     SESSION_COOKIE_AGE=(int, 900),
     SECRET_KEY=(str, "secret"),
@@ -39,9 +42,16 @@ if env.bool("WHITELIST_LOCAL"):
 if env("WHITELIST_HOST"):
     ALLOWED_HOSTS += [env("WHITELIST_HOST")]
 CACHES = {"default": env.cache_url("CACHE_URL", env("CACHE_URL"))}
-COMPOUND = {"PREFIX": env("COMPOUND_PREFIX", default="DTX")}
+COMPOUND = {
+    "PREFIX": env("COMPOUND_PREFIX", default="DTX"),
+    "SIMILARITY_INDEX_DIR": env("COMPOUND_SIMILARITY_INDEX_DIR") or None,
+}
 DATABASES = {"default": env.db_url("DATABASE_URL", env("DATABASE_URL"))}
 DEBUG = env("DEBUG")
+INDIGO = {
+    "POOL_SIZE": env("INDIGO_POOL_SIZE"),
+    "PROCESSES": env("INDIGO_PROCESSES"),
+}
 INSTALLED_APPS = [
     # Django apps
     "django.contrib.admin",